@@ -0,0 +1,180 @@
+"""
+Асинхронный клиент PostgreSQL на пуле соединений asyncpg для ASGI API.
+Запросы те же, что у PostgreSQLParser: плейсхолдеры %s переводятся в $n.
+"""
+
+import asyncio
+import itertools
+import logging
+import re
+from typing import Dict, List, Optional, Sequence
+
+import asyncpg
+
+from book_filters import BookFilters
+from postgresql_parser import (
+    AVERAGE_PRICE_SQL, BOOK_COLUMNS, CATEGORY_COUNTS_SQL, POSTGRES_CONFIG, TOTAL_BOOKS_SQL,
+    fulltext_search_query, search_books_query, unique_books_query
+)
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r'%s')
+
+
+def to_asyncpg(query: str) -> str:
+    """Плейсхолдеры psycopg2 (%s) в нумерованные плейсхолдеры asyncpg ($1, $2, ...)"""
+    numbers = itertools.count(1)
+    return _PLACEHOLDER.sub(lambda _: f"${next(numbers)}", query)
+
+
+def pool_config(config: Dict) -> Dict:
+    """Параметры asyncpg из конфигурации psycopg2 (connect_timeout → timeout)"""
+    config = dict(config)
+    timeout = config.pop('connect_timeout', None)
+    if timeout is not None:
+        config['timeout'] = timeout
+    return config
+
+
+class AsyncPostgreSQLParser:
+    """
+    Пул соединений вместо одного соединения: медленный запрос занимает
+    одно соединение, остальные запросы продолжают выполняться. Когда
+    все соединения заняты, запросы ждут в очереди пула.
+    """
+
+    def __init__(self, config: Optional[Dict] = None, min_size: int = 2, max_size: int = 10,
+                 command_timeout: float = 30.0):
+        self.postgres_config = dict(config or POSTGRES_CONFIG)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.command_timeout = command_timeout
+        self.pool: Optional[asyncpg.Pool] = None
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self) -> bool:
+        """Создание пула соединений (одновременные вызовы создают один пул)"""
+        async with self._connect_lock:
+            if self.pool is not None:
+                return True
+            return await self._create_pool()
+
+    async def _create_pool(self) -> bool:
+        try:
+            self.pool = await asyncpg.create_pool(
+                min_size=self.min_size,
+                max_size=self.max_size,
+                command_timeout=self.command_timeout,
+                **pool_config(self.postgres_config)
+            )
+            logger.info(f"✅ Пул PostgreSQL создан ({self.min_size}..{self.max_size} соединений)")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Ошибка подключения к PostgreSQL: {e}")
+            return False
+
+    async def disconnect(self):
+        """Закрытие пула соединений"""
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+            logger.info("✅ Отключение от PostgreSQL")
+
+    async def _ensure_pool(self):
+        """Пул соединений; создается при первом обращении (исключение — БД недоступна)"""
+        if self.pool is None and not await self.connect():
+            raise ConnectionError("Пул PostgreSQL не создан")
+
+    async def ping(self) -> Dict:
+        """Проверка доступности PostgreSQL запросом через пул (исключение — БД недоступна)"""
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            server_version = int(await conn.fetchval('SHOW server_version_num'))
+        return {
+            "server_version": server_version,
+            "pool_size": self.pool.get_size(),
+            "pool_idle": self.pool.get_idle_size()
+        }
+
+    async def _fetch_books(self, query: str, params: List) -> List[Dict]:
+        rows = await self.pool.fetch(to_asyncpg(query), *params)
+        return [dict(row) for row in rows]
+
+    async def get_unique_books_from_db(self, limit: int = 100, after_title: Optional[str] = None,
+                                       filters: Optional[BookFilters] = None,
+                                       fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """Уникальные книги в порядке названий (см. PostgreSQLParser.get_unique_books_from_db)"""
+        await self._ensure_pool()
+
+        try:
+            conditions, params = (filters or BookFilters()).compile()
+            books = await self._fetch_books(*unique_books_query(conditions, params, after_title, limit, fields))
+            logger.info(f"📚 Получено {len(books)} уникальных книг из PostgreSQL")
+            return books
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении книг из PostgreSQL: {e}")
+            raise
+
+    async def get_book_by_id(self, book_id: int) -> Optional[Dict]:
+        """Книга по первичному ключу"""
+        await self._ensure_pool()
+
+        try:
+            books = await self._fetch_books(f"SELECT {BOOK_COLUMNS} FROM books_table WHERE id = %s", [book_id])
+            return books[0] if books else None
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении книги {book_id}: {e}")
+            raise
+
+    async def get_stats(self) -> Dict:
+        """Статистика каталога: три запроса на одном соединении пула"""
+        await self._ensure_pool()
+
+        try:
+            async with self.pool.acquire() as conn:
+                total_products = await conn.fetchval(TOTAL_BOOKS_SQL)
+                categories = {row['category']: row['count'] for row in await conn.fetch(CATEGORY_COUNTS_SQL)}
+                avg_price = await conn.fetchval(AVERAGE_PRICE_SQL) or 0
+
+            return {
+                "total_products": total_products,
+                "categories": categories,
+                "average_price": round(float(avg_price), 2)
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении статистики: {e}")
+            raise
+
+    async def search_books(self, query: str, limit: int = 50, after: Optional[Dict] = None,
+                           filters: Optional[BookFilters] = None,
+                           fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """Поиск книг по названию и автору с фильтрами по релевантности (см. PostgreSQLParser.search_books)"""
+        await self._ensure_pool()
+
+        try:
+            books = await self._fetch_books(*search_books_query(query, filters, after, limit, fields))
+            logger.info(f"🔍 Найдено {len(books)} книг по запросу '{query}'")
+            return books
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка при поиске книг: {e}")
+            raise
+
+    async def fulltext_search(self, query: str, limit: int = 50, after: Optional[Dict] = None,
+                              filters: Optional[BookFilters] = None,
+                              fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """Полнотекстовый поиск по ts_rank с headline (см. PostgreSQLParser.fulltext_search)"""
+        await self._ensure_pool()
+
+        try:
+            books = await self._fetch_books(*fulltext_search_query(query, filters, after, limit, fields))
+            logger.info(f"🔍 Полнотекстовый поиск '{query}': найдено {len(books)} книг")
+            return books
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка полнотекстового поиска: {e}")
+            raise
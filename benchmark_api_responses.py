@@ -0,0 +1,79 @@
+"""
+Размер и время ответа /products: все колонки и проекция fields=, кодировщики JSON
+
+    python benchmark_api_responses.py [--limit 100] [--repeat 20] [--host ... --port ...]
+
+Время запроса — выборка страницы из PostgreSQL, время кодирования — сериализация
+тела ответа {"products": [...], ...} каждым кодировщиком.
+"""
+
+import argparse
+import logging
+import time
+
+from flask import Flask
+
+import json_provider
+from postgresql_parser import PostgreSQLParser, parse_fields
+
+BOT_FIELDS = "id,title,price,category"
+
+
+def measure(func, repeat: int):
+    """Результат последнего вызова и среднее время вызова в мс"""
+    result = func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+
+def encoders():
+    """Штатный jsonify Flask и доступные кодировщики json_provider"""
+    app = Flask(__name__)
+
+    def flask_jsonify(obj) -> bytes:
+        with app.app_context():
+            return app.json.response(obj).get_data()
+
+    yield 'flask jsonify', flask_jsonify
+    for name in ('json', 'orjson', 'orjson-iso'):
+        try:
+            yield name, json_provider.make_encoder(name)
+        except ValueError as e:
+            print(f"  {name}: пропущен ({e})")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--limit', type=int, default=100)
+    arg_parser.add_argument('--repeat', type=int, default=20)
+    arg_parser.add_argument('--host')
+    arg_parser.add_argument('--port', type=int)
+    arg_parser.add_argument('--database')
+    arg_parser.add_argument('--user')
+    arg_parser.add_argument('--password')
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.INFO)
+    parser = PostgreSQLParser()
+    for key in ('host', 'port', 'database', 'user', 'password'):
+        if getattr(args, key) is not None:
+            parser.postgres_config[key] = getattr(args, key)
+
+    print(f"/products?limit={args.limit}, среднее из {args.repeat}")
+    print(f"{'fields':<24} {'кодировщик':<14} {'байт':>9} {'запрос, мс':>11} {'кодирование, мс':>16}")
+    for fields_arg in (None, BOT_FIELDS):
+        fields = parse_fields(fields_arg)
+        rows, query_ms = measure(lambda: parser.get_unique_books_from_db(args.limit + 1, fields=fields), args.repeat)
+        body = {"products": rows[:args.limit], "count": len(rows[:args.limit]), "next_cursor": None, "status": "success"}
+
+        for name, encode in encoders():
+            data, encode_ms = measure(lambda: encode(body), args.repeat)
+            print(f"{fields_arg or 'все колонки':<24} {name:<14} {len(data):>9} {query_ms:>11.2f} {encode_ms:>16.2f}")
+
+    parser.disconnect()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Сравнение словарей и Product: память на 100k товаров и скорость записи в SQLite
+
+    python benchmark_products.py [--count 100000]
+"""
+
+import argparse
+import gc
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+from price_history import observation_params
+from product_keys import product_natural_key
+from product_record import Product
+
+
+def make_dict(i: int) -> dict:
+    """Словарь товара в том виде, в каком его раньше возвращали экстракторы"""
+    return {
+        'name': f'Book {i}',
+        'price': 10.0 + i % 50,
+        'category': f'Category {i % 8}',
+        'brand': 'Unknown Author',
+        'image_url': f'https://books.toscrape.com/media/cache/{i}.jpg',
+        'product_url': f'https://books.toscrape.com/catalogue/book_{i}/index.html',
+        'availability': 'In stock',
+        'rating': float(i % 5 + 1),
+    }
+
+
+def make_product(i: int) -> Product:
+    return Product(
+        name=f'Book {i}',
+        price=10.0 + i % 50,
+        category=f'Category {i % 8}',
+        brand='Unknown Author',
+        image_url=f'https://books.toscrape.com/media/cache/{i}.jpg',
+        product_url=f'https://books.toscrape.com/catalogue/book_{i}/index.html',
+        availability='In stock',
+        rating=float(i % 5 + 1),
+    )
+
+
+def dict_row(product_data: dict) -> tuple:
+    """Прежняя распаковка словаря одиннадцатью вызовами .get()"""
+    return (
+        product_data.get('name'),
+        product_data.get('price'),
+        product_data.get('old_price'),
+        product_data.get('category'),
+        product_data.get('brand'),
+        product_data.get('description', ''),
+        product_data.get('image_url'),
+        product_data.get('product_url'),
+        product_data.get('availability'),
+        product_data.get('rating'),
+        product_data.get('reviews_count', 0),
+        product_natural_key(product_data)
+    )
+
+
+def measure_memory(factory, count: int) -> int:
+    """Байт на товары вместе со строками значений"""
+    gc.collect()
+    tracemalloc.start()
+    items = [factory(i) for i in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return current
+
+
+def measure_rows(factory, to_row, count: int) -> float:
+    """
+    Создание товара и его строка INSERT: natural_key у Product вычисляется
+    при создании, поэтому замер включает оба шага
+    """
+    started = time.perf_counter()
+    for i in range(count):
+        to_row(factory(i))
+    return time.perf_counter() - started
+
+
+def dict_params(product_data: dict) -> tuple:
+    """Прежний путь записи словаря: строка INSERT и наблюдение истории цен"""
+    row = dict_row(product_data)
+    observation = observation_params(row[-1], product_data.get('price'), product_data.get('availability'),
+                                     int(time.time()))
+    return row, observation
+
+
+def per_row_write(parser, rows, observations):
+    """Запись без режима bulk_ingest: FTS и category_stats обновляют триггеры на каждую строку"""
+    from techpark_parser import INSERT_PRODUCT_SQL
+
+    with parser.storage.write() as conn:
+        conn.executemany(INSERT_PRODUCT_SQL, rows)
+        parser.price_history.record(conn, observations)
+
+
+def measure_ingest(items, to_params, write=None) -> float:
+    """
+    Запись во временную базу со всеми миграциями (триггеры FTS5 и
+    category_stats включены) пакетами INGEST_BATCH_SIZE: to_params строит
+    строку и наблюдение товара, write — запись пакета (по умолчанию _write_rows)
+    """
+    from techpark_parser import INGEST_BATCH_SIZE, TehnoparserBooks
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parser = TehnoparserBooks(db_path=os.path.join(tmp, 'bench.db'))
+        write = write or TehnoparserBooks._write_rows
+        started = time.perf_counter()
+        for offset in range(0, len(items), INGEST_BATCH_SIZE):
+            rows, observations = zip(*map(to_params, items[offset:offset + INGEST_BATCH_SIZE]))
+            write(parser, list(rows), list(observations))
+        elapsed = time.perf_counter() - started
+        parser.storage.close()
+    return elapsed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--count', type=int, default=100_000)
+    args = arg_parser.parse_args()
+    logging.disable(logging.INFO)
+
+    from techpark_parser import TehnoparserBooks
+
+    count = args.count
+    dict_bytes = measure_memory(make_dict, count)
+    product_bytes = measure_memory(make_product, count)
+
+    dicts = [make_dict(i) for i in range(count)]
+    products = [make_product(i) for i in range(count)]
+    dict_rows = measure_rows(make_dict, dict_row, count)
+    product_rows = measure_rows(make_product, Product.to_row, count)
+    dict_ingest = measure_ingest(dicts, dict_params)
+    product_ingest = measure_ingest(products, TehnoparserBooks._product_params)
+    per_row_ingest = measure_ingest(products, TehnoparserBooks._product_params, per_row_write)
+
+    print(f"Товаров: {count}")
+    print(f"Память, dict:    {dict_bytes / 2 ** 20:8.1f} МиБ ({dict_bytes / count:.0f} байт на товар)")
+    print(f"Память, Product: {product_bytes / 2 ** 20:8.1f} МиБ ({product_bytes / count:.0f} байт на товар)")
+    print(f"Создание и строка INSERT, dict:    {dict_rows:.3f} с")
+    print(f"Создание и строка INSERT, Product: {product_rows:.3f} с (x{dict_rows / product_rows:.2f})")
+    print(f"Запись в SQLite, dict:    {dict_ingest:.3f} с")
+    print(f"Запись в SQLite, Product: {product_ingest:.3f} с (x{dict_ingest / product_ingest:.2f})")
+    print(f"Запись в SQLite, Product, построчные триггеры: {per_row_ingest:.3f} с "
+          f"(пакетный индекс и статистика x{per_row_ingest / product_ingest:.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Структурированные фильтры каталога книг и их компиляция в условия SQL
+"""
+
+from dataclasses import dataclass
+from typing import List, Mapping, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class BookFilters:
+    """Фильтры выборки книг: категория, диапазон цен, минимальный рейтинг"""
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_rating: Optional[float] = None
+
+    @classmethod
+    def from_args(cls, args: Mapping) -> "BookFilters":
+        """Фильтры из параметров запроса. ValueError — некорректное значение"""
+        def number(name: str) -> Optional[float]:
+            value = args.get(name)
+            if value is None or value == '':
+                return None
+            try:
+                return float(value)
+            except ValueError:
+                raise ValueError(f"Параметр {name} должен быть числом")
+
+        filters = cls(
+            category=(args.get('category') or '').strip() or None,
+            min_price=number('min_price'),
+            max_price=number('max_price'),
+            min_rating=number('min_rating')
+        )
+
+        if filters.min_price is not None and filters.max_price is not None and filters.min_price > filters.max_price:
+            raise ValueError("min_price не может быть больше max_price")
+        return filters
+
+    def is_empty(self) -> bool:
+        return all(value is None for value in (self.category, self.min_price, self.max_price, self.min_rating))
+
+    def to_dict(self) -> dict:
+        return {
+            "category": self.category,
+            "min_price": self.min_price,
+            "max_price": self.max_price,
+            "min_rating": self.min_rating
+        }
+
+    def compile(self) -> Tuple[List[str], List]:
+        """
+        Условия WHERE (плейсхолдеры psycopg2) и их параметры. Категория
+        сравнивается без учета регистра через индекс по lower(category).
+        """
+        conditions, params = [], []
+        if self.category is not None:
+            conditions.append("lower(category) = lower(%s)")
+            params.append(self.category)
+        if self.min_price is not None:
+            conditions.append("price >= %s")
+            params.append(self.min_price)
+        if self.max_price is not None:
+            conditions.append("price <= %s")
+            params.append(self.max_price)
+        if self.min_rating is not None:
+            conditions.append("rating >= %s")
+            params.append(self.min_rating)
+        return conditions, params
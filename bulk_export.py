@@ -0,0 +1,32 @@
+"""
+Форматы потоковой выгрузки каталога: NDJSON и CSV по пачкам строк
+"""
+
+import csv
+import io
+from typing import Callable, Dict, Iterable, Iterator, List
+
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+def ndjson_chunks(batches: Iterable[List[Dict]], encode: Callable[[Dict], bytes]) -> Iterator[bytes]:
+    """Один JSON объект на строку (encode завершает строку переводом); пачка — один фрагмент"""
+    for batch in batches:
+        yield b''.join(encode(row) for row in batch)
+
+
+def csv_chunks(batches: Iterable[List[Dict]], fieldnames: List[str]) -> Iterator[str]:
+    """CSV: заголовок отдается сразу, до первой пачки; None выгружается пустой ячейкой"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
@@ -0,0 +1,38 @@
+"""
+Пакетная запись товаров: триггеры вставки FTS и category_stats пропускают
+строки пакета, индекс и статистика дополняются одним запросом на пакет
+"""
+
+from contextlib import contextmanager
+from typing import Iterator
+
+# Строка в таблице есть только внутри транзакции пакетной записи, поэтому
+# другие соединения и прерванные записи ее не видят
+CREATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS bulk_ingest (
+        active INTEGER PRIMARY KEY CHECK (active = 1)
+    )
+'''
+
+# Условие WHEN построчных триггеров вставки
+PER_ROW_CONDITION = 'NOT EXISTS (SELECT 1 FROM bulk_ingest)'
+
+
+def create_bulk_ingest(conn):
+    """Таблица режима пакетной записи (вызывается из миграций)"""
+    conn.execute(CREATE_TABLE_SQL)
+
+
+@contextmanager
+def bulk_ingest(conn) -> Iterator[int]:
+    """
+    Режим пакетной записи в открытой транзакции. Возвращает наибольший id
+    товара до записи: новые строки пакета — это строки с большим id
+    (AUTOINCREMENT), их и нужно добавить в индекс и статистику после блока
+    """
+    last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM products').fetchone()[0]
+    conn.execute('INSERT INTO bulk_ingest (active) VALUES (1)')
+    try:
+        yield last_id
+    finally:
+        conn.execute('DELETE FROM bulk_ingest')
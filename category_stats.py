@@ -0,0 +1,182 @@
+"""
+Материализованная статистика по категориям, поддерживаемая триггерами
+"""
+
+from typing import Dict, List
+
+from bulk_ingest import PER_ROW_CONDITION, create_bulk_ingest
+
+# Категория NULL хранится как пустая строка, чтобы работал первичный ключ
+_KEY = "COALESCE({row}.category, '')"
+
+CREATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS category_stats (
+        category TEXT PRIMARY KEY,
+        product_count INTEGER NOT NULL DEFAULT 0,
+        price_sum REAL NOT NULL DEFAULT 0,
+        price_count INTEGER NOT NULL DEFAULT 0,
+        min_price REAL,
+        max_price REAL
+    )
+'''
+
+
+def _add_row_sql(row: str) -> str:
+    """Учет строки товара в статистике"""
+    return f'''
+        INSERT INTO category_stats (category, product_count, price_sum, price_count, min_price, max_price)
+        VALUES ({_KEY.format(row=row)}, 1, COALESCE({row}.price, 0), {row}.price IS NOT NULL, {row}.price, {row}.price)
+        ON CONFLICT(category) DO UPDATE SET
+            product_count = product_count + 1,
+            price_sum = price_sum + excluded.price_sum,
+            price_count = price_count + excluded.price_count,
+            min_price = CASE WHEN excluded.min_price IS NULL THEN min_price
+                             WHEN min_price IS NULL OR excluded.min_price < min_price THEN excluded.min_price
+                             ELSE min_price END,
+            max_price = CASE WHEN excluded.max_price IS NULL THEN max_price
+                             WHEN max_price IS NULL OR excluded.max_price > max_price THEN excluded.max_price
+                             ELSE max_price END;
+    '''
+
+
+def _remove_row_sql(row: str) -> str:
+    """
+    Исключение строки товара из статистики. Минимум и максимум пересчитываются
+    по индексу (category, price), только если удаляется граничная цена.
+    """
+    key = _KEY.format(row=row)
+    return f'''
+        UPDATE category_stats SET
+            product_count = product_count - 1,
+            price_sum = price_sum - COALESCE({row}.price, 0),
+            price_count = price_count - ({row}.price IS NOT NULL)
+        WHERE category = {key};
+        UPDATE category_stats SET
+            min_price = (SELECT MIN(price) FROM products WHERE category IS {row}.category),
+            max_price = (SELECT MAX(price) FROM products WHERE category IS {row}.category)
+        WHERE category = {key} AND ({row}.price = min_price OR {row}.price = max_price);
+        DELETE FROM category_stats WHERE category = {key} AND product_count <= 0;
+    '''
+
+
+# Вставка пакетом учитывается в add_inserted_rows (см. bulk_ingest)
+INSERT_TRIGGER_SQL = f'''
+    CREATE TRIGGER IF NOT EXISTS trg_products_stats_insert AFTER INSERT ON products
+    WHEN {PER_ROW_CONDITION}
+    BEGIN
+        {_add_row_sql('NEW')}
+    END
+'''
+
+TRIGGERS_SQL = [
+    INSERT_TRIGGER_SQL,
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_products_stats_delete AFTER DELETE ON products
+    BEGIN
+        {_remove_row_sql('OLD')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_products_stats_update AFTER UPDATE OF price, category ON products
+    WHEN OLD.price IS NOT NEW.price OR OLD.category IS NOT NEW.category
+    BEGIN
+        {_remove_row_sql('OLD')}
+        {_add_row_sql('NEW')}
+    END
+    ''',
+]
+
+# Полный пересчет по таблице товаров
+AGGREGATE_SQL = '''
+    SELECT COALESCE(category, ''), COUNT(*), COALESCE(SUM(price), 0), COUNT(price), MIN(price), MAX(price)
+    FROM products
+    GROUP BY COALESCE(category, '')
+'''
+
+
+# Учет новых строк пакета: одна строка агрегата на категорию
+ADD_ROWS_SQL = '''
+    INSERT INTO category_stats (category, product_count, price_sum, price_count, min_price, max_price)
+    SELECT COALESCE(category, ''), COUNT(*), COALESCE(SUM(price), 0), COUNT(price), MIN(price), MAX(price)
+    FROM products
+    WHERE id > ?
+    GROUP BY COALESCE(category, '')
+    ON CONFLICT(category) DO UPDATE SET
+        product_count = product_count + excluded.product_count,
+        price_sum = price_sum + excluded.price_sum,
+        price_count = price_count + excluded.price_count,
+        min_price = CASE WHEN excluded.min_price IS NULL THEN min_price
+                         WHEN min_price IS NULL OR excluded.min_price < min_price THEN excluded.min_price
+                         ELSE min_price END,
+        max_price = CASE WHEN excluded.max_price IS NULL THEN max_price
+                         WHEN max_price IS NULL OR excluded.max_price > max_price THEN excluded.max_price
+                         ELSE max_price END
+'''
+
+
+def create_category_stats(conn):
+    """Таблица, триггеры и начальное заполнение (вызывается из миграции)"""
+    create_bulk_ingest(conn)
+    conn.execute(CREATE_TABLE_SQL)
+    for trigger_sql in TRIGGERS_SQL:
+        conn.execute(trigger_sql)
+    rebuild_category_stats(conn)
+
+
+def rebuild_category_stats(conn):
+    """Пересчет статистики с нуля в текущей транзакции"""
+    conn.execute('DELETE FROM category_stats')
+    conn.execute(f'''
+        INSERT INTO category_stats (category, product_count, price_sum, price_count, min_price, max_price)
+        {AGGREGATE_SQL}
+    ''')
+
+
+def add_inserted_rows(conn, after_id: int):
+    """Учет товаров с id > after_id, вставленных в режиме bulk_ingest"""
+    conn.execute(ADD_ROWS_SQL, (after_id,))
+
+
+def read_stats(conn) -> Dict:
+    """Статистика в формате get_stats: чтение строк по числу категорий"""
+    rows = conn.execute('''
+        SELECT category, product_count, price_sum, price_count FROM category_stats
+    ''').fetchall()
+
+    total_products = sum(row[1] for row in rows)
+    price_sum = sum(row[2] for row in rows)
+    price_count = sum(row[3] for row in rows)
+
+    return {
+        'total_products': total_products,
+        'categories': {(category or None): count for category, count, _, _ in rows},
+        'average_price': round(price_sum / price_count, 2) if price_count else 0
+    }
+
+
+def verify_category_stats(conn, tolerance: float = 1e-6) -> List[Dict]:
+    """Сравнение материализованной статистики с пересчетом. Возвращает расхождения"""
+    fields = ('product_count', 'price_sum', 'price_count', 'min_price', 'max_price')
+    expected = {row[0]: row[1:] for row in conn.execute(AGGREGATE_SQL)}
+    actual = {row[0]: row[1:] for row in conn.execute(f'''
+        SELECT category, {', '.join(fields)} FROM category_stats
+    ''')}
+
+    mismatches = []
+    for category in sorted(set(expected) | set(actual)):
+        want = expected.get(category)
+        got = actual.get(category)
+        if want is None or got is None:
+            mismatches.append({'category': category, 'expected': want, 'actual': got})
+            continue
+
+        for name, want_value, got_value in zip(fields, want, got):
+            if want_value is None or got_value is None:
+                same = want_value is got_value
+            else:
+                same = abs(want_value - got_value) <= tolerance * max(1.0, abs(want_value))
+            if not same:
+                mismatches.append({'category': category, 'field': name,
+                                   'expected': want_value, 'actual': got_value})
+
+    return mismatches
@@ -0,0 +1,112 @@
+"""
+Согласование представления ответа API: JSON или MessagePack (Accept) и сжатие
+gzip или zstd (Accept-Encoding). msgpack и zstandard — необязательные зависимости:
+без них соответствующий вариант просто не предлагается.
+"""
+
+import gzip
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from flask import Response, g, request
+from werkzeug.datastructures import Accept, MIMEAccept
+from werkzeug.http import parse_accept_header
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# Ответы короче этого размера не сжимаются: заголовки сжатия дороже выигрыша
+MIN_COMPRESS_SIZE = 512
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+VARY = 'Accept, Accept-Encoding'
+
+MIMETYPES = [JSON_MIMETYPE] + ([MSGPACK_MIMETYPE] if msgpack is not None else [])
+# При равном приоритете у клиента выбирается zstd: быстрее и плотнее gzip
+ENCODINGS = (['zstd'] if zstandard is not None else []) + ['gzip']
+
+
+class Variant(NamedTuple):
+    """Выбранное представление: тип содержимого и сжатие (None — без сжатия)"""
+    mimetype: str
+    encoding: Optional[str]
+
+
+DEFAULT_VARIANT = Variant(JSON_MIMETYPE, None)
+
+
+def negotiate(accept: Optional[str], accept_encoding: Optional[str]) -> Variant:
+    """
+    Вариант по заголовкам Accept и Accept-Encoding. Без заголовков и при
+    */* остается прежний ответ — JSON без сжатия.
+    """
+    mimetype = JSON_MIMETYPE
+    if accept and len(MIMETYPES) > 1:
+        mimetype = parse_accept_header(accept, MIMEAccept).best_match(MIMETYPES, default=JSON_MIMETYPE)
+
+    encoding = None
+    if accept_encoding:
+        encoding = parse_accept_header(accept_encoding, Accept).best_match(ENCODINGS)
+    return Variant(mimetype, encoding)
+
+
+def render(obj, mimetype: str, json_encoder: Callable, default: Callable) -> bytes:
+    """Тело ответа в выбранном формате; default — сериализация Decimal и дат, как в JSON"""
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(obj, default=default, use_bin_type=True)
+    return json_encoder(obj)
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Optional[bytes]:
+    """Сжатое тело или None, если сжатие не выбрано или тело слишком короткое"""
+    if encoding is None or len(body) < MIN_COMPRESS_SIZE:
+        return None
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encode_body(variant: Variant, body: bytes) -> Tuple[bytes, Dict[str, str]]:
+    """Тело в выбранном сжатии и заголовки представления (Content-Encoding — только если сжато)"""
+    headers = {'Content-Type': variant.mimetype, 'Vary': VARY}
+    compressed = compress(body, variant.encoding)
+    if compressed is None:
+        return body, headers
+    headers['Content-Encoding'] = variant.encoding
+    return compressed, headers
+
+
+def request_variant() -> Variant:
+    """Вариант текущего запроса Flask (вычисляется один раз на запрос)"""
+    variant = g.get('response_variant')
+    if variant is None:
+        variant = g.response_variant = negotiate(request.headers.get('Accept'),
+                                                 request.headers.get('Accept-Encoding'))
+    return variant
+
+
+def encode_response(response: Response) -> Response:
+    """
+    Сжатие готового ответа Flask по варианту запроса (after_request). Потоковые,
+    уже сжатые и не JSON/MessagePack ответы не меняются.
+    """
+    if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.mimetype not in MIMETYPES):
+        return response
+
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    compressed = compress(response.get_data(), request_variant().encoding)
+    if compressed is not None:
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = request_variant().encoding
+    return response
@@ -0,0 +1,166 @@
+"""
+Декларативный реестр источников парсинга и планировщик обхода
+"""
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCES_PATH = os.environ.get(
+    "SOURCES_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "sources.json")
+)
+
+# Поддерживаемые способы парсинга источника
+BACKENDS = ("books_to_scrape", "api", "real_site")
+
+# Ограничение «устаревания», чтобы давно забытый источник с низким
+# приоритетом не обгонял важные источники бесконечно
+MAX_STALENESS = 10.0
+
+
+@dataclass
+class CrawlSource:
+    """Описание одного источника парсинга"""
+    name: str
+    category: str
+    urls: List[str] = field(default_factory=list)
+    backend: str = "books_to_scrape"
+    concurrency: int = 1
+    page_budget: int = 1
+    item_budget: int = 25
+    priority: int = 1
+    refresh_interval: int = 86400
+    enabled: bool = True
+    # Потоковый разбор страниц по HTTP вместо Selenium (не для backend 'api')
+    streaming: bool = False
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CrawlSource":
+        """Создание источника из словаря реестра с проверкой полей"""
+        urls = data.get("urls") or ([data["url"]] if data.get("url") else [])
+        source = cls(
+            name=data["name"],
+            category=data["category"],
+            urls=list(urls),
+            backend=data.get("backend", "books_to_scrape"),
+            concurrency=int(data.get("concurrency", 1)),
+            page_budget=int(data.get("page_budget", 1)),
+            item_budget=int(data.get("item_budget", 25)),
+            priority=int(data.get("priority", 1)),
+            refresh_interval=int(data.get("refresh_interval", 86400)),
+            enabled=bool(data.get("enabled", True)),
+            streaming=bool(data.get("streaming", False))
+        )
+
+        if source.backend not in BACKENDS:
+            raise ValueError(f"Источник '{source.name}': неизвестный backend '{source.backend}'")
+        if source.streaming and source.backend == "api":
+            raise ValueError(f"Источник '{source.name}': потоковый режим не поддерживается для backend 'api'")
+        if not source.urls:
+            raise ValueError(f"Источник '{source.name}': не указаны url")
+        if source.concurrency < 1 or source.page_budget < 1 or source.item_budget < 1:
+            raise ValueError(f"Источник '{source.name}': concurrency, page_budget и item_budget должны быть >= 1")
+        if source.refresh_interval <= 0:
+            raise ValueError(f"Источник '{source.name}': refresh_interval должен быть > 0")
+
+        return source
+
+    @property
+    def pages(self) -> List[str]:
+        """Страницы источника в пределах бюджета"""
+        return self.urls[:self.page_budget]
+
+
+class SourceRegistry:
+    """Реестр источников, загружаемый из JSON файла"""
+
+    def __init__(self, sources: List[CrawlSource]):
+        names = [source.name for source in sources]
+        duplicates = {name for name in names if names.count(name) > 1}
+        if duplicates:
+            raise ValueError(f"Повторяющиеся имена источников: {', '.join(sorted(duplicates))}")
+        self.sources = sources
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_SOURCES_PATH) -> "SourceRegistry":
+        """Загрузка реестра из файла"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        sources = [CrawlSource.from_dict(item) for item in data.get("sources", [])]
+        logger.info(f"Загружено {len(sources)} источников из {path}")
+        return cls(sources)
+
+    def enabled(self) -> List[CrawlSource]:
+        """Активные источники"""
+        return [source for source in self.sources if source.enabled]
+
+    def get(self, name: str) -> Optional[CrawlSource]:
+        """Поиск источника по имени"""
+        for source in self.sources:
+            if source.name == name:
+                return source
+        return None
+
+
+class SourceStateStore:
+    """Хранение времени последнего обхода источников в SQLite"""
+
+    def __init__(self, storage):
+        # Таблица source_crawl_state создается миграциями (sqlite_migrations)
+        self.storage = storage
+
+    def last_crawled(self) -> Dict[str, float]:
+        """Время последнего обхода по именам источников"""
+        rows = self.storage.reader().execute('SELECT name, last_crawled_at FROM source_crawl_state').fetchall()
+        return dict(rows)
+
+    def mark_crawled(self, name: str, item_count: int, crawled_at: Optional[float] = None):
+        """Фиксация обхода источника"""
+        with self.storage.write() as conn:
+            conn.execute('''
+                INSERT INTO source_crawl_state (name, last_crawled_at, last_item_count)
+                VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    last_crawled_at = excluded.last_crawled_at,
+                    last_item_count = excluded.last_item_count
+            ''', (name, crawled_at if crawled_at is not None else time.time(), item_count))
+
+
+class CrawlScheduler:
+    """Упорядочивание источников: сначала самые ценные и самые устаревшие"""
+
+    def __init__(self, registry: SourceRegistry, state: SourceStateStore):
+        self.registry = registry
+        self.state = state
+
+    @staticmethod
+    def staleness(source: CrawlSource, last_crawled_at: Optional[float], now: float) -> float:
+        """Сколько интервалов обновления прошло с последнего обхода"""
+        if last_crawled_at is None:
+            return MAX_STALENESS
+        return min((now - last_crawled_at) / source.refresh_interval, MAX_STALENESS)
+
+    def plan(self, include_fresh: bool = False, now: Optional[float] = None) -> List[CrawlSource]:
+        """
+        План обхода. Источник попадает в план, если истек его refresh_interval
+        (или include_fresh=True), и сортируется по priority * staleness.
+        """
+        now = now if now is not None else time.time()
+        last_crawled = self.state.last_crawled()
+
+        scored = []
+        for source in self.registry.enabled():
+            staleness = self.staleness(source, last_crawled.get(source.name), now)
+            if staleness < 1 and not include_fresh:
+                continue
+            scored.append((source.priority * staleness, source.priority, source))
+
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [source for _, _, source in scored]
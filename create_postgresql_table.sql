@@ -22,6 +22,21 @@ CREATE INDEX IF NOT EXISTS idx_books_category ON books_table(category);
 CREATE INDEX IF NOT EXISTS idx_books_author ON books_table(author);
 CREATE INDEX IF NOT EXISTS idx_books_price ON books_table(price);
 CREATE INDEX IF NOT EXISTS idx_books_rating ON books_table(rating);
+-- Уникальные книги по названию и курсорная пагинация (DISTINCT ON (title) ... WHERE title > курсор)
+CREATE INDEX IF NOT EXISTS idx_books_title_created ON books_table(title, created_at DESC);
+-- Фильтр категории без учета регистра со страницами по названию
+CREATE INDEX IF NOT EXISTS idx_books_lower_category_title ON books_table(lower(category), title, created_at DESC);
+-- Поиск /search по подстроке (ILIKE '%q%') и ранжирование word_similarity (pg_trgm)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_books_title_trgm ON books_table USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_books_author_trgm ON books_table USING gin (author gin_trgm_ops) WHERE author IS NOT NULL;
+-- Полнотекстовый поиск /search?mode=fulltext: лексемы русской и английской конфигураций
+ALTER TABLE books_table ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('russian', coalesce(title, '')), 'A') || setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(author, '')), 'B') || setweight(to_tsvector('english', coalesce(author, '')), 'B') ||
+    setweight(to_tsvector('russian', coalesce(category, '')), 'C') || setweight(to_tsvector('english', coalesce(category, '')), 'C')
+) STORED;
+CREATE INDEX IF NOT EXISTS idx_books_search_vector ON books_table USING gin (search_vector);
 
 -- Комментарии к таблице
 COMMENT ON TABLE books_table IS 'Таблица с информацией о книгах из Books to Scrape';
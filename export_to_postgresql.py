@@ -8,6 +8,13 @@ import psycopg2
 import json
 from datetime import datetime
 import os
+import requests
+
+from postgresql_migrations import run_migrations
+
+# API, кэш которого сбрасывается после экспорта
+# Адреса API через запятую (Flask и ASGI) — у каждого свой кэш ответов
+API_URLS = [url.strip() for url in os.environ.get('API_URL', 'http://localhost:5000').split(',') if url.strip()]
 
 def export_to_postgresql():
     """Экспорт данных из SQLite в PostgreSQL"""
@@ -32,27 +39,9 @@ def export_to_postgresql():
         
         print("✅ Подключение к PostgreSQL установлено")
         
-        # Создаем таблицу если не существует
-        create_table_sql = """
-        CREATE TABLE IF NOT EXISTS books_table (
-            id SERIAL PRIMARY KEY,
-            book_id INTEGER,
-            title TEXT NOT NULL,
-            author TEXT,
-            price DECIMAL(10,2),
-            category TEXT,
-            book_url TEXT,
-            image_url TEXT,
-            rating DECIMAL(3,1),
-            availability TEXT DEFAULT 'In stock',
-            parsed_date TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """
-        
-        postgres_cursor.execute(create_table_sql)
-        postgres_conn.commit()
-        print("✅ Таблица books_table создана/проверена")
+        # Таблица и индексы API (в том числе триграммные для /search)
+        applied = run_migrations(postgres_conn)
+        print(f"✅ Таблица books_table создана/проверена, применено миграций: {len(applied)}")
         
         # Очищаем таблицу
         postgres_cursor.execute("DELETE FROM books_table")
@@ -126,6 +115,7 @@ def export_to_postgresql():
         
         postgres_conn.close()
         
+        notify_api_cache_invalidation()
         return True
         
     except Exception as e:
@@ -135,6 +125,21 @@ def export_to_postgresql():
     finally:
         sqlite_conn.close()
 
+def notify_api_cache_invalidation():
+    """Сброс кэша ответов API: данные в PostgreSQL изменились"""
+    for api_url in API_URLS:
+        try:
+            response = requests.post(
+                f"{api_url}/cache/invalidate",
+                json={"reason": "экспорт в PostgreSQL"},
+                headers={"X-Cache-Token": os.environ.get('CACHE_INVALIDATE_TOKEN', '')},
+                timeout=5
+            )
+            response.raise_for_status()
+            print(f"✅ Кэш API ({api_url}) сброшен, поколение {response.json().get('generation')}")
+        except Exception as e:
+            print(f"⚠️ Не удалось сбросить кэш API ({api_url}): {e}")
+
 def test_postgresql_connection():
     """Тестирование подключения к PostgreSQL"""
     
@@ -0,0 +1,101 @@
+"""
+Проверки зависимостей для /readyz: кэшированные результаты с фоновым обновлением
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CachedProbe:
+    """
+    Проверка одной зависимости. Запрос получает последний сохраненный
+    результат и не ждет проверку: устаревший результат обновляется в фоне,
+    и одновременно выполняется не больше одной проверки (single-flight).
+    """
+
+    def __init__(self, name: str, check: Callable[[], Any], ttl: float = 5.0, max_age: Optional[float] = None):
+        self.name = name
+        self.check = check
+        self.ttl = ttl
+        # Результат старше max_age не считается готовностью (проверка зависла)
+        self.max_age = max_age if max_age is not None else ttl * 6
+        self._result: Optional[Dict] = None
+        # Проверки выполняет один долгоживущий поток: ресурсы, закрепленные
+        # за потоком (например, соединение-читатель SQLite), создаются один раз
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def refresh(self):
+        """Синхронная проверка с замером задержки"""
+        started = time.perf_counter()
+        try:
+            detail = self.check()
+            ok, error = True, None
+        except Exception as e:
+            detail, ok, error = None, False, str(e)
+            logger.warning(f"Проверка {self.name} не пройдена: {e}")
+
+        self._result = {
+            "ok": ok,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+            "checked_at": time.time(),
+            "error": error,
+            "detail": detail
+        }
+
+    def refresh_async(self):
+        """Фоновая проверка; запросы во время выполняющейся проверки схлопываются в одну"""
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=f"probe-{self.name}", daemon=True)
+                self._worker.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.refresh()
+
+    def status(self, now: Optional[float] = None) -> Dict:
+        """Последний результат без ожидания проверки"""
+        now = now if now is not None else time.time()
+        result = self._result
+
+        if result is None or now - result["checked_at"] >= self.ttl:
+            self.refresh_async()
+        if result is None:
+            return {"ok": False, "latency_ms": None, "checked_at": None, "age": None,
+                    "error": "проверка еще не выполнялась", "detail": None}
+
+        age = now - result["checked_at"]
+        status = dict(result, age=round(age, 3))
+        if age > self.max_age:
+            status["ok"] = False
+            status["error"] = f"результат устарел ({age:.0f} с), проверка не завершается"
+        return status
+
+
+class ReadinessChecker:
+    """Готовность сервиса: все зависимости доступны по последним проверкам"""
+
+    def __init__(self, probes: List[CachedProbe]):
+        self.probes = probes
+
+    def start(self):
+        """Первичные проверки в фоне, чтобы к первому запросу были результаты"""
+        for probe in self.probes:
+            probe.refresh_async()
+
+    def status(self) -> Dict:
+        now = time.time()
+        checks = {probe.name: probe.status(now) for probe in self.probes}
+        return {
+            "ready": all(check["ok"] for check in checks.values()),
+            "checks": checks
+        }
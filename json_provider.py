@@ -0,0 +1,119 @@
+"""
+Сериализация JSON ответов API: стандартный json или orjson (необязательная зависимость).
+
+Кодировщик выбирается переменной JSON_PROVIDER:
+    json        — стандартная библиотека, побайтно как Flask jsonify
+    orjson      — orjson с тем же форматом значений (по умолчанию, если установлен)
+    orjson-iso  — orjson с собственной сериализацией дат в ISO 8601 (быстрее всего,
+                  но меняет формат дат в ответах)
+Decimal во всех вариантах выгружается строкой, как у Flask.
+"""
+
+import dataclasses
+import decimal
+import json
+import os
+import uuid
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Optional
+
+from flask import has_request_context
+from flask.json.provider import JSONProvider
+
+from content_negotiation import DEFAULT_VARIANT, render, request_variant
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+Encoder = Callable[[Any], bytes]
+
+_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def http_date(value: date) -> str:
+    """Дата в формате HTTP (RFC 822), как werkzeug.http.http_date, без обращения к email.utils"""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        clock = f"{value.hour:02d}:{value.minute:02d}:{value.second:02d}"
+    else:
+        clock = "00:00:00"
+    return f"{_DAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} {clock} GMT"
+
+
+def json_default(value):
+    """Значения, которые Flask jsonify сериализует сам: даты, Decimal, UUID, dataclass"""
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_encoder(obj) -> bytes:
+    return (json.dumps(obj, default=json_default, ensure_ascii=True, sort_keys=True,
+                       separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def _orjson_encoder(iso_dates: bool) -> Encoder:
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+    if not iso_dates:
+        # Даты передаются в json_default, чтобы сохранить формат HTTP как у Flask
+        option |= orjson.OPT_PASSTHROUGH_DATETIME
+
+    def encode(obj) -> bytes:
+        return orjson.dumps(obj, default=json_default, option=option)
+
+    return encode
+
+
+def default_provider_name() -> str:
+    return os.environ.get('JSON_PROVIDER') or ('orjson' if orjson is not None else 'json')
+
+
+def make_encoder(name: str) -> Encoder:
+    """Кодировщик по имени. ValueError — неизвестное имя или orjson не установлен"""
+    if name == 'json':
+        return _json_encoder
+    if name in ('orjson', 'orjson-iso'):
+        if orjson is None:
+            raise ValueError(f"JSON_PROVIDER={name} требует пакет orjson")
+        return _orjson_encoder(iso_dates=name == 'orjson-iso')
+    raise ValueError(f"Неизвестный JSON_PROVIDER: {name} (json, orjson, orjson-iso)")
+
+
+class FastJSONProvider(JSONProvider):
+    """
+    JSON провайдер Flask поверх кодировщика из make_encoder. jsonify отдает
+    представление, согласованное по Accept (JSON или MessagePack).
+    """
+
+    mimetype = 'application/json'
+
+    def __init__(self, app, encoder: Encoder):
+        super().__init__(app)
+        self.encoder = encoder
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return self.encoder(obj).decode('utf-8').rstrip('\n')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return orjson.loads(s) if orjson is not None else json.loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        variant = request_variant() if has_request_context() else DEFAULT_VARIANT
+        body = render(obj, variant.mimetype, self.encoder, json_default)
+        return self._app.response_class(body, mimetype=variant.mimetype)
+
+
+def init_app(app, name: Optional[str] = None) -> str:
+    """Подключение кодировщика к приложению Flask. Возвращает имя выбранного кодировщика"""
+    name = name or default_provider_name()
+    app.json = FastJSONProvider(app, make_encoder(name))
+    return name
@@ -0,0 +1,40 @@
+"""
+Курсорная (keyset) пагинация: непрозрачный курсор со значениями ключа сортировки
+"""
+
+import base64
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Курсор из значений ключа последней строки страницы"""
+    raw = json.dumps(values, ensure_ascii=False, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    """Значения ключа из курсора. ValueError — курсор поврежден или от другого списка"""
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Некорректный курсор: {e}")
+
+    if not isinstance(values, dict) or set(values) != set(fields):
+        raise ValueError("Некорректный курсор: неожиданный набор полей")
+    return values
+
+
+def paginate(rows: List[Dict], limit: int, key: Callable[[Dict], Dict[str, Any]]) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Страница и курсор следующей. rows должны быть запрошены с LIMIT limit + 1:
+    лишняя строка означает, что следующая страница есть.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(key(page[-1]))
@@ -0,0 +1,122 @@
+"""
+Фоновая очередь задач парсинга для API
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Статусы задачи
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+class ParseJob:
+    """Задача парсинга и ее прогресс"""
+
+    def __init__(self, key: str, params: Dict):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = QUEUED
+        self.processed = 0
+        self.target = 0
+        self.result: Dict = {}
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def update_progress(self, processed: int, target: int):
+        """Колбэк прогресса для парсера"""
+        self.processed = processed
+        self.target = target
+
+    def to_dict(self) -> Dict:
+        """Представление задачи для API"""
+        finished = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "progress": {
+                "processed": self.processed,
+                "target": self.target
+            },
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": round(finished - self.started_at, 3) if self.started_at else None
+        }
+
+
+class ParseJobQueue:
+    """
+    Очередь задач с фоновым исполнителем. Повторная отправка задачи с тем же
+    ключом, пока предыдущая не завершилась, возвращает уже существующую задачу.
+    """
+
+    def __init__(self, max_workers: int = 1, history_size: int = 50):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="parse-job")
+        self._jobs: "OrderedDict[str, ParseJob]" = OrderedDict()
+        self._active: Dict[str, ParseJob] = {}
+        self._lock = threading.Lock()
+        self.history_size = history_size
+
+    def submit(self, key: str, func: Callable[[ParseJob], Dict], **params) -> Tuple[ParseJob, bool]:
+        """Постановка задачи. Возвращает (задача, создана_ли_новая)"""
+        with self._lock:
+            active = self._active.get(key)
+            if active is not None and active.status in ACTIVE_STATUSES:
+                return active, False
+
+            job = ParseJob(key, params)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._trim_history()
+
+        self._executor.submit(self._run, job, func)
+        logger.info(f"Задача парсинга {job.id} поставлена в очередь")
+        return job, True
+
+    def get(self, job_id: str) -> Optional[ParseJob]:
+        """Поиск задачи по id"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: ParseJob, func: Callable[[ParseJob], Dict]):
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = func(job) or {}
+            job.status = DONE
+            logger.info(f"Задача парсинга {job.id} завершена: {job.result}")
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            logger.error(f"Задача парсинга {job.id} завершилась ошибкой: {e}")
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+
+    def _trim_history(self):
+        # Храним только последние завершенные задачи
+        while len(self._jobs) > self.history_size:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status in ACTIVE_STATUSES:
+                break
+            del self._jobs[oldest_id]
@@ -0,0 +1,180 @@
+"""
+Версионные миграции схемы PostgreSQL: books_table и индексы API
+
+    python postgresql_migrations.py [--host ... --port ...]
+
+Миграции применяет export_to_postgresql.py перед загрузкой данных; API
+схему не меняет.
+"""
+
+import argparse
+import logging
+import time
+from typing import Callable, Dict, List, Tuple
+
+from postgresql_parser import FULLTEXT_CONFIGS, PostgreSQLParser
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_xact_lock: одновременные запуски применяют миграции по очереди
+MIGRATIONS_LOCK_ID = 720049
+
+
+def _create_books_table(cur):
+    """Исходная таблица книг"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS books_table (
+            id SERIAL PRIMARY KEY,
+            book_id INTEGER,
+            title TEXT NOT NULL,
+            author TEXT,
+            price DECIMAL(10,2),
+            category TEXT,
+            book_url TEXT,
+            image_url TEXT,
+            rating DECIMAL(3,1),
+            availability TEXT DEFAULT 'In stock',
+            parsed_date TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _listing_indexes(cur):
+    """Индексы для DISTINCT ON (title), курсорной пагинации и фильтра категории"""
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_books_title_created ON books_table(title, created_at DESC)')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_books_lower_category_title
+        ON books_table(lower(category), title, created_at DESC)
+    ''')
+
+
+def _trigram_search(cur):
+    """
+    Триграммные GIN индексы pg_trgm для поиска по подстроке (ILIKE '%q%'):
+    время поиска зависит от числа совпадений, а не от размера таблицы.
+    Индекс по автору частичный — у большинства книг автор не указан.
+    """
+    cur.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_books_title_trgm ON books_table USING gin (title gin_trgm_ops)')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_books_author_trgm ON books_table USING gin (author gin_trgm_ops)
+        WHERE author IS NOT NULL
+    ''')
+    cur.execute('ANALYZE books_table')
+
+
+def _fulltext_search(cur):
+    """
+    Полнотекстовый поиск: вычисляемая колонка search_vector с лексемами
+    русской и английской конфигураций (веса: название A, автор B,
+    категория C) и GIN индекс по ней. Добавление колонки перезаписывает таблицу.
+    """
+    parts = []
+    for column, weight in (('title', 'A'), ('author', 'B'), ('category', 'C')):
+        for config in FULLTEXT_CONFIGS:
+            parts.append(f"setweight(to_tsvector('{config}', coalesce({column}, '')), '{weight}')")
+    cur.execute(f'''
+        ALTER TABLE books_table ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS ({' || '.join(parts)}) STORED
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_books_search_vector ON books_table USING gin (search_vector)')
+    cur.execute('ANALYZE books_table')
+
+
+# Порядок применения миграций. Номера не переиспользуются, новые — только в конец
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'books_table', _create_books_table),
+    (2, 'listing_indexes', _listing_indexes),
+    (3, 'trigram_search', _trigram_search),
+    (4, 'fulltext_search', _fulltext_search),
+]
+
+
+def run_migrations(conn) -> List[Dict]:
+    """
+    Применение недостающих миграций на соединении psycopg2, каждой в своей
+    транзакции. Возвращает список примененных миграций с длительностью.
+    """
+    started = time.perf_counter()
+    report = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATIONS_LOCK_ID,))
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    duration_ms REAL NOT NULL
+                )
+            ''')
+        conn.commit()
+
+        for version, name, migrate in MIGRATIONS:
+            with conn.cursor() as cur:
+                # Проверка под блокировкой: другой процесс мог применить миграцию раньше
+                cur.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATIONS_LOCK_ID,))
+                cur.execute('SELECT 1 FROM schema_migrations WHERE version = %s', (version,))
+                if cur.fetchone():
+                    conn.commit()
+                    continue
+
+                migration_started = time.perf_counter()
+                migrate(cur)
+                duration_ms = round((time.perf_counter() - migration_started) * 1000, 3)
+                cur.execute(
+                    'INSERT INTO schema_migrations (version, name, duration_ms) VALUES (%s, %s, %s)',
+                    (version, name, duration_ms)
+                )
+            conn.commit()
+
+            logger.info(f"Миграция PostgreSQL {version} ({name}) применена за {duration_ms} мс")
+            report.append({"version": version, "name": name, "duration_ms": duration_ms})
+    except Exception:
+        conn.rollback()
+        raise
+
+    total_ms = round((time.perf_counter() - started) * 1000, 3)
+    if report:
+        logger.info(f"Применено миграций PostgreSQL: {len(report)} за {total_ms} мс")
+    else:
+        logger.info(f"Схема PostgreSQL актуальна, проверка миграций заняла {total_ms} мс")
+    return report
+
+
+def schema_version(conn) -> int:
+    """Текущая версия схемы (0 — миграции не применялись)"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            return 0
+        cur.execute('SELECT MAX(version) FROM schema_migrations')
+        return cur.fetchone()[0] or 0
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Миграции схемы PostgreSQL")
+    arg_parser.add_argument('--host')
+    arg_parser.add_argument('--port', type=int)
+    arg_parser.add_argument('--database')
+    arg_parser.add_argument('--user')
+    arg_parser.add_argument('--password')
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = PostgreSQLParser()
+    for key in ('host', 'port', 'database', 'user', 'password'):
+        if getattr(args, key) is not None:
+            parser.postgres_config[key] = getattr(args, key)
+
+    try:
+        with parser.checkout() as conn:
+            run_migrations(conn)
+            print(f"✅ Версия схемы PostgreSQL: {schema_version(conn)}")
+    finally:
+        parser.disconnect()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,109 +4,485 @@
 """
 
 import psycopg2
-from typing import List, Dict
+import psycopg2.extensions
+import psycopg2.pool
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Optional, Sequence, Tuple
 import logging
+import threading
+import time
+import uuid
+
+from book_filters import BookFilters
 
 logger = logging.getLogger(__name__)
 
+BOOK_COLUMNS = """id, book_id, title, author, price, category, book_url, image_url, 
+                rating, availability, parsed_date, created_at"""
+BOOK_COLUMN_NAMES = [name.strip() for name in BOOK_COLUMNS.split(',')]
+
+POSTGRES_CONFIG = {
+    'host': 'postgresql-grigson69.alwaysdata.net',
+    'port': 5432,
+    'database': 'grigson69_2',
+    'user': 'grigson69',
+    'password': 'grigson96911',
+    'connect_timeout': 5
+}
+
+# Конфигурации полнотекстового поиска: лексемы обеих есть в search_vector,
+# запрос разбирается каждой. Первая выделяет слова в headline
+FULLTEXT_CONFIGS = ('russian', 'english')
+
+# Запросы статистики (общие для синхронного и асинхронного клиентов)
+TOTAL_BOOKS_SQL = """
+                SELECT COUNT(DISTINCT title) 
+                FROM books_table
+            """
+CATEGORY_COUNTS_SQL = """
+                SELECT category, COUNT(DISTINCT title) as count
+                FROM books_table 
+                GROUP BY category
+            """
+AVERAGE_PRICE_SQL = """
+                SELECT AVG(price) 
+                FROM books_table 
+                WHERE price IS NOT NULL
+            """
+
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Колонки из параметра fields (через запятую) в порядке BOOK_COLUMN_NAMES.
+    title включается всегда — это ключ сортировки и курсора страницы.
+    None — все колонки. ValueError — неизвестное поле.
+    """
+    if not value:
+        return None
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested.difference(BOOK_COLUMN_NAMES)
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    requested.add('title')
+    return tuple(name for name in BOOK_COLUMN_NAMES if name in requested)
+
+
+def book_columns(fields: Optional[Sequence[str]] = None) -> str:
+    """Список колонок SELECT: только известные имена, поэтому безопасен для подстановки в SQL"""
+    if not fields:
+        return BOOK_COLUMNS
+    unknown = set(fields).difference(BOOK_COLUMN_NAMES)
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    return ', '.join(fields)
+
+
+def latest_books_query(candidate_conditions: Optional[List[str]] = None,
+                       columns: str = BOOK_COLUMNS) -> str:
+    """
+    Подзапрос с самой новой записью каждого названия. Фильтры применяются
+    снаружи, к этим записям: иначе старая запись, подходящая под фильтр,
+    выдавалась бы вместо новой. candidate_conditions сужают названия до тех,
+    у которых хоть одна запись подходит (индексы поиска)
+    """
+    where = ""
+    if candidate_conditions:
+        where = f"WHERE title IN (SELECT title FROM books_table WHERE {' AND '.join(candidate_conditions)})"
+    return f"""
+            SELECT DISTINCT ON (title) {columns}
+            FROM books_table
+            {where}
+            ORDER BY title, created_at DESC, id DESC
+        """
+
+
+# Запись — самая новая для своего названия (тот же порядок, что в latest_books_query)
+LATEST_ROW_CONDITION = """NOT EXISTS (
+            SELECT 1 FROM books_table newer
+            WHERE newer.title = books_table.title
+              AND (newer.created_at, newer.id) > (books_table.created_at, books_table.id)
+        )"""
+
+
+def unique_books_query(conditions: List[str], params: List, after_title: Optional[str],
+                       limit: Optional[int], fields: Optional[Sequence[str]] = None) -> Tuple[str, List]:
+    """
+    Запрос уникальных по названию книг (самая новая запись) с условиями
+    WHERE и курсором страницы: все фильтры выполняются в одном запросе.
+    Кандидаты — записи, подходящие под фильтры и курсор (их выбирают индексы
+    по категории, цене или названию в порядке title), проверка «запись самая
+    новая» выполняется для каждого кандидата отдельно (LATEST_ROW_CONDITION).
+    limit=None — без ограничения (потоковая выгрузка), fields — проекция колонок
+    """
+    conditions = list(conditions)
+    params = list(params)
+    if after_title is not None:
+        conditions.append("title > %s")
+        params.append(after_title)
+    conditions.append(LATEST_ROW_CONDITION)
+    query = f"""
+        SELECT {book_columns(fields)}
+        FROM books_table
+        WHERE {' AND '.join(conditions)}
+        ORDER BY title
+        """
+    if limit is not None:
+        query += "LIMIT %s\n"
+        params.append(limit)
+    return query, params
+
+
+def rounded_rank(expression: str) -> str:
+    """
+    Релевантность, округленная до float8: одинаковое значение rank у psycopg2
+    и asyncpg и точное сравнение с rank из курсора страницы
+    """
+    return f"round(({expression})::numeric, 4)::float8"
+
+
+def rank_cursor_condition(after: Optional[Dict]) -> Tuple[str, List]:
+    """WHERE для страницы после курсора {"rank", "title"} при ORDER BY rank DESC, title"""
+    if after is None:
+        return "", []
+    return ("WHERE (rank < %s OR (rank = %s AND title > %s))",
+            [after['rank'], after['rank'], after['title']])
+
+
+def search_books_query(query: str, filters: Optional[BookFilters], after: Optional[Dict],
+                       limit: int, fields: Optional[Sequence[str]] = None) -> Tuple[str, List]:
+    """
+    Поиск по подстроке в названии и авторе (ILIKE через триграммные GIN
+    индексы pg_trgm, см. postgresql_migrations) вместе с фильтрами. Книги
+    упорядочены по релевантности rank — word_similarity запроса с названием
+    или автором, — затем по названию. after — курсор {"rank", "title"}.
+    """
+    search_term = f"%{query}%"
+    conditions, params = (filters or BookFilters()).compile()
+    conditions.insert(0, "(title ILIKE %s OR author ILIKE %s)")
+    params[:0] = [search_term, search_term]
+    rank = rounded_rank("GREATEST(word_similarity(%s, title), word_similarity(%s, author))")
+    where = ' AND '.join(conditions)
+
+    cursor_where, cursor_params = rank_cursor_condition(after)
+    sql = f"""
+        SELECT * FROM (
+            SELECT {book_columns(fields)}, {rank} AS rank
+            FROM ({latest_books_query(conditions)}) latest
+            WHERE {where}
+        ) books
+        {cursor_where}
+        ORDER BY rank DESC, title
+        LIMIT %s
+        """
+    return sql, [query, query] + params + params + cursor_params + [limit]
+
+
+def fulltext_query(query: str) -> Tuple[str, List]:
+    """tsquery запроса в синтаксисе websearch (слова, "фраза", or, -слово) для всех FULLTEXT_CONFIGS"""
+    sql = ' || '.join(f"websearch_to_tsquery('{config}', %s)" for config in FULLTEXT_CONFIGS)
+    return f"({sql})", [query] * len(FULLTEXT_CONFIGS)
+
+
+def fulltext_search_query(query: str, filters: Optional[BookFilters], after: Optional[Dict],
+                          limit: int, fields: Optional[Sequence[str]] = None) -> Tuple[str, List]:
+    """
+    Полнотекстовый поиск по search_vector (GIN индекс, см. postgresql_migrations)
+    с фильтрами: книги по убыванию ts_rank, затем по названию. headline —
+    название и автор с выделенными словами запроса; ts_headline вычисляется
+    только для строк страницы. after — курсор {"rank", "title"}.
+    """
+    tsquery, tsquery_params = fulltext_query(query)
+    conditions, params = (filters or BookFilters()).compile()
+    conditions.insert(0, f"search_vector @@ {tsquery}")
+    params[:0] = tsquery_params
+    rank = rounded_rank(f"ts_rank(search_vector, {tsquery})")
+    where = ' AND '.join(conditions)
+
+    cursor_where, cursor_params = rank_cursor_condition(after)
+    columns = book_columns(fields)
+    sql = f"""
+        SELECT {columns}, rank, ts_headline('{FULLTEXT_CONFIGS[0]}', headline_text, {tsquery}) AS headline
+        FROM (
+            SELECT * FROM (
+                SELECT {columns}, concat_ws(', ', title, author) AS headline_text, {rank} AS rank
+                FROM ({latest_books_query(conditions, columns=f"{BOOK_COLUMNS}, search_vector")}) latest
+                WHERE {where}
+            ) ranked
+            {cursor_where}
+            ORDER BY rank DESC, title
+            LIMIT %s
+        ) books
+        ORDER BY rank DESC, title
+        """
+    params = tsquery_params + tsquery_params + params + params + cursor_params + [limit]
+    return sql, params
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Соединение пула с временем последнего возврата (для проверки перед выдачей)"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_used = time.monotonic()
+
+
 class PostgreSQLParser:
-    """Парсер для работы с PostgreSQL базой данных"""
-    
-    def __init__(self):
-        """Инициализация подключения к PostgreSQL"""
-        self.postgres_config = {
-            'host': 'postgresql-grigson69.alwaysdata.net',
-            'port': 5432,
-            'database': 'grigson69_2',
-            'user': 'grigson69',
-            'password': 'grigson96911'
-        }
-        self.connection = None
+    """
+    Парсер для работы с PostgreSQL базой данных.
+
+    Соединения берутся из ThreadedConnectionPool через checkout(): каждый
+    поток получает свое соединение, транзакция завершается при возврате,
+    разорванные соединения закрываются и заменяются новыми.
+    """
+    
+    def __init__(self, min_connections: int = 1, max_connections: int = 10,
+                 checkout_timeout: float = 30.0, pre_ping_after: float = 10.0):
+        """
+        Инициализация параметров пула (соединения создаются при первом обращении).
+        min_connections соединений остаются открытыми между запросами: лишние
+        psycopg2 закрывает при возврате в пул.
+        """
+        self.postgres_config = dict(POSTGRES_CONFIG)
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        # Сколько ждать свободного соединения, прежде чем вернуть ошибку
+        self.checkout_timeout = checkout_timeout
+        # Соединение, простоявшее дольше, проверяется SELECT 1 перед выдачей
+        self.pre_ping_after = pre_ping_after
+        self.pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+        
+        # ThreadedConnectionPool не ждет свободного соединения, а бросает PoolError:
+        # очередь ожидающих потоков обеспечивает семафор
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._reconnects = 0
         
     def connect(self):
-        """Подключение к PostgreSQL"""
+        """Создание пула соединений к PostgreSQL"""
         try:
-            self.connection = psycopg2.connect(**self.postgres_config)
-            logger.info("✅ Подключение к PostgreSQL установлено")
+            self._ensure_pool()
             return True
         except Exception as e:
             logger.error(f"❌ Ошибка подключения к PostgreSQL: {e}")
             return False
     
+    def _ensure_pool(self) -> psycopg2.pool.ThreadedConnectionPool:
+        """Пул соединений; создается при первом обращении (исключение — БД недоступна)"""
+        with self._lock:
+            if self.pool is None:
+                self.pool = psycopg2.pool.ThreadedConnectionPool(
+                    self.min_connections, self.max_connections,
+                    connection_factory=PooledConnection, **self.postgres_config
+                )
+                logger.info("✅ Подключение к PostgreSQL установлено")
+            return self.pool
+    
     def disconnect(self):
-        """Отключение от PostgreSQL"""
-        if self.connection:
-            self.connection.close()
+        """Закрытие всех соединений пула"""
+        with self._lock:
+            pool, self.pool = self.pool, None
+        if pool:
+            pool.closeall()
             logger.info("✅ Отключение от PostgreSQL")
     
-    def get_unique_books_from_db(self, limit: int = 100) -> List[Dict]:
-        """Получение уникальных книг из PostgreSQL (без дубликатов)"""
-        if not self.connection:
-            if not self.connect():
-                return []
+    def _acquire_slot(self):
+        started = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.checkout_timeout)
+        finally:
+            waited = time.monotonic() - started
+            with self._lock:
+                self._waiting -= 1
+                if acquired:
+                    self._in_use += 1
+                    self._checkouts += 1
+                    self._wait_total += waited
+                    self._wait_max = max(self._wait_max, waited)
+                else:
+                    self._timeouts += 1
+        if not acquired:
+            raise psycopg2.pool.PoolError(
+                f"Нет свободного соединения PostgreSQL за {self.checkout_timeout} с"
+            )
+    
+    def _release_slot(self):
+        with self._lock:
+            self._in_use -= 1
+        self._slots.release()
+    
+    def _discard(self, pool, conn):
+        """Закрытие разорванного соединения: пул создаст новое при следующем запросе"""
+        with self._lock:
+            self._reconnects += 1
+        if not pool.closed:
+            pool.putconn(conn, close=True)
+    
+    def _get_live_connection(self, pool):
+        """Соединение из пула; простоявшее дольше pre_ping_after проверяется SELECT 1"""
+        conn = pool.getconn()
+        if conn.closed:
+            self._discard(pool, conn)
+            return pool.getconn()
+        
+        if time.monotonic() - conn.last_used < self.pre_ping_after:
+            return conn
         
         try:
-            cursor = self.connection.cursor()
-            
-            # Получаем уникальные книги по названию, берем самую новую запись для каждого
-            query = """
-            SELECT DISTINCT ON (title) 
-                id, book_id, title, author, price, category, book_url, image_url, 
-                rating, availability, parsed_date, created_at
-            FROM books_table 
-            ORDER BY title, created_at DESC 
-            LIMIT %s
-            """
-            
-            cursor.execute(query, (limit,))
-            columns = [desc[0] for desc in cursor.description]
-            books = []
-            
-            for row in cursor.fetchall():
-                book = dict(zip(columns, row))
-                books.append(book)
-            
-            cursor.close()
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            logger.warning(f"⚠️ Соединение PostgreSQL разорвано, переподключение: {e}")
+            self._discard(pool, conn)
+            return pool.getconn()
+    
+    @contextmanager
+    def checkout(self) -> Iterator:
+        """
+        Соединение из пула на время блока. Успешный блок фиксирует транзакцию,
+        ошибка откатывает ее; разорванное соединение закрывается, а не
+        возвращается в пул. Если все соединения заняты, поток ждет
+        checkout_timeout секунд и получает PoolError.
+        """
+        pool = self._ensure_pool()
+        
+        self._acquire_slot()
+        conn = None
+        try:
+            conn = self._get_live_connection(pool)
+            try:
+                yield conn
+            except BaseException:
+                if not conn.closed:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        pass
+                raise
+            else:
+                conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            if conn is not None:
+                self._discard(pool, conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                if conn.closed:
+                    self._discard(pool, conn)
+                elif not pool.closed:
+                    conn.last_used = time.monotonic()
+                    pool.putconn(conn)
+            self._release_slot()
+    
+    def pool_stats(self) -> Dict:
+        """Загрузка пула: занятые соединения, ожидающие потоки и время ожидания"""
+        with self._lock:
+            return {
+                "max_connections": self.max_connections,
+                "in_use": self._in_use,
+                "idle": len(self.pool._pool) if self.pool else 0,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "wait_avg_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+                "timeouts": self._timeouts,
+                "reconnects": self._reconnects
+            }
+    
+    def ping(self) -> Dict:
+        """Проверка доступности PostgreSQL запросом SELECT 1 (исключение — БД недоступна)"""
+        with self.checkout() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            server_version = conn.server_version
+        
+        return {"server_version": server_version}
+    
+    def _fetch_books(self, query: str, params: List) -> List[Dict]:
+        with self.checkout() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                columns = [desc[0] for desc in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def get_unique_books_from_db(self, limit: int = 100, after_title: Optional[str] = None,
+                                 filters: Optional[BookFilters] = None,
+                                 fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """
+        Получение уникальных книг из PostgreSQL (без дубликатов) в порядке названий.
+        after_title — название последней книги предыдущей страницы: страница
+        читается диапазоном индекса (title, created_at DESC), глубина не влияет на цену.
+        fields — выбираемые колонки (см. parse_fields), None — все.
+        """
+        try:
+            conditions, params = (filters or BookFilters()).compile()
+            books = self._fetch_books(*unique_books_query(conditions, params, after_title, limit, fields))
             logger.info(f"📚 Получено {len(books)} уникальных книг из PostgreSQL")
             return books
             
         except Exception as e:
             logger.error(f"❌ Ошибка при получении книг из PostgreSQL: {e}")
-            return []
+            raise
     
-    def get_stats(self) -> Dict:
-        """Получение статистики из PostgreSQL"""
-        if not self.connection:
-            if not self.connect():
-                return {"total_products": 0, "categories": {}, "average_price": 0}
+    def iter_book_batches(self, filters: Optional[BookFilters] = None, batch_size: int = 1000,
+                          fields: Optional[Sequence[str]] = None) -> Iterator[List[Dict]]:
+        """
+        Все уникальные книги (как get_unique_books_from_db, без LIMIT) пачками по
+        batch_size строк из именованного курсора на стороне сервера: в памяти
+        одна пачка при любом размере каталога. Соединение пула занято, пока
+        генератор не исчерпан или не закрыт. Ошибки не подавляются — потоковый
+        ответ должен оборваться, а не выглядеть завершенным.
+        """
+        conditions, params = (filters or BookFilters()).compile()
+        query, params = unique_books_query(conditions, params, None, None, fields)
         
+        with self.checkout() as conn:
+            with conn.cursor(name=f"export_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    columns = [desc[0] for desc in cursor.description]
+                    yield [dict(zip(columns, row)) for row in rows]
+    
+    def get_book_by_id(self, book_id: int) -> Optional[Dict]:
+        """Книга по первичному ключу"""
         try:
-            cursor = self.connection.cursor()
-            
-            # Общее количество уникальных книг
-            cursor.execute("""
-                SELECT COUNT(DISTINCT title) 
-                FROM books_table
-            """)
-            total_products = cursor.fetchone()[0]
+            books = self._fetch_books(f"SELECT {BOOK_COLUMNS} FROM books_table WHERE id = %s", [book_id])
+            return books[0] if books else None
             
-            # Статистика по категориям
-            cursor.execute("""
-                SELECT category, COUNT(DISTINCT title) as count
-                FROM books_table 
-                GROUP BY category
-            """)
-            categories = dict(cursor.fetchall())
-            
-            # Средняя цена
-            cursor.execute("""
-                SELECT AVG(price) 
-                FROM books_table 
-                WHERE price IS NOT NULL
-            """)
-            avg_price = cursor.fetchone()[0] or 0
-            
-            cursor.close()
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении книги {book_id}: {e}")
+            raise
+    
+    def get_stats(self) -> Dict:
+        """Получение статистики из PostgreSQL"""
+        try:
+            with self.checkout() as conn, conn.cursor() as cursor:
+                # Общее количество уникальных книг
+                cursor.execute(TOTAL_BOOKS_SQL)
+                total_products = cursor.fetchone()[0]
+                
+                # Статистика по категориям
+                cursor.execute(CATEGORY_COUNTS_SQL)
+                categories = dict(cursor.fetchall())
+                
+                # Средняя цена
+                cursor.execute(AVERAGE_PRICE_SQL)
+                avg_price = cursor.fetchone()[0] or 0
             
             return {
                 "total_products": total_products,
@@ -116,41 +492,38 @@ class PostgreSQLParser:
             
         except Exception as e:
             logger.error(f"❌ Ошибка при получении статистики: {e}")
-            return {"total_products": 0, "categories": {}, "average_price": 0}
+            raise
     
-    def search_books(self, query: str, limit: int = 50) -> List[Dict]:
-        """Поиск книг в PostgreSQL"""
-        if not self.connection:
-            if not self.connect():
-                return []
-        
+    def search_books(self, query: str, limit: int = 50, after: Optional[Dict] = None,
+                     filters: Optional[BookFilters] = None,
+                     fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """
+        Поиск книг по названию и автору с фильтрами (категория, цены, рейтинг)
+        в одном параметризованном запросе, по убыванию релевантности rank.
+        after — курсор страницы {"rank", "title"}.
+        """
         try:
-            cursor = self.connection.cursor()
-            
-            # Поиск по названию и автору
-            search_query = """
-            SELECT DISTINCT ON (title) 
-                id, book_id, title, author, price, category, book_url, image_url, 
-                rating, availability, parsed_date, created_at
-            FROM books_table 
-            WHERE LOWER(title) LIKE LOWER(%s) OR LOWER(author) LIKE LOWER(%s)
-            ORDER BY title, created_at DESC 
-            LIMIT %s
-            """
-            
-            search_term = f"%{query}%"
-            cursor.execute(search_query, (search_term, search_term, limit))
-            columns = [desc[0] for desc in cursor.description]
-            books = []
-            
-            for row in cursor.fetchall():
-                book = dict(zip(columns, row))
-                books.append(book)
-            
-            cursor.close()
+            books = self._fetch_books(*search_books_query(query, filters, after, limit, fields))
             logger.info(f"🔍 Найдено {len(books)} книг по запросу '{query}'")
             return books
             
         except Exception as e:
             logger.error(f"❌ Ошибка при поиске книг: {e}")
-            return []
+            raise
+    
+    def fulltext_search(self, query: str, limit: int = 50, after: Optional[Dict] = None,
+                        filters: Optional[BookFilters] = None,
+                        fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """
+        Полнотекстовый поиск по названию, автору и категории с учетом форм
+        слов (русский и английский): книги по убыванию ts_rank с полем headline.
+        after — курсор страницы {"rank", "title"}.
+        """
+        try:
+            books = self._fetch_books(*fulltext_search_query(query, filters, after, limit, fields))
+            logger.info(f"🔍 Полнотекстовый поиск '{query}': найдено {len(books)} книг")
+            return books
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка полнотекстового поиска: {e}")
+            raise
@@ -0,0 +1,147 @@
+"""
+Компактная история цен и наличия товаров (только изменения)
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional
+
+# Наличие хранится целым числом
+AVAILABILITY_UNKNOWN = 0
+AVAILABILITY_IN_STOCK = 1
+AVAILABILITY_OUT_OF_STOCK = 2
+AVAILABILITY_PREORDER = 3
+
+AVAILABILITY_NAMES = {
+    AVAILABILITY_UNKNOWN: 'unknown',
+    AVAILABILITY_IN_STOCK: 'in_stock',
+    AVAILABILITY_OUT_OF_STOCK: 'out_of_stock',
+    AVAILABILITY_PREORDER: 'preorder',
+}
+
+# Новое наблюдение пишется, только если цена или наличие отличаются от
+# последнего наблюдения товара. В одну секунду остается последнее значение.
+RECORD_OBSERVATION_SQL = '''
+    INSERT INTO price_history (product_id, observed_at, price_minor, availability)
+    SELECT p.id, :observed_at, :price_minor, :availability
+    FROM products p
+    WHERE p.natural_key = :natural_key
+      AND NOT EXISTS (
+          SELECT 1 FROM (
+              SELECT price_minor, availability FROM price_history
+              WHERE product_id = p.id
+              ORDER BY observed_at DESC
+              LIMIT 1
+          ) last
+          WHERE last.price_minor IS :price_minor AND last.availability = :availability
+      )
+    ON CONFLICT(product_id, observed_at) DO UPDATE SET
+        price_minor = excluded.price_minor,
+        availability = excluded.availability
+'''
+
+
+def parse_availability(text: Optional[str]) -> int:
+    """Приведение текста наличия к значению перечисления"""
+    if not text:
+        return AVAILABILITY_UNKNOWN
+
+    value = text.strip().lower()
+    if 'out of stock' in value or 'нет в наличии' in value or 'отсутствует' in value:
+        return AVAILABILITY_OUT_OF_STOCK
+    if 'pre-order' in value or 'preorder' in value or 'предзаказ' in value:
+        return AVAILABILITY_PREORDER
+    if 'in stock' in value or 'в наличии' in value or 'available' in value:
+        return AVAILABILITY_IN_STOCK
+    return AVAILABILITY_UNKNOWN
+
+
+def to_minor_units(price: Optional[float]) -> Optional[int]:
+    """Цена в целых минимальных единицах (пенсы, копейки)"""
+    if price is None:
+        return None
+    return int(round(float(price) * 100))
+
+
+def observation_params(natural_key: str, price: Optional[float], availability: Optional[str],
+                       observed_at: int) -> Dict:
+    """Параметры RECORD_OBSERVATION_SQL для товара"""
+    return {
+        'natural_key': natural_key,
+        'observed_at': observed_at,
+        'price_minor': to_minor_units(price),
+        'availability': parse_availability(availability),
+    }
+
+
+def _observation(row) -> Dict:
+    product_id, observed_at, price_minor, availability = row
+    return {
+        'product_id': product_id,
+        'observed_at': observed_at,
+        'price': price_minor / 100 if price_minor is not None else None,
+        'price_minor': price_minor,
+        'availability': AVAILABILITY_NAMES.get(availability, 'unknown'),
+    }
+
+
+class PriceHistoryStore:
+    """
+    Запросы к истории цен. Первичный ключ (product_id, observed_at) таблицы
+    WITHOUT ROWID делает любой запрос по товару и интервалу поиском по диапазону.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def record(self, conn, observations: Iterable[Dict]):
+        """Запись наблюдений в текущей транзакции (параметры из observation_params)"""
+        conn.executemany(RECORD_OBSERVATION_SQL, observations)
+
+    def price_at(self, product_id: int, timestamp: Optional[int] = None) -> Optional[Dict]:
+        """Цена и наличие, действовавшие в момент timestamp (по умолчанию — сейчас)"""
+        timestamp = int(timestamp if timestamp is not None else time.time())
+        row = self.storage.reader().execute('''
+            SELECT product_id, observed_at, price_minor, availability FROM price_history
+            WHERE product_id = ? AND observed_at <= ?
+            ORDER BY observed_at DESC
+            LIMIT 1
+        ''', (product_id, timestamp)).fetchone()
+        return _observation(row) if row else None
+
+    def history(self, product_id: int, start: int, end: int) -> List[Dict]:
+        """Наблюдения за интервал [start, end]"""
+        rows = self.storage.reader().execute('''
+            SELECT product_id, observed_at, price_minor, availability FROM price_history
+            WHERE product_id = ? AND observed_at BETWEEN ? AND ?
+            ORDER BY observed_at
+        ''', (product_id, start, end)).fetchall()
+        return [_observation(row) for row in rows]
+
+    def price_range(self, product_id: int, start: int, end: int) -> Dict:
+        """
+        Минимальная и максимальная цена за интервал с учетом цены,
+        действовавшей на его начало
+        """
+        row = self.storage.reader().execute('''
+            SELECT MIN(price_minor), MAX(price_minor), COUNT(*) FROM (
+                SELECT price_minor FROM (
+                    SELECT price_minor FROM price_history
+                    WHERE product_id = ? AND observed_at <= ?
+                    ORDER BY observed_at DESC
+                    LIMIT 1
+                )
+                UNION ALL
+                SELECT price_minor FROM price_history
+                WHERE product_id = ? AND observed_at > ? AND observed_at <= ?
+            )
+        ''', (product_id, start, product_id, start, end)).fetchone()
+
+        min_minor, max_minor, observations = row
+        return {
+            'product_id': product_id,
+            'start': start,
+            'end': end,
+            'min_price': min_minor / 100 if min_minor is not None else None,
+            'max_price': max_minor / 100 if max_minor is not None else None,
+            'observations': observations,
+        }
@@ -0,0 +1,56 @@
+"""
+Естественный ключ товара: нормализованный URL или название + категория
+"""
+
+import re
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Параметры запроса, которые не меняют товар (метки рекламы и переходов)
+TRACKING_PARAMS = {'ref', 'from', 'fbclid', 'gclid', 'yclid', '_openstat'}
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_product_url(url: Optional[str]) -> Optional[str]:
+    """
+    Приведение URL товара к каноническому виду: схема и хост в нижнем
+    регистре, без порта по умолчанию, фрагмента, завершающего слэша и
+    рекламных параметров, остальные параметры отсортированы
+    """
+    if not url or not url.strip():
+        return None
+
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and str(parts.port) != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    )
+
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+def natural_key(name: Optional[str], category: Optional[str], product_url: Optional[str]) -> str:
+    """Уникальный ключ товара: URL, а при его отсутствии название и категория"""
+    url = normalize_product_url(product_url)
+    if url:
+        return f"url:{url}"
+
+    name = _WHITESPACE_RE.sub(' ', (name or '')).strip().lower()
+    category = (category or '').strip().lower()
+    return f"name:{name}|{category}"
+
+
+def product_natural_key(product_data: Dict) -> str:
+    """Естественный ключ для словаря товара"""
+    return natural_key(product_data.get('name'), product_data.get('category'), product_data.get('product_url'))
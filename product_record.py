@@ -0,0 +1,97 @@
+"""
+Запись товара: неизменяемый dataclass со слотами вместо словарей
+"""
+
+import json
+from dataclasses import dataclass, field, fields, replace
+from operator import attrgetter
+from typing import Dict, Optional, Tuple
+
+from product_keys import natural_key as make_natural_key
+
+
+def _text(value) -> Optional[str]:
+    """Строка без крайних пробелов, пустая строка — None"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _number(value) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    return float(value)
+
+
+@dataclass(frozen=True, slots=True)
+class Product:
+    """
+    Товар, извлеченный парсером. Порядок полей совпадает с колонками
+    INSERT_PRODUCT_SQL. natural_key вычисляется один раз при создании
+    """
+    name: str
+    price: Optional[float] = None
+    old_price: Optional[float] = None
+    category: Optional[str] = None
+    brand: Optional[str] = None
+    description: str = ''
+    image_url: Optional[str] = None
+    product_url: Optional[str] = None
+    availability: Optional[str] = None
+    rating: Optional[float] = None
+    reviews_count: int = 0
+    natural_key: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'natural_key', make_natural_key(self.name, self.category, self.product_url))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Product":
+        """Нормализация словаря экстрактора: обрезка строк и приведение чисел"""
+        name = _text(data.get('name'))
+        if not name:
+            raise ValueError("У товара нет названия")
+
+        return cls(
+            name=name,
+            price=_number(data.get('price')),
+            old_price=_number(data.get('old_price')),
+            category=_text(data.get('category')),
+            brand=_text(data.get('brand')),
+            description=_text(data.get('description')) or '',
+            image_url=_text(data.get('image_url')),
+            product_url=_text(data.get('product_url')),
+            availability=_text(data.get('availability')),
+            rating=_number(data.get('rating')),
+            reviews_count=int(data.get('reviews_count') or 0),
+        )
+
+    @classmethod
+    def coerce(cls, product) -> "Product":
+        """Product как есть, словарь — через from_dict"""
+        return product if isinstance(product, cls) else cls.from_dict(product)
+
+    def with_category(self, category: str) -> "Product":
+        """Копия товара с категорией источника"""
+        return replace(self, category=category)
+
+    def to_tuple(self) -> tuple:
+        """Значения в порядке PRODUCT_FIELDS"""
+        return _product_values(self)
+
+    def to_row(self) -> tuple:
+        """Строка для executemany(INSERT_PRODUCT_SQL): поля и natural_key"""
+        return _product_values(self) + (self.natural_key,)
+
+    def to_dict(self) -> Dict:
+        return dict(zip(PRODUCT_FIELDS, _product_values(self)))
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+
+# Поля в порядке колонок INSERT_PRODUCT_SQL (без вычисляемого natural_key)
+PRODUCT_FIELDS: Tuple[str, ...] = tuple(field.name for field in fields(Product) if field.init)
+
+_product_values = attrgetter(*PRODUCT_FIELDS)
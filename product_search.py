@@ -0,0 +1,107 @@
+"""
+Полнотекстовый поиск по товарам SQLite (FTS5)
+"""
+
+import re
+from typing import Optional
+
+from bulk_ingest import PER_ROW_CONDITION, create_bulk_ingest
+
+# Веса BM25 для колонок name, brand, description
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Длина фрагмента описания в токенах
+SNIPPET_TOKENS = 16
+
+HIGHLIGHT_OPEN = '<b>'
+HIGHLIGHT_CLOSE = '</b>'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Внешнее содержимое: индекс хранит только токены, текст читается из products
+CREATE_FTS_SQL = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, brand, description,
+        content='products',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+'''
+
+# Вставка пакетом индексируется в index_inserted_rows (см. bulk_ingest)
+INSERT_TRIGGER_SQL = f'''
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_insert AFTER INSERT ON products
+    WHEN {PER_ROW_CONDITION}
+    BEGIN
+        INSERT INTO products_fts (rowid, name, brand, description)
+        VALUES (NEW.id, NEW.name, NEW.brand, NEW.description);
+    END
+'''
+
+TRIGGERS_SQL = [
+    INSERT_TRIGGER_SQL,
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_delete AFTER DELETE ON products
+    BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, brand, description)
+        VALUES ('delete', OLD.id, OLD.name, OLD.brand, OLD.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_update AFTER UPDATE OF name, brand, description ON products
+    BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, brand, description)
+        VALUES ('delete', OLD.id, OLD.name, OLD.brand, OLD.description);
+        INSERT INTO products_fts (rowid, name, brand, description)
+        VALUES (NEW.id, NEW.name, NEW.brand, NEW.description);
+    END
+    ''',
+]
+
+SEARCH_SQL = f'''
+    SELECT p.*,
+           products_fts.rank AS score,
+           highlight(products_fts, 0, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}') AS name_highlight,
+           snippet(products_fts, 2, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet
+    FROM products_fts
+    JOIN products p ON p.id = products_fts.rowid
+    WHERE products_fts MATCH :query
+      AND (:category IS NULL OR p.category = :category)
+    ORDER BY products_fts.rank
+    LIMIT :limit
+'''
+
+
+def create_products_fts(conn):
+    """Индекс, триггеры синхронизации и заполнение из products (вызывается из миграции)"""
+    create_bulk_ingest(conn)
+    conn.execute(CREATE_FTS_SQL)
+    # Ранжирование по умолчанию (колонка rank): BM25 с весами колонок
+    conn.execute(
+        "INSERT INTO products_fts (products_fts, rank) VALUES ('rank', ?)",
+        (f"bm25({', '.join(str(weight) for weight in BM25_WEIGHTS)})",)
+    )
+    for trigger_sql in TRIGGERS_SQL:
+        conn.execute(trigger_sql)
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+
+def index_inserted_rows(conn, after_id: int):
+    """Индексация товаров с id > after_id, вставленных в режиме bulk_ingest"""
+    conn.execute('''
+        INSERT INTO products_fts (rowid, name, brand, description)
+        SELECT id, name, brand, description FROM products WHERE id > ?
+    ''', (after_id,))
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Безопасный запрос MATCH из пользовательского текста: каждое слово
+    берется в кавычки (синтаксис FTS5 не интерпретируется) и ищется по префиксу.
+    Все слова должны встретиться. None — в запросе нет слов.
+    """
+    tokens = _TOKEN_RE.findall(query or '')
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
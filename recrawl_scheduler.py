@@ -0,0 +1,256 @@
+"""
+Инкрементальный дообход страниц каталога по наблюдаемой частоте изменений
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Границы адаптивного интервала проверки страницы (секунды)
+MIN_INTERVAL = 15 * 60
+MAX_INTERVAL = 7 * 24 * 3600
+
+# Множители интервала: изменилась страница — проверяем чаще, нет — реже
+SPEEDUP_FACTOR = 0.5
+SLOWDOWN_FACTOR = 1.5
+
+# Токенов на страницу: загрузка для проверки и перепарсинг, если она изменилась
+PAGE_TOKENS = 2
+
+_SCRIPT_RE = re.compile(rb'<(script|style|noscript)\b.*?</\1>', re.IGNORECASE | re.DOTALL)
+_WHITESPACE_RE = re.compile(rb'\s+')
+
+
+def content_hash(content: bytes) -> str:
+    """Хэш содержимого страницы без скриптов, стилей и пробельного шума"""
+    normalized = _SCRIPT_RE.sub(b'', content)
+    normalized = _WHITESPACE_RE.sub(b' ', normalized).strip()
+    return hashlib.sha256(normalized).hexdigest()
+
+
+def _rows_to_dicts(cursor) -> List[Dict]:
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+class PageFreshnessStore:
+    """Состояние свежести страниц каталога в SQLite"""
+
+    def __init__(self, storage):
+        # Таблица page_freshness создается миграциями (sqlite_migrations)
+        self.storage = storage
+
+    def register(self, url: str, source_name: str, initial_interval: float, now: float):
+        """Добавление страницы, если она еще не отслеживается"""
+        with self.storage.write() as conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO page_freshness (url, source_name, check_interval, next_check_at)
+                VALUES (?, ?, ?, ?)
+            ''', (url, source_name, initial_interval, now))
+
+    def due(self, now: float, limit: int) -> List[Dict]:
+        """Страницы, которые пора проверить, начиная с самых просроченных"""
+        cursor = self.storage.reader().execute('''
+            SELECT * FROM page_freshness
+            WHERE next_check_at <= ?
+            ORDER BY next_check_at
+            LIMIT ?
+        ''', (now, limit))
+        return _rows_to_dicts(cursor)
+
+    def record_check(self, page: Dict, new_hash: str, now: float) -> bool:
+        """Фиксация проверки страницы и пересчет интервала. Возвращает True, если страница изменилась"""
+        changed = page['content_hash'] != new_hash
+
+        # Первая проверка только запоминает хэш и не влияет на частоту изменений
+        if page['checks'] == 0:
+            interval = page['check_interval']
+            counted_change = False
+        else:
+            factor = SPEEDUP_FACTOR if changed else SLOWDOWN_FACTOR
+            interval = min(max(page['check_interval'] * factor, MIN_INTERVAL), MAX_INTERVAL)
+            counted_change = changed
+
+        with self.storage.write() as conn:
+            conn.execute('''
+                UPDATE page_freshness SET
+                    content_hash = ?,
+                    check_interval = ?,
+                    next_check_at = ?,
+                    last_checked_at = ?,
+                    last_changed_at = CASE WHEN ? THEN ? ELSE last_changed_at END,
+                    checks = checks + 1,
+                    changes = changes + ?
+                WHERE url = ?
+            ''', (new_hash, interval, now + interval, now, changed, now, int(counted_change), page['url']))
+        return changed
+
+    def postpone(self, url: str, delay: float, now: float):
+        """Перенос проверки страницы после ошибки загрузки"""
+        with self.storage.write() as conn:
+            conn.execute('UPDATE page_freshness SET next_check_at = ? WHERE url = ?', (now + delay, url))
+
+    def invalidate(self, url: str, now: float):
+        """
+        Внеочередная проверка страницы. Хэш не меняется: изменение будет
+        найдено и учтено один раз при следующей проверке
+        """
+        with self.storage.write() as conn:
+            conn.execute('UPDATE page_freshness SET next_check_at = ? WHERE url = ?', (now, url))
+
+    def summary(self) -> List[Dict]:
+        """Состояние всех страниц с наблюдаемой частотой изменений"""
+        cursor = self.storage.reader().execute('SELECT * FROM page_freshness ORDER BY next_check_at')
+
+        pages = []
+        for page in _rows_to_dicts(cursor):
+            page['change_rate'] = round(page['changes'] / page['checks'], 3) if page['checks'] else None
+            pages.append(page)
+        return pages
+
+
+class RecrawlScheduler:
+    """
+    Фоновый цикл дообхода. Каждая проверка страницы и каждый перепарсинг
+    тратят один токен из почасового бюджета запросов; проверка начинается,
+    только когда есть токен и на возможный перепарсинг.
+    """
+
+    def __init__(self, parser, budget_per_hour: int = 60, tick_seconds: float = 30):
+        self.parser = parser
+        self.store = PageFreshnessStore(parser.storage)
+        self.budget_per_hour = budget_per_hour
+        self.tick_seconds = tick_seconds
+
+        # Токен-бакет: запас не больше десятиминутного бюджета, но не меньше
+        # одной страницы с перепарсингом
+        self.capacity = max(float(PAGE_TOKENS), budget_per_hour / 6)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+
+        self.fetches = 0
+        self.recrawled_pages = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Запуск фонового цикла"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="recrawl-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Фоновый дообход запущен, бюджет {self.budget_per_hour} запросов/час")
+
+    def stop(self, timeout: float = 5):
+        """Остановка фонового цикла"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Ошибка фонового дообхода: {e}")
+            self._stop.wait(self.tick_seconds)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.budget_per_hour / 3600)
+        self.last_refill = now
+
+    def _take_token(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.fetches += 1
+            return True
+        return False
+
+    def sync_pages(self, now: float):
+        """Регистрация страниц из реестра источников"""
+        for source in self.parser.registry.enabled():
+            for url in source.pages:
+                self.store.register(url, source.name, source.refresh_interval, now)
+
+    def tick(self) -> int:
+        """Один проход: проверка просроченных страниц в пределах бюджета"""
+        self._refill()
+        # Страница загружается, только если хватает токенов и на перепарсинг:
+        # иначе изменившаяся страница загружалась бы снова и снова, а запас
+        # никогда не доходил бы до двух токенов
+        if self.tokens < PAGE_TOKENS:
+            return 0
+
+        # Полный парсинг уже идет — не мешаем ему
+        if not self.parser.crawl_lock.acquire(blocking=False):
+            return 0
+
+        checked = 0
+        try:
+            now = time.time()
+            self.sync_pages(now)
+
+            for page in self.store.due(now, int(self.tokens // PAGE_TOKENS)):
+                if self.tokens < PAGE_TOKENS or not self._take_token():
+                    break
+                source = self.parser.registry.get(page['source_name'])
+                if source is None or not source.enabled:
+                    self.store.postpone(page['url'], MAX_INTERVAL, now)
+                    continue
+
+                self.check_page(source, page)
+                checked += 1
+        finally:
+            self.parser.close_selenium_driver()
+            self.parser.crawl_lock.release()
+
+        return checked
+
+    def check_page(self, source, page: Dict) -> bool:
+        """Проверка страницы по хэшу содержимого и перепарсинг при изменении"""
+        now = time.time()
+        try:
+            response = self.parser.session.get(page['url'], timeout=15)
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Не удалось проверить {page['url']}: {e}")
+            self.store.postpone(page['url'], MIN_INTERVAL, now)
+            return False
+
+        new_hash = content_hash(response.content)
+        if new_hash == page['content_hash']:
+            self.store.record_check(page, new_hash, now)
+            logger.info(f"Страница не изменилась: {page['url']}")
+            return False
+
+        # Перепарсинг тоже расходует бюджет (tick оставляет на него токен);
+        # если его нет — проверка не засчитывается и повторяется позже
+        if not self._take_token():
+            self.store.invalidate(page['url'], now)
+            return True
+
+        self.store.record_check(page, new_hash, now)
+        logger.info(f"Страница изменилась, перепарсинг: {page['url']}")
+        products = self.parser.crawl_page(source, page['url'])[:source.item_budget]
+        saved = self.parser.save_source_products(products)
+        self.parser.source_state.mark_crawled(source.name, saved)
+        self.recrawled_pages += 1
+        return True
+
+    def status(self) -> Dict:
+        """Состояние планировщика для API"""
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "budget_per_hour": self.budget_per_hour,
+            "available_tokens": round(self.tokens, 2),
+            "fetches": self.fetches,
+            "recrawled_pages": self.recrawled_pages,
+            "pages": self.store.summary()
+        }
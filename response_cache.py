@@ -0,0 +1,195 @@
+"""
+Кэш JSON ответов API в памяти процесса: TTL, ограничение размера и LRU вытеснение,
+ETag по поколению данных и условные GET запросы. Каждое представление (JSON,
+MessagePack, сжатие) кэшируется отдельно и получает свой ETag.
+"""
+
+import functools
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from flask import Response, current_app, request
+
+from content_negotiation import VARY, Variant, encode_body, request_variant
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, Tuple[Tuple[str, Tuple[str, ...]], ...], Variant]
+
+
+def request_cache_key() -> CacheKey:
+    """Ключ текущего запроса: путь, аргументы, отсортированные по имени, и представление"""
+    args = tuple(sorted(
+        (name, tuple(values)) for name, values in request.args.lists()
+    ))
+    return request.path, args, request_variant()
+
+
+class ResponseCache:
+    """
+    Тела ответов хранятся готовыми байтами, поэтому попадание не вызывает
+    ни запросов к БД, ни сериализации. Каждая инвалидация увеличивает
+    generation: запись, начатая до инвалидации, в кэш не попадает.
+
+    ETag ответа строится из generation и хэша сохраненного тела: он
+    меняется вместе с телом, даже если данные изменились без инвалидации,
+    и проверяется по записи кэша без обращения к БД.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 256, max_bytes: int = 32 * 1024 * 1024,
+                 client_max_age: int = 0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Сколько секунд клиенты и nginx могут использовать ответ без перепроверки
+        self.client_max_age = client_max_age
+        self.generation = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[float, bytes, Dict[str, str], str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.not_modified = 0
+
+    def get(self, key: CacheKey) -> Optional[Tuple[bytes, Dict[str, str], str]]:
+        """Тело, заголовки представления (Content-Type, Content-Encoding) и ETag или None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, body, headers, etag = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body, headers, etag
+
+    def set(self, key: CacheKey, body: bytes, generation: Optional[int] = None,
+            headers: Optional[Dict[str, str]] = None) -> str:
+        """
+        Сохранение ответа. generation — поколение на момент начала запроса.
+        Возвращает ETag тела (и тогда, когда ответ в кэш не попал)
+        """
+        generation = self.generation if generation is None else generation
+        etag = self.etag(body, generation)
+        if len(body) > self.max_bytes:
+            return etag
+
+        with self._lock:
+            if generation != self.generation:
+                return etag
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + self.ttl, body, headers or {}, etag)
+            self._bytes += len(body)
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return etag
+
+    def _remove(self, key: CacheKey):
+        _, body, _, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def invalidate(self, reason: str = "") -> int:
+        """Сброс всех записей. Возвращает новое поколение данных"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.generation += 1
+            self.invalidations += 1
+            generation = self.generation
+
+        logger.info(f"Кэш ответов сброшен ({reason or 'без причины'}), поколение {generation}")
+        return generation
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "not_modified": self.not_modified,
+                "generation": self.generation
+            }
+
+    @staticmethod
+    def etag(body: bytes, generation: int) -> str:
+        """Сильный ETag: поколение данных и хэш закодированного тела представления"""
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        return f'"{generation}-{digest}"'
+
+    def validator_headers(self, etag: str) -> Dict[str, str]:
+        """Заголовки ETag, Cache-Control и Vary кэшируемого ответа"""
+        return {
+            'ETag': etag,
+            'Cache-Control': f'public, max-age={self.client_max_age}, must-revalidate',
+            'Vary': VARY
+        }
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def _validators(self, response: Response, etag: str) -> Response:
+        response.headers.update(self.validator_headers(etag))
+        return response
+
+    def cached(self, view):
+        """
+        Декоратор Flask view: успешный (200) ответ кэшируется по пути, аргументам
+        и представлению уже сжатым и получает ETag по телу. Совпавший с ETag
+        живой записи If-None-Match получает 304 без вызова view. Ответы с
+        ошибками не кэшируются.
+        """
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request_cache_key()
+            generation = self.generation
+
+            # 304 только при живой записи и по ее ETag: без записи неизвестно,
+            # совпадает ли тело с тем, что есть у клиента
+            entry = self.get(key)
+            if entry is not None:
+                body, headers, etag = entry
+                if request.if_none_match.contains_weak(etag.strip('"')):
+                    self.record_not_modified()
+                    return self._validators(Response(status=304), etag)
+
+                response = Response(body, headers={**headers, 'X-Cache': 'HIT'})
+                return self._validators(response, etag)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            response.headers['X-Cache'] = 'MISS'
+            if response.status_code == 200:
+                body, headers = encode_body(key[2], response.get_data())
+                response.set_data(body)
+                response.headers.update(headers)
+                etag = self.set(key, body, generation, headers)
+                self._validators(response, etag)
+            return response
+
+        return wrapper
+
@@ -0,0 +1,232 @@
+"""
+Версионные миграции схемы SQLite базы books_products.db
+"""
+
+import logging
+import time
+from typing import Callable, Dict, List, Tuple
+
+import category_stats
+import product_search
+from bulk_ingest import create_bulk_ingest
+from category_stats import create_category_stats
+from price_history import parse_availability, to_minor_units
+from product_keys import product_natural_key
+from product_search import create_products_fts
+
+logger = logging.getLogger(__name__)
+
+
+def _create_products(conn):
+    """Исходная таблица товаров"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL,
+            old_price REAL,
+            category TEXT,
+            brand TEXT,
+            description TEXT,
+            image_url TEXT,
+            product_url TEXT,
+            availability TEXT,
+            rating REAL,
+            reviews_count INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _natural_key(conn):
+    """
+    Естественный ключ товара: заполнение natural_key, схлопывание дубликатов
+    (остается самая свежая запись с датой первого появления) и уникальный индекс
+    """
+    indexes = {row[1] for row in conn.execute('PRAGMA index_list(products)')}
+    if 'idx_products_natural_key' in indexes:
+        return
+
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(products)')}
+    if 'natural_key' not in columns:
+        conn.execute('ALTER TABLE products ADD COLUMN natural_key TEXT')
+    if 'last_seen_at' not in columns:
+        conn.execute('ALTER TABLE products ADD COLUMN last_seen_at TIMESTAMP')
+
+    rows = conn.execute('''
+        SELECT id, name, category, product_url FROM products WHERE natural_key IS NULL
+    ''').fetchall()
+    conn.executemany('UPDATE products SET natural_key = ? WHERE id = ?', [
+        (product_natural_key({'name': name, 'category': category, 'product_url': url}), row_id)
+        for row_id, name, category, url in rows
+    ])
+
+    # Для каждого ключа оставляем самую свежую строку
+    conn.execute('''
+        CREATE TEMP TABLE natural_key_groups (
+            keep_id INTEGER PRIMARY KEY,
+            first_seen TIMESTAMP,
+            last_seen TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO natural_key_groups (keep_id, first_seen, last_seen)
+        SELECT MAX(id), MIN(created_at), MAX(COALESCE(last_seen_at, created_at))
+        FROM products GROUP BY natural_key
+    ''')
+    conn.execute('''
+        UPDATE products SET
+            created_at = (SELECT first_seen FROM natural_key_groups WHERE keep_id = products.id),
+            last_seen_at = (SELECT last_seen FROM natural_key_groups WHERE keep_id = products.id)
+        WHERE id IN (SELECT keep_id FROM natural_key_groups)
+    ''')
+    removed = conn.execute('''
+        DELETE FROM products WHERE id NOT IN (SELECT keep_id FROM natural_key_groups)
+    ''').rowcount
+    conn.execute('DROP TABLE temp.natural_key_groups')
+
+    conn.execute('CREATE UNIQUE INDEX idx_products_natural_key ON products(natural_key)')
+    logger.info(f"Товары переведены на естественный ключ, удалено дубликатов: {removed}")
+
+
+def _listing_indexes(conn):
+    """Индексы для выборок по дате и уникальных товаров"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_created_at ON products(created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_name_created ON products(name, created_at)')
+
+
+def _stats_indexes(conn):
+    """
+    Индексы для статистики: покрывающий (category, price) обслуживает
+    GROUP BY category и средние цены без чтения строк таблицы
+    """
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_category_price ON products(category, price)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_price ON products(price)')
+    conn.execute('ANALYZE products')
+
+
+def _crawl_state(conn):
+    """Служебные таблицы планировщиков обхода"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS source_crawl_state (
+            name TEXT PRIMARY KEY,
+            last_crawled_at REAL NOT NULL,
+            last_item_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS page_freshness (
+            url TEXT PRIMARY KEY,
+            source_name TEXT NOT NULL,
+            content_hash TEXT,
+            check_interval REAL NOT NULL,
+            next_check_at REAL NOT NULL,
+            last_checked_at REAL,
+            last_changed_at REAL,
+            checks INTEGER NOT NULL DEFAULT 0,
+            changes INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_page_freshness_next ON page_freshness(next_check_at)')
+
+
+def _price_history(conn):
+    """
+    История цен: целочисленные id, время в секундах эпохи, цена в
+    минимальных единицах и код наличия. Заполняется текущими ценами товаров.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS price_history (
+            product_id INTEGER NOT NULL,
+            observed_at INTEGER NOT NULL,
+            price_minor INTEGER,
+            availability INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (product_id, observed_at)
+        ) WITHOUT ROWID
+    ''')
+
+    rows = conn.execute('''
+        SELECT id, CAST(strftime('%s', COALESCE(last_seen_at, created_at)) AS INTEGER), price, availability
+        FROM products
+    ''').fetchall()
+    conn.executemany('''
+        INSERT OR IGNORE INTO price_history (product_id, observed_at, price_minor, availability)
+        VALUES (?, ?, ?, ?)
+    ''', [
+        (product_id, observed_at or 0, to_minor_units(price), parse_availability(availability))
+        for product_id, observed_at, price, availability in rows
+    ])
+
+
+def _bulk_ingest(conn):
+    """
+    Триггеры вставки FTS и category_stats пропускают строки пакетной записи
+    (bulk_ingest): индекс и статистика дополняются одним запросом на пакет
+    """
+    create_bulk_ingest(conn)
+    for trigger, trigger_sql in (('trg_products_fts_insert', product_search.INSERT_TRIGGER_SQL),
+                                 ('trg_products_stats_insert', category_stats.INSERT_TRIGGER_SQL)):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        conn.execute(trigger_sql)
+
+
+# Порядок применения миграций. Номера не переиспользуются, новые — только в конец
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'create_products', _create_products),
+    (2, 'products_natural_key', _natural_key),
+    (3, 'listing_indexes', _listing_indexes),
+    (4, 'stats_indexes', _stats_indexes),
+    (5, 'crawl_state', _crawl_state),
+    (6, 'price_history', _price_history),
+    (7, 'category_stats', create_category_stats),
+    (8, 'products_fts', create_products_fts),
+    (9, 'bulk_ingest', _bulk_ingest),
+]
+
+
+def run_migrations(storage) -> List[Dict]:
+    """
+    Применение недостающих миграций, каждой в своей транзакции.
+    Возвращает список примененных миграций с длительностью.
+    """
+    started = time.perf_counter()
+    with storage.write() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                duration_ms REAL NOT NULL
+            )
+        ''')
+
+    report = []
+    for version, name, migrate in MIGRATIONS:
+        with storage.write() as conn:
+            # Проверка внутри транзакции: другой процесс мог применить миграцию раньше
+            if conn.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,)).fetchone():
+                continue
+
+            migration_started = time.perf_counter()
+            migrate(conn)
+            duration_ms = round((time.perf_counter() - migration_started) * 1000, 3)
+            conn.execute(
+                'INSERT INTO schema_migrations (version, name, duration_ms) VALUES (?, ?, ?)',
+                (version, name, duration_ms)
+            )
+
+        logger.info(f"Миграция {version} ({name}) применена за {duration_ms} мс")
+        report.append({"version": version, "name": name, "duration_ms": duration_ms})
+
+    total_ms = round((time.perf_counter() - started) * 1000, 3)
+    if report:
+        logger.info(f"Применено миграций: {len(report)} за {total_ms} мс")
+    else:
+        logger.info(f"Схема актуальна, проверка миграций заняла {total_ms} мс")
+    return report
+
+
+def schema_version(storage) -> int:
+    """Текущая версия схемы"""
+    row = storage.reader().execute('SELECT MAX(version) FROM schema_migrations').fetchone()
+    return row[0] or 0
@@ -0,0 +1,109 @@
+"""
+Слой хранения SQLite: долгоживущие соединения с настроенными PRAGMA
+"""
+
+import logging
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Iterator, Set
+
+logger = logging.getLogger(__name__)
+
+# Настройки по умолчанию
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024   # 256 МБ отображения файла в память
+DEFAULT_CACHE_SIZE_KIB = 64 * 1024      # 64 МБ страничного кэша на соединение
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+
+
+class _Reader:
+    """Соединение-читатель в threading.local: удаляется вместе с данными потока"""
+
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+def _close_reader(conn: sqlite3.Connection, readers: Set[sqlite3.Connection], lock: threading.RLock):
+    with lock:
+        readers.discard(conn)
+    conn.close()
+
+
+class SQLiteStorage:
+    """
+    Одно соединение-писатель под блокировкой и по одному соединению-читателю
+    на поток. В режиме WAL читатели видят последний зафиксированный снимок и
+    не ждут писателя. Читатель закрывается, когда его поток завершается.
+    """
+
+    def __init__(self, db_path: str, mmap_size: int = DEFAULT_MMAP_SIZE,
+                 cache_size_kib: int = DEFAULT_CACHE_SIZE_KIB):
+        self.db_path = db_path
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+
+        self._writer_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers: Set[sqlite3.Connection] = set()
+        self._readers_lock = threading.RLock()
+
+        self._writer = self._connect()
+        journal_mode = self._writer.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+        if journal_mode.lower() != 'wal':
+            logger.warning(f"SQLite не перешла в режим WAL (journal_mode={journal_mode})")
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: транзакциями управляем явно, чтения не держат снимок
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.execute(f'PRAGMA busy_timeout={DEFAULT_BUSY_TIMEOUT_MS}')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kib)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """Транзакция записи: BEGIN IMMEDIATE ... COMMIT, откат при ошибке"""
+        with self._writer_lock:
+            conn = self._writer
+            if conn.in_transaction:
+                # Вложенный вызов выполняется в рамках внешней транзакции
+                yield conn
+                return
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            else:
+                conn.execute('COMMIT')
+
+    def reader(self) -> sqlite3.Connection:
+        """Соединение для чтения, закрепленное за текущим потоком"""
+        reader = getattr(self._local, 'reader', None)
+        if reader is None:
+            conn = self._connect()
+            conn.execute('PRAGMA query_only=ON')
+            reader = self._local.reader = _Reader(conn)
+            with self._readers_lock:
+                self._readers.add(conn)
+            # Данные threading.local удаляются при завершении потока — вместе
+            # с ними закрывается и соединение (без ссылки на self)
+            weakref.finalize(reader, _close_reader, conn, self._readers, self._readers_lock)
+        return reader.conn
+
+    def close(self):
+        """Закрытие всех соединений"""
+        with self._readers_lock:
+            readers = list(self._readers)
+            self._readers.clear()
+        for conn in readers:
+            conn.close()
+        with self._writer_lock:
+            self._writer.close()
@@ -2,12 +2,24 @@
 Flask API для парсера Технопарка
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 import logging
 from techpark_parser import TehnoparserBooks
-from postgresql_parser import PostgreSQLParser
+from postgresql_parser import BOOK_COLUMN_NAMES, PostgreSQLParser, parse_fields
+from recrawl_scheduler import RecrawlScheduler
+from parse_jobs import ParseJobQueue
+from health_checks import CachedProbe, ReadinessChecker
+from response_cache import ResponseCache
+from pagination import decode_cursor, paginate
+from book_filters import BookFilters
+from bulk_export import EXPORT_MIMETYPES, csv_chunks, ndjson_chunks
+import json_provider
+from content_negotiation import encode_response
+from sqlite_migrations import schema_version
+import itertools
 import os
+import time
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,9 +28,64 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
+# Кодировщик JSON ответов: orjson, если установлен (JSON_PROVIDER=json|orjson|orjson-iso)
+JSON_PROVIDER = json_provider.init_app(app)
+json_encoder = json_provider.make_encoder(JSON_PROVIDER)
+
+# MessagePack по Accept и сжатие gzip/zstd по Accept-Encoding для всех JSON ответов
+app.after_request(encode_response)
+
+STARTED_AT = time.time()
+
 # Инициализация парсеров
 parser = TehnoparserBooks()
-postgres_parser = PostgreSQLParser()
+# Пул соединений PostgreSQL: не меньше потоков gunicorn (--threads)
+postgres_parser = PostgreSQLParser(
+    min_connections=int(os.environ.get('PG_POOL_MIN_SIZE', 2)),
+    max_connections=int(os.environ.get('PG_POOL_MAX_SIZE', 10))
+)
+
+# Кэш ответов читающих эндпоинтов: данные меняются только после парсинга или экспорта
+response_cache = ResponseCache(
+    ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 300)),
+    max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 256)),
+    client_max_age=int(os.environ.get('RESPONSE_MAX_AGE', 0))
+)
+
+# Очередь задач парсинга: один исполнитель, чтобы не запускать два браузера
+parse_jobs = ParseJobQueue(max_workers=1)
+
+# Фоновый дообход изменившихся страниц каталога
+recrawler = RecrawlScheduler(parser, budget_per_hour=int(os.environ.get('RECRAWL_BUDGET_PER_HOUR', 60)))
+if os.environ.get('RECRAWL_ENABLED', '').lower() in ('1', 'true', 'yes'):
+    recrawler.start()
+
+# Готовность: результаты проверок кэшируются и обновляются в фоне
+HEALTH_TTL = float(os.environ.get('HEALTH_TTL', 5))
+readiness = ReadinessChecker([
+    CachedProbe('postgresql', postgres_parser.ping, ttl=HEALTH_TTL),
+    CachedProbe('sqlite', lambda: {"schema_version": schema_version(parser.storage)}, ttl=HEALTH_TTL)
+])
+readiness.start()
+
+@app.route('/livez', methods=['GET'])
+def livez():
+    """Процесс жив и обслуживает запросы (зависимости не проверяются)"""
+    return jsonify({
+        "status": "alive",
+        "service": "techpark-api",
+        "uptime_seconds": round(time.time() - STARTED_AT, 3)
+    })
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Готовность: доступность PostgreSQL и SQLite по последним проверкам и загрузка пула"""
+    status = readiness.status()
+    return jsonify({
+        "status": "ready" if status["ready"] else "not_ready",
+        "checks": status["checks"],
+        "postgresql_pool": postgres_parser.pool_stats()
+    }), 200 if status["ready"] else 503
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -29,25 +96,115 @@ def health():
         "timestamp": parser.get_stats()
     })
 
+# Страницы книг упорядочены по названию; курсор — название последней книги
+MAX_PAGE_SIZE = 1000
+PAGE_CURSOR_FIELDS = ('title',)
+
+def page_limit(default: int) -> int:
+    """Размер страницы из параметра limit в пределах 1..MAX_PAGE_SIZE"""
+    return max(1, min(request.args.get('limit', default, type=int), MAX_PAGE_SIZE))
+
+def page_cursor_key(book):
+    return {"title": book['title']}
+
+# Результаты поиска упорядочены по релевантности, затем по названию
+SEARCH_CURSOR_FIELDS = ('rank', 'title')
+
+def search_cursor_key(book):
+    return {"rank": book['rank'], "title": book['title']}
+
+# Режимы /search: подстрока (pg_trgm) или полнотекстовый поиск (tsvector)
+SEARCH_MODES = ('substring', 'fulltext')
+
 @app.route('/products', methods=['GET'])
+@response_cache.cached
 def get_products():
-    """Получение списка товаров из PostgreSQL (только уникальные)"""
+    """
+    Получение списка товаров из PostgreSQL (только уникальные) по страницам:
+    next_cursor передается в параметре cursor для следующей страницы,
+    fields=title,price,... выбирает только нужные колонки
+    """
     try:
-        limit = request.args.get('limit', 100, type=int)
-        products = postgres_parser.get_unique_books_from_db(limit)
+        limit = page_limit(100)
+        after = decode_cursor(request.args.get('cursor'), PAGE_CURSOR_FIELDS)
+        filters = BookFilters.from_args(request.args)
+        fields = parse_fields(request.args.get('fields'))
+        rows = postgres_parser.get_unique_books_from_db(limit + 1, after_title=after and after['title'],
+                                                        filters=filters, fields=fields)
+        products, next_cursor = paginate(rows, limit, page_cursor_key)
         
         return jsonify({
             "products": products,
             "count": len(products),
+            "next_cursor": next_cursor,
             "status": "success"
         })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Ошибка при получении товаров: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/products/<int:book_id>', methods=['GET'])
+@response_cache.cached
+def get_product(book_id):
+    """Одна книга по id"""
+    try:
+        book = postgres_parser.get_book_by_id(book_id)
+        if book is None:
+            return jsonify({"error": "Книга не найдена"}), 404
+        
+        return jsonify({
+            "product": book,
+            "status": "success"
+        })
+    except Exception as e:
+        logger.error(f"Ошибка при получении книги {book_id}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# Строк в одной выборке из серверного курсора при выгрузке
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+@app.route('/export', methods=['GET'])
+def export_products():
+    """
+    Потоковая выгрузка всех уникальных книг (format=ndjson|csv, фильтры как у /products).
+    Строки читаются из серверного курсора пачками и сразу отправляются клиенту.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({"error": f"Неизвестный формат: {export_format} (ndjson или csv)"}), 400
+    try:
+        filters = BookFilters.from_args(request.args)
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Серверный курсор открывается и первая пачка читается до ответа 200:
+    # ошибка БД в этот момент возвращается как 500, а не как пустой файл
+    batches = postgres_parser.iter_book_batches(filters=filters, batch_size=EXPORT_BATCH_SIZE, fields=fields)
+    try:
+        first_batch = next(batches, None)
+    except Exception as e:
+        logger.error(f"Ошибка при выгрузке товаров: {e}")
+        return jsonify({"error": str(e)}), 500
+    if first_batch is not None:
+        batches = itertools.chain([first_batch], batches)
+    
+    if export_format == 'csv':
+        chunks = csv_chunks(batches, list(fields or BOOK_COLUMN_NAMES))
+    else:
+        chunks = ndjson_chunks(batches, json_encoder)
+    
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_MIMETYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename=books.{export_format}'}
+    )
+
 @app.route('/parse', methods=['POST'])
 def parse_products():
-    """Запуск парсинга товаров"""
+    """Постановка парсинга товаров в фоновую очередь"""
     try:
         data = request.get_json() or {}
         force = data.get('force', False)
@@ -58,27 +215,82 @@ def parse_products():
             return jsonify({
                 "message": "Товары уже загружены. Используйте force=true для повторной загрузки",
                 "total_products": stats['total_products'],
-                "timestamp": parser.get_stats()
+                "timestamp": stats
             })
         
-        # Запускаем парсинг
-        parsed_count = parser.parse_100_products()
+        # Одновременные запросы схлопываются в одну задачу
+        job, created = parse_jobs.submit('parse', run_parse_job, force=force)
         
-        # Получаем обновленную статистику
-        updated_stats = parser.get_stats()
+        return jsonify({
+            "message": "Парсинг поставлен в очередь" if created else "Парсинг уже выполняется",
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/parse/{job.id}",
+            "duplicate": not created
+        }), 202
         
+    except Exception as e:
+        logger.error(f"Ошибка при запуске парсинга: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/parse/<job_id>', methods=['GET'])
+def parse_job_status(job_id):
+    """Прогресс и результат задачи парсинга"""
+    job = parse_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Задача не найдена"}), 404
+    
+    return jsonify(job.to_dict())
+
+def run_parse_job(job):
+    """Выполнение задачи парсинга в фоновом потоке"""
+    try:
+        parsed_count = parser.parse_100_products(progress_callback=job.update_progress)
+    finally:
+        response_cache.invalidate(f"парсинг {job.id}")
+    updated_stats = parser.get_stats()
+    
+    return {
+        "parsed_count": parsed_count,
+        "total_products": updated_stats['total_products']
+    }
+
+@app.route('/recrawl', methods=['GET'])
+def recrawl_status():
+    """Состояние фонового дообхода и частота изменений страниц"""
+    try:
         return jsonify({
-            "message": "Парсинг завершен",
-            "parsed_count": parsed_count,
-            "total_products": updated_stats['total_products'],
-            "timestamp": updated_stats
+            "recrawl": recrawler.status(),
+            "status": "success"
         })
-        
     except Exception as e:
-        logger.error(f"Ошибка при парсинге: {e}")
+        logger.error(f"Ошибка при получении состояния дообхода: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Заполненность и эффективность кэша ответов"""
+    return jsonify({
+        "cache": response_cache.stats(),
+        "status": "success"
+    })
+
+@app.route('/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    """Сброс кэша ответов (вызывается после экспорта в PostgreSQL)"""
+    token = os.environ.get('CACHE_INVALIDATE_TOKEN')
+    if token and request.headers.get('X-Cache-Token') != token:
+        return jsonify({"error": "Неверный токен"}), 403
+    
+    data = request.get_json(silent=True) or {}
+    generation = response_cache.invalidate(data.get('reason', 'запрос API'))
+    return jsonify({
+        "generation": generation,
+        "status": "success"
+    })
+
 @app.route('/stats', methods=['GET'])
+@response_cache.cached
 def get_stats():
     """Получение статистики из PostgreSQL"""
     try:
@@ -92,39 +304,52 @@ def get_stats():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/search', methods=['GET'])
+@response_cache.cached
 def search_products():
     """Поиск товаров"""
     try:
         query = request.args.get('q', '')
-        category = request.args.get('category', '')
-        limit = request.args.get('limit', 50, type=int)
+        mode = request.args.get('mode') or 'substring'
+        filters = BookFilters.from_args(request.args)
+        fields = parse_fields(request.args.get('fields'))
+        limit = page_limit(50)
         
-        if not query and not category:
-            return jsonify({"error": "Необходимо указать поисковый запрос или категорию"}), 400
+        if mode not in SEARCH_MODES:
+            return jsonify({"error": f"Параметр mode должен быть одним из: {', '.join(SEARCH_MODES)}"}), 400
+        if not query and filters.is_empty():
+            return jsonify({"error": "Необходимо указать поисковый запрос или фильтр"}), 400
         
-        # Поиск в PostgreSQL
+        # Поиск и фильтры выполняются одним запросом в PostgreSQL
         if query:
-            products = postgres_parser.search_books(query, limit)
+            after = decode_cursor(request.args.get('cursor'), SEARCH_CURSOR_FIELDS)
+            search = postgres_parser.fulltext_search if mode == 'fulltext' else postgres_parser.search_books
+            rows = search(query, limit + 1, after=after, filters=filters, fields=fields)
+            products, next_cursor = paginate(rows, limit, search_cursor_key)
         else:
-            products = postgres_parser.get_unique_books_from_db(limit)
-        
-        # Фильтруем по категории
-        if category:
-            products = [p for p in products if category.lower() in p.get('category', '').lower()]
+            after = decode_cursor(request.args.get('cursor'), PAGE_CURSOR_FIELDS)
+            rows = postgres_parser.get_unique_books_from_db(limit + 1, after_title=after and after['title'],
+                                                            filters=filters, fields=fields)
+            products, next_cursor = paginate(rows, limit, page_cursor_key)
         
         return jsonify({
             "products": products,
             "count": len(products),
             "query": query,
-            "category": category,
+            "mode": mode,
+            "category": filters.category or '',
+            "filters": filters.to_dict(),
+            "next_cursor": next_cursor,
             "status": "success"
         })
         
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Ошибка при поиске: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/categories', methods=['GET'])
+@response_cache.cached
 def get_categories():
     """Получение списка категорий из PostgreSQL"""
     try:
@@ -0,0 +1,416 @@
+"""
+ASGI API каталога книг (Starlette + пул asyncpg).
+
+Читающие эндпоинты techpark_api с тем же JSON контрактом: запросы к
+PostgreSQL не блокируют процесс, поэтому один воркер обслуживает сотни
+одновременных запросов. Парсинг и дообход остаются во Flask API.
+
+Запуск: uvicorn techpark_asgi:app --host 0.0.0.0 --port 5001
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+from werkzeug.http import parse_etags
+
+import json_provider
+from async_postgresql import AsyncPostgreSQLParser
+from content_negotiation import DEFAULT_VARIANT, VARY, Variant, encode_body, negotiate, render
+from book_filters import BookFilters
+from category_stats import read_stats
+from pagination import decode_cursor, paginate
+from postgresql_parser import parse_fields
+from response_cache import CacheKey, ResponseCache
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STARTED_AT = time.time()
+
+# Страницы книг упорядочены по названию; курсор — название последней книги
+MAX_PAGE_SIZE = 1000
+PAGE_CURSOR_FIELDS = ('title',)
+
+# База SQLite парсера: ASGI API только читает статистику для /health,
+# схему создает и мигрирует Flask API
+SQLITE_DB_PATH = os.environ.get('SQLITE_DB_PATH', 'books_products.db')
+
+postgres_parser = AsyncPostgreSQLParser(
+    min_size=int(os.environ.get('PG_POOL_MIN_SIZE', 2)),
+    max_size=int(os.environ.get('PG_POOL_MAX_SIZE', 10))
+)
+
+json_encoder = json_provider.make_encoder(json_provider.default_provider_name())
+
+response_cache = ResponseCache(
+    ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 300)),
+    max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 256)),
+    client_max_age=int(os.environ.get('RESPONSE_MAX_AGE', 0))
+)
+
+
+# Представление ответа текущего запроса (Accept, Accept-Encoding)
+response_variant: contextvars.ContextVar[Variant] = contextvars.ContextVar('response_variant',
+                                                                           default=DEFAULT_VARIANT)
+
+
+class NegotiationMiddleware:
+    """Согласование представления до вызова обработчика, как request_variant во Flask API"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        token = response_variant.set(negotiate(headers.get('accept'), headers.get('accept-encoding')))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            response_variant.reset(token)
+
+
+class APIResponse(Response):
+    """JSON или MessagePack тем же кодировщиком, что у Flask API (JSON_PROVIDER)"""
+
+    def __init__(self, content, status_code: int = 200):
+        variant = response_variant.get()
+        body = render(content, variant.mimetype, json_encoder, json_provider.json_default)
+        super().__init__(body, status_code=status_code, headers={'Vary': VARY}, media_type=variant.mimetype)
+
+
+def jsonify(content, status_code: int = 200) -> Response:
+    return APIResponse(content, status_code=status_code)
+
+
+def request_cache_key(request: Request) -> CacheKey:
+    """Ключ запроса в формате response_cache.request_cache_key"""
+    args: Dict[str, list] = {}
+    for name, value in request.query_params.multi_items():
+        args.setdefault(name, []).append(value)
+    return (request.url.path, tuple(sorted((name, tuple(values)) for name, values in args.items())),
+            response_variant.get())
+
+
+def cached(view):
+    """
+    Кэширование успешных ответов в response_cache с ETag и 304, как в Flask API.
+    Одновременные промахи по одному ключу выполняют один запрос к БД и одно
+    сжатие: остальные запросы ждут его результат.
+    """
+    inflight: Dict[CacheKey, asyncio.Future] = {}
+
+    async def run_view(request: Request, key: CacheKey,
+                       generation: int) -> Tuple[int, bytes, Dict[str, str], Optional[str]]:
+        response = await view(request)
+        if response.status_code != 200:
+            return response.status_code, response.body, dict(response.headers), None
+
+        body, headers = encode_body(key[2], response.body)
+        etag = response_cache.set(key, body, generation, headers)
+        return 200, body, headers, etag
+
+    @functools.wraps(view)
+    async def wrapper(request: Request) -> Response:
+        key = request_cache_key(request)
+        generation = response_cache.generation
+
+        # 304 только при живой записи и по ее ETag, как в Flask API
+        entry = response_cache.get(key)
+        if entry is not None:
+            body, stored_headers, etag = entry
+            headers = response_cache.validator_headers(etag)
+            if parse_etags(request.headers.get('if-none-match')).contains_weak(etag.strip('"')):
+                response_cache.record_not_modified()
+                return Response(status_code=304, headers=headers)
+
+            return Response(body, headers={**stored_headers, **headers, 'X-Cache': 'HIT'})
+
+        task = inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(run_view(request, key, generation))
+            inflight[key] = task
+            task.add_done_callback(lambda _: inflight.pop(key, None))
+        # shield: отключившийся клиент не отменяет запрос для остальных ожидающих
+        status_code, body, stored_headers, etag = await asyncio.shield(task)
+
+        if status_code != 200:
+            return Response(body, status_code=status_code, headers={**stored_headers, 'X-Cache': 'MISS'})
+        headers = response_cache.validator_headers(etag)
+        return Response(body, headers={**stored_headers, **headers, 'X-Cache': 'MISS'})
+
+    return wrapper
+
+
+def page_limit(request: Request, default: int) -> int:
+    """Размер страницы из параметра limit в пределах 1..MAX_PAGE_SIZE"""
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except ValueError:
+        limit = default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def page_cursor_key(book):
+    return {"title": book['title']}
+
+
+# Результаты поиска упорядочены по релевантности, затем по названию
+SEARCH_CURSOR_FIELDS = ('rank', 'title')
+
+
+def search_cursor_key(book):
+    return {"rank": book['rank'], "title": book['title']}
+
+
+# Режимы /search: подстрока (pg_trgm) или полнотекстовый поиск (tsvector)
+SEARCH_MODES = ('substring', 'fulltext')
+
+
+def page_after_title(request: Request) -> Optional[str]:
+    after = decode_cursor(request.query_params.get('cursor'), PAGE_CURSOR_FIELDS)
+    return after and after['title']
+
+
+async def livez(request: Request) -> Response:
+    """Процесс жив и обслуживает запросы (зависимости не проверяются)"""
+    return jsonify({
+        "status": "alive",
+        "service": "techpark-asgi",
+        "uptime_seconds": round(time.time() - STARTED_AT, 3)
+    })
+
+
+async def readyz(request: Request) -> Response:
+    """Готовность: PostgreSQL отвечает на запрос через пул"""
+    started = time.monotonic()
+    try:
+        detail = await asyncio.wait_for(postgres_parser.ping(), timeout=5)
+        check = {"ok": True, "error": None, "detail": detail}
+    except Exception as e:
+        check = {"ok": False, "error": str(e) or type(e).__name__, "detail": None}
+    check["latency_ms"] = round((time.monotonic() - started) * 1000, 2)
+
+    return jsonify({
+        "status": "ready" if check["ok"] else "not_ready",
+        "checks": {"postgresql": check}
+    }, 200 if check["ok"] else 503)
+
+
+def read_storage_stats() -> Dict:
+    """Статистика SQLite из category_stats по короткому соединению только для чтения"""
+    conn = sqlite3.connect(f"{Path(SQLITE_DB_PATH).absolute().as_uri()}?mode=ro", uri=True)
+    try:
+        return read_stats(conn)
+    finally:
+        conn.close()
+
+
+async def health(request: Request) -> Response:
+    """Проверка здоровья API"""
+    # Статистика SQLite читается из category_stats за микросекунды, поток не нужен
+    try:
+        stats = read_storage_stats()
+    except sqlite3.Error as e:
+        logger.error(f"Хранилище SQLite недоступно: {e}")
+        return jsonify({
+            "status": "unhealthy",
+            "service": "techpark-api",
+            "error": str(e)
+        }, 503)
+
+    return jsonify({
+        "status": "healthy",
+        "service": "techpark-api",
+        "timestamp": stats
+    })
+
+
+@cached
+async def get_products(request: Request) -> Response:
+    """Список уникальных товаров из PostgreSQL по страницам (курсор next_cursor)"""
+    try:
+        limit = page_limit(request, 100)
+        after_title = page_after_title(request)
+        filters = BookFilters.from_args(request.query_params)
+        fields = parse_fields(request.query_params.get('fields'))
+        rows = await postgres_parser.get_unique_books_from_db(limit + 1, after_title=after_title, filters=filters,
+                                                              fields=fields)
+        products, next_cursor = paginate(rows, limit, page_cursor_key)
+
+        return jsonify({
+            "products": products,
+            "count": len(products),
+            "next_cursor": next_cursor,
+            "status": "success"
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Ошибка при получении товаров: {e}")
+        return jsonify({"error": str(e)}, 500)
+
+
+@cached
+async def get_product(request: Request) -> Response:
+    """Одна книга по id"""
+    book_id = request.path_params['book_id']
+    try:
+        book = await postgres_parser.get_book_by_id(book_id)
+        if book is None:
+            return jsonify({"error": "Книга не найдена"}, 404)
+
+        return jsonify({
+            "product": book,
+            "status": "success"
+        })
+    except Exception as e:
+        logger.error(f"Ошибка при получении книги {book_id}: {e}")
+        return jsonify({"error": str(e)}, 500)
+
+
+@cached
+async def get_stats(request: Request) -> Response:
+    """Получение статистики из PostgreSQL"""
+    try:
+        stats = await postgres_parser.get_stats()
+        return jsonify({
+            "stats": stats,
+            "status": "success"
+        })
+    except Exception as e:
+        logger.error(f"Ошибка при получении статистики: {e}")
+        return jsonify({"error": str(e)}, 500)
+
+
+@cached
+async def search_products(request: Request) -> Response:
+    """Поиск товаров"""
+    try:
+        query = request.query_params.get('q', '')
+        mode = request.query_params.get('mode') or 'substring'
+        filters = BookFilters.from_args(request.query_params)
+        fields = parse_fields(request.query_params.get('fields'))
+        limit = page_limit(request, 50)
+
+        if mode not in SEARCH_MODES:
+            return jsonify({"error": f"Параметр mode должен быть одним из: {', '.join(SEARCH_MODES)}"}, 400)
+        if not query and filters.is_empty():
+            return jsonify({"error": "Необходимо указать поисковый запрос или фильтр"}, 400)
+
+        if query:
+            after = decode_cursor(request.query_params.get('cursor'), SEARCH_CURSOR_FIELDS)
+            search = postgres_parser.fulltext_search if mode == 'fulltext' else postgres_parser.search_books
+            rows = await search(query, limit + 1, after=after, filters=filters, fields=fields)
+            products, next_cursor = paginate(rows, limit, search_cursor_key)
+        else:
+            rows = await postgres_parser.get_unique_books_from_db(limit + 1, after_title=page_after_title(request),
+                                                                  filters=filters, fields=fields)
+            products, next_cursor = paginate(rows, limit, page_cursor_key)
+
+        return jsonify({
+            "products": products,
+            "count": len(products),
+            "query": query,
+            "mode": mode,
+            "category": filters.category or '',
+            "filters": filters.to_dict(),
+            "next_cursor": next_cursor,
+            "status": "success"
+        })
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Ошибка при поиске: {e}")
+        return jsonify({"error": str(e)}, 500)
+
+
+@cached
+async def get_categories(request: Request) -> Response:
+    """Получение списка категорий из PostgreSQL"""
+    try:
+        stats = await postgres_parser.get_stats()
+        categories = list(stats.get('categories', {}).keys())
+
+        return jsonify({
+            "categories": categories,
+            "count": len(categories),
+            "status": "success"
+        })
+    except Exception as e:
+        logger.error(f"Ошибка при получении категорий: {e}")
+        return jsonify({"error": str(e)}, 500)
+
+
+async def cache_stats(request: Request) -> Response:
+    """Заполненность и эффективность кэша ответов"""
+    return jsonify({
+        "cache": response_cache.stats(),
+        "status": "success"
+    })
+
+
+async def cache_invalidate(request: Request) -> Response:
+    """Сброс кэша ответов (вызывается после экспорта в PostgreSQL)"""
+    token = os.environ.get('CACHE_INVALIDATE_TOKEN')
+    if token and request.headers.get('X-Cache-Token') != token:
+        return jsonify({"error": "Неверный токен"}, 403)
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    reason = data.get('reason') if isinstance(data, dict) else None
+    generation = response_cache.invalidate(reason or 'запрос API')
+    return jsonify({
+        "generation": generation,
+        "status": "success"
+    })
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Пул PostgreSQL создается при старте воркера и закрывается при остановке"""
+    await postgres_parser.connect()
+    try:
+        yield
+    finally:
+        await postgres_parser.disconnect()
+
+
+app = Starlette(
+    routes=[
+        Route('/livez', livez),
+        Route('/readyz', readyz),
+        Route('/health', health),
+        Route('/products', get_products),
+        Route('/products/{book_id:int}', get_product),
+        Route('/stats', get_stats),
+        Route('/search', search_products),
+        Route('/categories', get_categories),
+        Route('/cache/stats', cache_stats),
+        Route('/cache/invalidate', cache_invalidate, methods=['POST'])
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*']), Middleware(NegotiationMiddleware)],
+    lifespan=lifespan
+)
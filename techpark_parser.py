@@ -5,15 +5,27 @@
 
 import requests
 from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
 import json
 import time
 import random
 from urllib.parse import urljoin, urlparse
 import os
 from datetime import datetime
-import sqlite3
-from typing import List, Dict, Optional
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from crawl_sources import CrawlScheduler, CrawlSource, SourceRegistry, SourceStateStore
+from sqlite_storage import SQLiteStorage
+from product_record import Product
+from sqlite_migrations import run_migrations
+from price_history import PriceHistoryStore, observation_params
+from bulk_ingest import bulk_ingest
+from category_stats import add_inserted_rows, read_stats, rebuild_category_stats, verify_category_stats
+from product_search import SEARCH_SQL, build_match_query, index_inserted_rows
 
 # Продвинутые техники парсинга
 from fake_useragent import UserAgent
@@ -36,8 +48,37 @@ import undetected_chromedriver as uc
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Источники, которым нужен Selenium WebDriver
+SELENIUM_BACKENDS = ('books_to_scrape', 'real_site')
+
+# Пакетная запись товаров
+INGEST_BATCH_SIZE = 500
+# Повторно найденный товар обновляет изменчивые поля и last_seen_at
+INSERT_PRODUCT_SQL = '''
+    INSERT INTO products (name, price, old_price, category, brand, description,
+                          image_url, product_url, availability, rating, reviews_count,
+                          natural_key, last_seen_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(natural_key) DO UPDATE SET
+        price = excluded.price,
+        old_price = excluded.old_price,
+        availability = excluded.availability,
+        rating = excluded.rating,
+        reviews_count = excluded.reviews_count,
+        last_seen_at = excluded.last_seen_at
+'''
+
+# Размер порции при потоковом чтении страницы
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Классы карточек для потокового режима. Селекторы вида [class*="product"]
+# здесь не используются: без полного дерева нельзя отличить карточку от
+# обертки списка, поэтому карточкой считается внешний элемент с точным классом
+STREAM_CARD_CLASSES = {'product-item', 'product-card', 'product_pod', 'product', 'item'}
+STREAM_CARD_TAGS = {'div', 'article', 'li'}
+
 class TehnoparserBooks:
-    def __init__(self, db_path: str = "books_products.db"):
+    def __init__(self, db_path: str = "books_products.db", sources_path: Optional[str] = None):
         # Books to Scrape - открытый сайт для парсинга
         self.base_url = "https://books.toscrape.com"
         self.session = requests.Session()
@@ -62,41 +103,29 @@ class TehnoparserBooks:
         })
         
         self.db_path = db_path
+        self.storage = SQLiteStorage(db_path)
         self.init_database()
+        self.price_history = PriceHistoryStore(self.storage)
+        
+        # Реестр источников и планировщик обхода
+        self.registry = SourceRegistry.load(sources_path) if sources_path else SourceRegistry.load()
+        self.source_state = SourceStateStore(self.storage)
+        self.scheduler = CrawlScheduler(self.registry, self.source_state)
         
         # Инициализация UserAgent
         self.ua = UserAgent()
         self.driver = None
+        
+        # Полный парсинг и фоновый дообход делят один WebDriver
+        self.crawl_lock = threading.RLock()
     
     def init_database(self):
-        """Инициализация базы данных SQLite"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                price REAL,
-                old_price REAL,
-                category TEXT,
-                brand TEXT,
-                description TEXT,
-                image_url TEXT,
-                product_url TEXT,
-                availability TEXT,
-                rating REAL,
-                reviews_count INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Инициализация базы данных SQLite: применение миграций схемы"""
+        self.migration_report = run_migrations(self.storage)
         logger.info("База данных инициализирована")
     
-    def get_products_by_category(self, category: str, limit: int = 20) -> List[Dict]:
-        """Получение товаров по категории"""
+    def get_products_by_category(self, category: str, limit: int = 20, streaming: bool = False) -> List[Product]:
+        """Получение товаров по категории (streaming=True — потоковый разбор с постоянной памятью)"""
         products = []
         
         # Различные URL для парсинга категорий
@@ -117,6 +146,14 @@ class TehnoparserBooks:
                 # Случайная задержка
                 time.sleep(random.uniform(2, 5))
                 
+                if streaming:
+                    products.extend(self.fetch_products_streaming(url, category, limit))
+                    if products:
+                        logger.info(f"Успешно получено {len(products)} товаров из {url}")
+                        break
+                    logger.warning(f"Не найдено товаров на {url}")
+                    continue
+                
                 response = self.session.get(url, timeout=15)
                 
                 if response.status_code == 200:
@@ -148,9 +185,8 @@ class TehnoparserBooks:
                                 break
                                 
                             product_data = self.extract_product_data(card, soup)
-                            if product_data and product_data.get('name'):
-                                product_data['category'] = category
-                                products.append(product_data)
+                            if product_data:
+                                products.append(product_data.with_category(category))
                                 count += 1
                                 
                             # Задержка между товарами
@@ -168,8 +204,81 @@ class TehnoparserBooks:
                 
         return products
     
-    def extract_product_data(self, card, soup) -> Optional[Dict]:
-        """Извлечение данных о товаре из карточки"""
+    def fetch_products_streaming(self, url: str, category: str, limit: int = 20, extract=None) -> List[Product]:
+        """Потоковая загрузка страницы: тело читается порциями и не хранится целиком"""
+        products = []
+        
+        with self.session.get(url, timeout=15, stream=True) as response:
+            if response.status_code != 200:
+                logger.warning(f"Страница {url} вернула статус {response.status_code}")
+                return products
+            
+            chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+            for product_data in self.iter_products_streaming(chunks, category, extract, page_url=url):
+                products.append(product_data)
+                if len(products) >= limit:
+                    break
+        
+        return products
+    
+    @staticmethod
+    def _is_stream_card(element) -> bool:
+        """Является ли элемент карточкой товара в потоковом режиме"""
+        if not isinstance(element.tag, str) or element.tag not in STREAM_CARD_TAGS:
+            return False
+        if element.get('data-product-id') is not None:
+            return True
+        return not STREAM_CARD_CLASSES.isdisjoint((element.get('class') or '').split())
+    
+    def iter_products_streaming(self, chunks, category: str, extract=None,
+                                page_url: Optional[str] = None) -> Iterator[Product]:
+        """
+        Инкрементальный разбор HTML: товар отдается, как только закрывается
+        элемент карточки, после чего разобранные поддеревья удаляются.
+        extract(fragment, page_url) — разбор фрагмента карточки (по умолчанию
+        общий разбор); относительные ссылки разрешаются от page_url
+        """
+        if extract is None:
+            extract = lambda fragment, url: self.extract_product_data(fragment, None, url)
+        
+        pull_parser = etree.HTMLPullParser(events=('start', 'end'))
+        
+        def read_events():
+            for chunk in chunks:
+                pull_parser.feed(chunk)
+                yield from pull_parser.read_events()
+            # HTML парсер libxml2 буферизует хвост документа: его события
+            # появляются только после close()
+            pull_parser.close()
+            yield from pull_parser.read_events()
+        
+        card = None
+        for event, element in read_events():
+            if event == 'start':
+                if card is None and self._is_stream_card(element):
+                    card = element
+                continue
+            
+            if card is not None and element is not card:
+                # Внутренности карточки нужны до ее закрытия
+                continue
+            
+            if element is card:
+                card = None
+                fragment = BeautifulSoup(lxml_html.tostring(element), 'html.parser')
+                product_data = extract(fragment, page_url)
+                if product_data:
+                    yield product_data.with_category(category)
+            
+            # Освобождаем закрытый элемент и уже обработанных соседей
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+    
+    def extract_product_data(self, card, soup, page_url: Optional[str] = None) -> Optional[Product]:
+        """Извлечение данных о товаре из карточки (ссылки разрешаются от page_url или корня сайта)"""
         try:
             product_data = {}
             
@@ -249,7 +358,7 @@ class TehnoparserBooks:
                 img_url = img_elem.get('src') or img_elem.get('data-src') or img_elem.get('data-lazy')
                 if img_url:
                     if not img_url.startswith('http'):
-                        img_url = urljoin(self.base_url, img_url)
+                        img_url = urljoin(page_url or self.base_url, img_url)
                     product_data['image_url'] = img_url
             
             # Ссылка на товар
@@ -258,7 +367,7 @@ class TehnoparserBooks:
                 href = link_elem.get('href')
                 if href:
                     if not href.startswith('http'):
-                        href = urljoin(self.base_url, href)
+                        href = urljoin(page_url or self.base_url, href)
                     product_data['product_url'] = href
             
             # Рейтинг
@@ -289,121 +398,152 @@ class TehnoparserBooks:
             else:
                 product_data['availability'] = 'В наличии'
             
-            return product_data if product_data.get('name') else None
+            return Product.from_dict(product_data) if product_data.get('name') else None
             
         except Exception as e:
             logger.error(f"Ошибка при извлечении данных товара: {e}")
             return None
     
-    def save_product_to_db(self, product_data: Dict):
-        """Сохранение товара в базу данных"""
+    def save_products_bulk(self, products: Iterable[Product], batch_size: int = INGEST_BATCH_SIZE) -> List[Dict]:
+        """
+        Пакетное сохранение товаров: executemany по batch_size строк,
+        одна транзакция на пакет. Возвращает время записи каждого пакета.
+        Словари по-прежнему принимаются и приводятся к Product.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size должен быть >= 1")
+        
+        timings = []
+        batch = []
+        observations = []
+        
+        def flush():
+            started = time.perf_counter()
+            self._write_rows(batch, observations)
+            timings.append({
+                "batch": len(timings) + 1,
+                "rows": len(batch),
+                "seconds": round(time.perf_counter() - started, 6)
+            })
+            batch.clear()
+            observations.clear()
+        
+        for product in products:
+            row, observation = self._product_params(product)
+            batch.append(row)
+            observations.append(observation)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        
+        total_rows = sum(timing['rows'] for timing in timings)
+        total_seconds = sum(timing['seconds'] for timing in timings)
+        logger.info(f"Сохранено {total_rows} товаров пакетами по {batch_size} за {total_seconds:.3f} с")
+        return timings
+    
+    @staticmethod
+    def _product_params(product) -> Tuple[tuple, tuple]:
+        """Строка products и наблюдение истории цен для одного товара"""
+        product = Product.coerce(product)
+        row = product.to_row()
+        return row, observation_params(row[-1], product.price, product.availability, int(time.time()))
+    
+    def _write_rows(self, rows: List[tuple], observations: List[tuple]):
+        """
+        Запись строк товаров одной транзакцией. Новые строки попадают в
+        FTS индекс и category_stats одним запросом на пакет, а не триггерами
+        """
+        with self.storage.write() as conn:
+            with bulk_ingest(conn) as last_id:
+                conn.executemany(INSERT_PRODUCT_SQL, rows)
+            index_inserted_rows(conn, last_id)
+            add_inserted_rows(conn, last_id)
+            # История цен пишется в той же транзакции, только при изменениях
+            self.price_history.record(conn, observations)
+    
+    def save_product_to_db(self, product: Product) -> bool:
+        """Сохранение одного товара в базу данных. Возвращает True при успехе"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO products (name, price, old_price, category, brand, description, 
-                                   image_url, product_url, availability, rating, reviews_count)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                product_data.get('name'),
-                product_data.get('price'),
-                product_data.get('old_price'),
-                product_data.get('category'),
-                product_data.get('brand'),
-                product_data.get('description', ''),
-                product_data.get('image_url'),
-                product_data.get('product_url'),
-                product_data.get('availability'),
-                product_data.get('rating'),
-                product_data.get('reviews_count', 0)
-            ))
-            
-            conn.commit()
-            conn.close()
-            logger.info(f"Товар '{product_data.get('name')}' сохранен в базу данных")
+            row, observation = self._product_params(product)
+            self._write_rows([row], [observation])
+            logger.info(f"Товар '{row[0]}' сохранен в базу данных")
+            return True
             
         except Exception as e:
             logger.error(f"Ошибка при сохранении товара в БД: {e}")
+            return False
     
-    def parse_100_products(self):
-        """Реальный парсинг 100 книг с Books to Scrape"""
-        logger.info("Начинаем реальный парсинг 100 книг с Books to Scrape...")
+    def save_source_products(self, products: List[Product]) -> int:
+        """
+        Сохранение товаров источника пакетом. Если пакет не записался,
+        товары сохраняются по одному, чтобы битая строка не отбрасывала
+        весь источник. Возвращает число сохраненных товаров.
+        """
+        try:
+            self.save_products_bulk(products)
+            return len(products)
+        except Exception as e:
+            logger.warning(f"Пакетное сохранение не удалось ({e}), сохраняем товары по одному")
         
-        total_products = 0
+        saved = sum(1 for product in products if self.save_product_to_db(product))
+        skipped = len(products) - saved
+        if skipped:
+            logger.warning(f"Пропущено товаров с ошибками: {skipped}")
+        return saved
+    
+    def parse_100_products(self, max_products: int = 100, include_fresh: bool = True,
+                           progress_callback: Optional[Callable[[int, int], None]] = None):
+        """Реальный парсинг 100 книг по источникам из реестра"""
+        logger.info(f"Начинаем реальный парсинг {max_products} книг по реестру источников...")
         
-        # Books to Scrape - открытый сайт для парсинга
-        sources = [
-            {
-                "name": "Books to Scrape",
-                "url": "https://books.toscrape.com/catalogue/page-1.html",
-                "category": "books",
-                "type": "selenium"
-            },
-            {
-                "name": "Books to Scrape - Travel",
-                "url": "https://books.toscrape.com/catalogue/category/books/travel_2/index.html",
-                "category": "travel",
-                "type": "selenium"
-            },
-            {
-                "name": "Books to Scrape - Mystery",
-                "url": "https://books.toscrape.com/catalogue/category/books/mystery_3/index.html",
-                "category": "mystery",
-                "type": "selenium"
-            },
-            {
-                "name": "Books to Scrape - Fiction",
-                "url": "https://books.toscrape.com/catalogue/category/books/fiction_10/index.html",
-                "category": "fiction",
-                "type": "selenium"
-            }
-        ]
+        # Источники описаны декларативно в sources.json, порядок задает планировщик
+        plan = self.scheduler.plan(include_fresh=include_fresh)
+        if not plan:
+            logger.info("Нет источников, требующих обновления")
+            return 0
+        
+        logger.info("План обхода: " + ", ".join(source.name for source in plan))
+        
+        with self.crawl_lock:
+            return self._crawl_plan(plan, max_products, progress_callback)
+    
+    def _crawl_plan(self, plan: List[CrawlSource], max_products: int,
+                    progress_callback: Optional[Callable[[int, int], None]] = None) -> int:
+        """Обход источников по плану с сохранением товаров"""
+        total_products = 0
         
         try:
-            # Инициализируем Selenium
-            if not self.setup_selenium_driver():
-                logger.error("Не удалось инициализировать Selenium")
-                return 0
+            # Selenium нужен только браузерным источникам
+            if any(source.backend in SELENIUM_BACKENDS and not source.streaming for source in plan):
+                if not self.setup_selenium_driver():
+                    logger.error("Не удалось инициализировать Selenium")
+                    return 0
             
-            for source in sources:
-                if total_products >= 100:
+            for source in plan:
+                if total_products >= max_products:
                     break
                     
                 try:
-                    logger.info(f"Парсинг {source['name']}: {source['category']}")
+                    logger.info(f"Парсинг {source.name}: {source.category} ({source.backend})")
                     
-                    # Выбираем метод парсинга
-                    if source.get('type') == 'selenium':
-                        products = self.parse_books_to_scrape(source['url'], source['category'])
-                    elif source.get('type') == 'api':
-                        products = self.parse_api_source(source['url'], source['category'])
-                    else:
-                        products = self.parse_real_site_with_selenium(source['url'], source['category'])
+                    products = self.crawl_source(source)[:max_products - total_products]
                     
-                    for product in products:
-                        if total_products >= 100:
-                            break
-                        
-                        try:
-                            # Сохраняем в базу данных
-                            self.save_product_to_db(product)
-                            total_products += 1
-                            
-                            logger.info(f"Обработан товар {total_products}/100: {product.get('name')}")
-                            
-                            # Задержка между товарами
-                            time.sleep(random.uniform(0.5, 1.5))
-                            
-                        except Exception as e:
-                            logger.error(f"Ошибка при обработке товара: {e}")
-                            continue
+                    # Сохраняем товары источника пакетом (с откатом на построчную запись)
+                    saved = self.save_source_products(products)
+                    total_products += saved
+                    
+                    logger.info(f"Обработано товаров {total_products}/{max_products}")
+                    if progress_callback:
+                        progress_callback(total_products, max_products)
+                    
+                    self.source_state.mark_crawled(source.name, saved)
                     
                     # Задержка между источниками
                     time.sleep(random.uniform(2, 5))
                     
                 except Exception as e:
-                    logger.error(f"Ошибка при парсинге {source['name']}: {e}")
+                    logger.error(f"Ошибка при парсинге {source.name}: {e}")
                     continue
             
         finally:
@@ -413,16 +553,64 @@ class TehnoparserBooks:
         logger.info(f"Реальный парсинг завершен. Обработано {total_products} товаров")
         return total_products
     
-    def get_products_from_db(self, limit: int = 100) -> List[Dict]:
-        """Получение товаров из базы данных"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def crawl_source(self, source: CrawlSource) -> List[Product]:
+        """Обход страниц источника в пределах page_budget и item_budget"""
+        pages = source.pages
+        
+        # Браузер один, поэтому параллельно обходятся только HTTP источники
+        uses_browser = source.backend in SELENIUM_BACKENDS and not source.streaming
+        workers = 1 if uses_browser else min(source.concurrency, len(pages))
         
-        cursor.execute('''
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(lambda url: self.crawl_page(source, url), pages))
+        else:
+            results = [self.crawl_page(source, url) for url in pages]
+        
+        products = []
+        for page_products in results:
+            products.extend(page_products)
+        
+        return products[:source.item_budget]
+    
+    def crawl_page(self, source: CrawlSource, url: str) -> List[Product]:
+        """Парсинг одной страницы источника его backend'ом"""
+        backends = {
+            'books_to_scrape': self.parse_books_to_scrape,
+            'api': self.parse_api_source,
+            'real_site': self.parse_real_site_with_selenium
+        }
+        if source.streaming:
+            # Потоковый режим: страница читается по HTTP порциями, без Selenium
+            extractors = {
+                'books_to_scrape': self.extract_book_card,
+                'real_site': None
+            }
+            # Неизвестный backend — ошибка конфигурации, а не сбой загрузки страницы
+            if source.backend not in extractors:
+                raise ValueError(f"Источник '{source.name}': потоковый режим не поддерживается для backend "
+                                 f"'{source.backend}'")
+            extract = extractors[source.backend]
+            try:
+                return self.fetch_products_streaming(url, source.category, source.item_budget, extract)
+            except Exception as e:
+                logger.error(f"Ошибка потокового парсинга {url}: {e}")
+                return []
+        return backends[source.backend](url, source.category)
+    
+    def get_products_from_db(self, limit: int = 100, after: Optional[Tuple[str, int]] = None) -> List[Dict]:
+        """
+        Получение товаров из базы данных, самые новые первыми.
+        after — (created_at, id) последнего товара предыдущей страницы.
+        """
+        cursor = self.storage.reader().cursor()
+        
+        cursor.execute(f'''
             SELECT * FROM products 
-            ORDER BY created_at DESC 
+            {"WHERE (created_at, id) < (?, ?)" if after else ""}
+            ORDER BY created_at DESC, id DESC 
             LIMIT ?
-        ''', (limit,))
+        ''', (*after, limit) if after else (limit,))
         
         columns = [description[0] for description in cursor.description]
         products = []
@@ -431,65 +619,81 @@ class TehnoparserBooks:
             product = dict(zip(columns, row))
             products.append(product)
         
-        conn.close()
+        cursor.close()
         return products
     
-    def get_unique_products_from_db(self, limit: int = 100) -> List[Dict]:
+    def get_unique_products_from_db(self, limit: int = 100, after: Optional[Tuple[str, int]] = None) -> List[Dict]:
         """Получение уникальных товаров из базы данных (без дубликатов)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Получаем все товары и фильтруем дубликаты в Python
-        cursor.execute('''
-            SELECT * FROM products 
-            ORDER BY created_at DESC
-        ''')
+        return list(self.iter_unique_products(limit, after))
+    
+    def iter_unique_products(self, limit: int = 100, after: Optional[Tuple[str, int]] = None) -> Iterator[Dict]:
+        """
+        Потоковая выдача уникальных по названию товаров, самые новые первыми.
+        Внешний обход идет по индексу created_at, а проверка «нет более новой
+        записи с тем же названием» — по покрывающему индексу (name, created_at),
+        поэтому стоимость зависит от limit, а не от размера таблицы.
+        after — курсор (created_at, id): следующая страница начинается
+        с позиции в индексе, а не пропуском OFFSET строк.
+        """
+        cursor = self.storage.reader().execute(f'''
+            SELECT p.* FROM products p
+            WHERE NOT EXISTS (
+                SELECT 1 FROM products q
+                WHERE q.name = p.name
+                  AND (q.created_at > p.created_at OR (q.created_at = p.created_at AND q.id > p.id))
+            )
+            {"AND (p.created_at, p.id) < (?, ?)" if after else ""}
+            ORDER BY p.created_at DESC, p.id DESC
+            LIMIT ?
+        ''', (*after, limit) if after else (limit,))
         
         columns = [description[0] for description in cursor.description]
-        all_products = []
-        
-        for row in cursor.fetchall():
-            product = dict(zip(columns, row))
-            all_products.append(product)
-        
-        # Фильтруем дубликаты по названию, оставляем только самую новую запись
-        unique_products = []
-        seen_names = set()
-        
-        for product in all_products:
-            if product['name'] not in seen_names:
-                unique_products.append(product)
-                seen_names.add(product['name'])
-                
-                if len(unique_products) >= limit:
-                    break
+        try:
+            for row in cursor:
+                yield dict(zip(columns, row))
+        finally:
+            cursor.close()
+    
+    def search_products(self, query: str, limit: int = 20, category: Optional[str] = None) -> List[Dict]:
+        """
+        Полнотекстовый поиск по названию, бренду и описанию (FTS5).
+        Результаты упорядочены по BM25 (score: чем меньше, тем релевантнее),
+        name_highlight и snippet содержат найденные слова в тегах <b>.
+        """
+        match_query = build_match_query(query)
+        if not match_query:
+            return []
         
-        conn.close()
-        return unique_products
+        cursor = self.storage.reader().execute(SEARCH_SQL, {
+            'query': match_query,
+            'category': category,
+            'limit': limit
+        })
+        columns = [description[0] for description in cursor.description]
+        products = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cursor.close()
+        return products
     
     def get_stats(self) -> Dict:
-        """Получение статистики"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Общее количество товаров
-        cursor.execute('SELECT COUNT(*) FROM products')
-        total_products = cursor.fetchone()[0]
-        
-        # Количество по категориям
-        cursor.execute('SELECT category, COUNT(*) FROM products GROUP BY category')
-        categories = dict(cursor.fetchall())
-        
-        # Средняя цена
-        cursor.execute('SELECT AVG(price) FROM products WHERE price IS NOT NULL')
-        avg_price = cursor.fetchone()[0] or 0
+        """Получение статистики из таблицы category_stats (обновляется триггерами)"""
+        return read_stats(self.storage.reader())
+    
+    def verify_stats(self, rebuild: bool = False) -> Dict:
+        """Сверка category_stats с полным пересчетом; rebuild=True исправляет расхождения"""
+        with self.storage.write() as conn:
+            mismatches = verify_category_stats(conn)
+            if mismatches and rebuild:
+                rebuild_category_stats(conn)
         
-        conn.close()
+        if mismatches:
+            logger.warning(f"Статистика расходится с пересчетом: {mismatches}")
+        else:
+            logger.info("Статистика совпадает с пересчетом")
         
         return {
-            'total_products': total_products,
-            'categories': categories,
-            'average_price': round(avg_price, 2)
+            "ok": not mismatches,
+            "mismatches": mismatches,
+            "rebuilt": bool(mismatches and rebuild)
         }
     
     def setup_selenium_driver(self):
@@ -602,8 +806,10 @@ class TehnoparserBooks:
                 logger.info("Selenium WebDriver закрыт")
             except Exception as e:
                 logger.error(f"Ошибка при закрытии Selenium: {e}")
+            finally:
+                self.driver = None
     
-    def parse_with_selenium(self, url: str, category: str) -> List[Dict]:
+    def parse_with_selenium(self, url: str, category: str) -> List[Product]:
         """Парсинг с использованием Selenium"""
         products = []
         
@@ -657,9 +863,8 @@ class TehnoparserBooks:
             for element in product_elements[:20]:  # Берем первые 20
                 try:
                     product_data = self.extract_product_data_selenium(element)
-                    if product_data and product_data.get('name'):
-                        product_data['category'] = category
-                        products.append(product_data)
+                    if product_data:
+                        products.append(product_data.with_category(category))
                 except Exception as e:
                     logger.error(f"Ошибка при извлечении данных: {e}")
                     continue
@@ -671,7 +876,7 @@ class TehnoparserBooks:
         
         return products
     
-    def extract_product_data_selenium(self, element) -> Optional[Dict]:
+    def extract_product_data_selenium(self, element) -> Optional[Product]:
         """Извлечение данных о товаре из Selenium элемента"""
         try:
             product_data = {}
@@ -768,13 +973,13 @@ class TehnoparserBooks:
             except:
                 pass
             
-            return product_data if product_data.get('name') else None
+            return Product.from_dict(product_data) if product_data.get('name') else None
             
         except Exception as e:
             logger.error(f"Ошибка при извлечении данных из Selenium элемента: {e}")
             return None
     
-    def parse_real_site_with_selenium(self, url: str, category: str) -> List[Dict]:
+    def parse_real_site_with_selenium(self, url: str, category: str) -> List[Product]:
         """Парсинг реального сайта с использованием Selenium"""
         products = []
         
@@ -858,9 +1063,8 @@ class TehnoparserBooks:
             for element in product_elements[:25]:  # Берем первые 25
                 try:
                     product_data = self.extract_real_product_data(element, url)
-                    if product_data and product_data.get('name'):
-                        product_data['category'] = category
-                        products.append(product_data)
+                    if product_data:
+                        products.append(product_data.with_category(category))
                 except Exception as e:
                     logger.error(f"Ошибка при извлечении данных: {e}")
                     continue
@@ -872,7 +1076,7 @@ class TehnoparserBooks:
         
         return products
     
-    def parse_api_source(self, url: str, category: str) -> List[Dict]:
+    def parse_api_source(self, url: str, category: str) -> List[Product]:
         """Парсинг данных из API"""
         products = []
         
@@ -890,7 +1094,7 @@ class TehnoparserBooks:
                 for item in data[:25]:  # Берем первые 25 элементов
                     try:
                         product_data = self.convert_api_data_to_product(item, category, url)
-                        if product_data and product_data.get('name'):
+                        if product_data:
                             products.append(product_data)
                     except Exception as e:
                         logger.error(f"Ошибка при обработке API элемента: {e}")
@@ -903,7 +1107,7 @@ class TehnoparserBooks:
         
         return products
     
-    def convert_api_data_to_product(self, item: Dict, category: str, source_url: str) -> Optional[Dict]:
+    def convert_api_data_to_product(self, item: Dict, category: str, source_url: str) -> Optional[Product]:
         """Конвертация данных из API в формат товара"""
         try:
             product_data = {
@@ -1005,13 +1209,13 @@ class TehnoparserBooks:
                 rating = 3.0 + (item['id'] % 20) / 10  # Рейтинг от 3.0 до 5.0
                 product_data['rating'] = round(rating, 1)
             
-            return product_data
+            return Product.from_dict(product_data)
             
         except Exception as e:
             logger.error(f"Ошибка при конвертации API данных: {e}")
             return None
     
-    def parse_books_to_scrape(self, url: str, category: str) -> List[Dict]:
+    def parse_books_to_scrape(self, url: str, category: str) -> List[Product]:
         """Парсинг книг с Books to Scrape"""
         products = []
         
@@ -1039,9 +1243,8 @@ class TehnoparserBooks:
             for element in book_elements[:25]:  # Берем первые 25
                 try:
                     book_data = self.extract_book_data(element, url)
-                    if book_data and book_data.get('name'):
-                        book_data['category'] = category
-                        products.append(book_data)
+                    if book_data:
+                        products.append(book_data.with_category(category))
                 except Exception as e:
                     logger.error(f"Ошибка при извлечении данных книги: {e}")
                     continue
@@ -1053,7 +1256,7 @@ class TehnoparserBooks:
         
         return products
     
-    def extract_book_data(self, element, url: str) -> Optional[Dict]:
+    def extract_book_data(self, element, url: str) -> Optional[Product]:
         """Извлечение данных о книге из Books to Scrape"""
         try:
             book_data = {}
@@ -1124,13 +1327,63 @@ class TehnoparserBooks:
             # Бренд (автор) - попробуем извлечь из ссылки или используем "Unknown"
             book_data['brand'] = "Unknown Author"
             
-            return book_data if book_data.get('name') else None
+            return Product.from_dict(book_data) if book_data.get('name') else None
             
         except Exception as e:
             logger.error(f"Ошибка при извлечении данных книги: {e}")
             return None
     
-    def parse_with_qrator_bypass(self, url: str, category: str) -> List[Dict]:
+    def extract_book_card(self, card, page_url: str) -> Optional[Product]:
+        """
+        Извлечение данных о книге Books to Scrape из HTML фрагмента карточки
+        (потоковый режим). Ссылки в карточках относительные (../../../...),
+        поэтому разрешаются от адреса страницы, как href в Selenium
+        """
+        try:
+            book_data = {}
+            
+            # Текст ссылки обрезан, полное название — в атрибуте title
+            title_elem = card.select_one('h3 a')
+            if title_elem is None:
+                return None
+            book_data['name'] = title_elem.get('title') or title_elem.get_text(strip=True)
+            
+            href = title_elem.get('href')
+            if href:
+                book_data['product_url'] = urljoin(page_url, href)
+            
+            price_elem = card.select_one('.price_color')
+            if price_elem:
+                try:
+                    book_data['price'] = float(price_elem.get_text(strip=True).replace('£', '').replace('$', ''))
+                except ValueError:
+                    pass
+            
+            rating_map = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
+            rating_elem = card.select_one('.star-rating')
+            if rating_elem:
+                for class_name in rating_elem.get('class', []):
+                    if class_name in rating_map:
+                        book_data['rating'] = rating_map[class_name]
+                        break
+            
+            img_elem = card.select_one('img')
+            if img_elem and img_elem.get('src'):
+                book_data['image_url'] = urljoin(page_url, img_elem['src'])
+            
+            availability_elem = card.select_one('.availability')
+            if availability_elem:
+                book_data['availability'] = availability_elem.get_text(strip=True)
+            
+            book_data['brand'] = "Unknown Author"
+            
+            return Product.from_dict(book_data) if book_data.get('name') else None
+            
+        except Exception as e:
+            logger.error(f"Ошибка при извлечении данных книги: {e}")
+            return None
+    
+    def parse_with_qrator_bypass(self, url: str, category: str) -> List[Product]:
         """Парсинг с обходом защиты Qrator"""
         products = []
         
@@ -1204,9 +1457,8 @@ class TehnoparserBooks:
             for element in product_elements[:25]:  # Берем первые 25
                 try:
                     product_data = self.extract_real_product_data(element, url)
-                    if product_data and product_data.get('name'):
-                        product_data['category'] = category
-                        products.append(product_data)
+                    if product_data:
+                        products.append(product_data.with_category(category))
                 except Exception as e:
                     logger.error(f"Ошибка при извлечении данных: {e}")
                     continue
@@ -1218,7 +1470,7 @@ class TehnoparserBooks:
         
         return products
     
-    def extract_real_product_data(self, element, url: str) -> Optional[Dict]:
+    def extract_real_product_data(self, element, url: str) -> Optional[Product]:
         """Извлечение данных о товаре из реального сайта"""
         try:
             product_data = {}
@@ -1326,12 +1578,20 @@ class TehnoparserBooks:
             except:
                 pass
             
-            return product_data if product_data.get('name') else None
+            return Product.from_dict(product_data) if product_data.get('name') else None
             
         except Exception as e:
             logger.error(f"Ошибка при извлечении данных товара: {e}")
             return None
 
 if __name__ == "__main__":
-    parser = TechparkParser()
+    import sys
+    
+    parser = TehnoparserBooks()
+    if len(sys.argv) > 1 and sys.argv[1] == "verify-stats":
+        # python techpark_parser.py verify-stats [--rebuild]
+        result = parser.verify_stats(rebuild="--rebuild" in sys.argv)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        sys.exit(0 if result["ok"] or result["rebuilt"] else 1)
+    
     parser.parse_100_products()
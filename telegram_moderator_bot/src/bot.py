@@ -1195,17 +1195,10 @@ class ModeratorBot:
             await callback.answer("📖 Загрузка информации о книге...")
             
             async with ParserIntegration() as parser:
-                result = await parser.get_books_list(100)  # Получаем больше книг для поиска
+                result = await parser.get_book(book_id)
                 
                 if result["success"]:
-                    books = result["data"]
-                    book = None
-                    
-                    # Ищем книгу по ID
-                    for b in books:
-                        if str(b.get('id', '')) == str(book_id):
-                            book = b
-                            break
+                    book = result["data"]
                     
                     if book:
                         # Формируем детальную информацию
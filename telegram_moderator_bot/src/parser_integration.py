@@ -5,11 +5,32 @@
 import aiohttp
 import asyncio
 import logging
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from .config import Config
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 logger = logging.getLogger(__name__)
 
+# Сколько ответов с ETag хранить для условных запросов
+ETAG_CACHE_SIZE = 64
+
+# Колонки, которые бот показывает в списках книг (подробности — через /products/<id>)
+LIST_FIELDS = "id,title,price,category"
+
+# Компактное представление ответов API: MessagePack, если пакет установлен.
+# Сжатие gzip aiohttp запрашивает и распаковывает сам.
+MSGPACK_MIMETYPE = "application/msgpack"
+ACCEPT = f"{MSGPACK_MIMETYPE}, application/json;q=0.9" if msgpack is not None else "application/json"
+
+# URL -> (ETag, тело ответа) для If-None-Match. Общий для всех экземпляров:
+# обработчики бота создают ParserIntegration на каждый запрос
+_etag_cache: "OrderedDict[str, Tuple[str, Dict]]" = OrderedDict()
+
 class ParserIntegration:
     """Класс для интеграции с парсером книг"""
     
@@ -45,6 +66,51 @@ class ParserIntegration:
                 logger.warning(f"Попытка {attempt + 1} неудачна, повторяем через 2 секунды: {e}")
                 await asyncio.sleep(2)
     
+    async def _get_json(self, url: str, timeout: int = 30) -> Tuple[int, Optional[Dict], str]:
+        """
+        GET запрос к API в компактном представлении (MessagePack или JSON).
+        Если для URL сохранен ETag, отправляется If-None-Match, и ответ 304
+        возвращается как 200 с сохраненным телом без повторной загрузки.
+        Возвращает (статус, тело, текст ошибки).
+        """
+        if not self.session:
+            self.session = aiohttp.ClientSession()
+        
+        cached = _etag_cache.get(url)
+        headers = {"Accept": ACCEPT}
+        if cached:
+            headers["If-None-Match"] = cached[0]
+        
+        async with self.session.get(
+            url,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            if response.status == 304 and cached:
+                _etag_cache.move_to_end(url)
+                return 200, cached[1], ""
+            
+            if response.status == 200:
+                result = await self._read_body(response)
+                etag = response.headers.get("ETag")
+                if etag:
+                    _etag_cache[url] = (etag, result)
+                    _etag_cache.move_to_end(url)
+                    while len(_etag_cache) > ETAG_CACHE_SIZE:
+                        _etag_cache.popitem(last=False)
+                return 200, result, ""
+            
+            if response.content_type == MSGPACK_MIMETYPE:
+                return response.status, None, str(await self._read_body(response))
+            return response.status, None, await response.text()
+    
+    @staticmethod
+    async def _read_body(response: aiohttp.ClientResponse):
+        """Тело ответа по Content-Type: MessagePack или JSON"""
+        if response.content_type == MSGPACK_MIMETYPE:
+            return msgpack.unpackb(await response.read(), strict_map_key=False)
+        return await response.json()
+    
     async def start_parsing(self) -> Dict:
         """Запуск парсинга книг"""
         try:
@@ -64,15 +130,16 @@ class ParserIntegration:
                 "POST",
                 f"{self.parser_api_url}/parse",
                 json={"force": True},
-                timeout=aiohttp.ClientTimeout(total=300)  # 5 минут таймаут
+                timeout=aiohttp.ClientTimeout(total=30)  # API сразу возвращает id задачи
             )
             
-            if response.status == 200:
+            if response.status in (200, 202):
                 result = await response.json()
                 logger.info(f"✅ Парсинг запущен: {result}")
                 return {
                     "success": True,
-                    "message": f"Парсинг запущен! Обработано: {result.get('parsed_count', 0)} книг",
+                    "message": f"Парсинг запущен! Задача: {result.get('job_id')}",
+                    "job_id": result.get("job_id"),
                     "data": result
                 }
             else:
@@ -98,32 +165,57 @@ class ParserIntegration:
                 "error": str(e)
             }
     
-    async def get_books_stats(self) -> Dict:
-        """Получение статистики книг"""
+    async def get_parse_status(self, job_id: str) -> Dict:
+        """Получение прогресса задачи парсинга"""
         try:
             if not self.session:
                 self.session = aiohttp.ClientSession()
             
             async with self.session.get(
-                f"{self.parser_api_url}/stats",
-                timeout=aiohttp.ClientTimeout(total=30)
+                f"{self.parser_api_url}/parse/{job_id}",
+                timeout=aiohttp.ClientTimeout(total=10)
             ) as response:
                 if response.status == 200:
                     result = await response.json()
-                    logger.info(f"📊 Статистика получена: {result}")
+                    progress = result.get("progress", {})
                     return {
                         "success": True,
-                        "data": result.get("stats", {}),
-                        "message": "Статистика загружена"
+                        "data": result,
+                        "message": f"Статус: {result.get('status')}, обработано {progress.get('processed', 0)} книг"
                     }
                 else:
                     error_text = await response.text()
-                    logger.error(f"❌ Ошибка получения статистики: {response.status} - {error_text}")
                     return {
                         "success": False,
-                        "message": f"Ошибка получения статистики: {response.status}",
+                        "message": f"Ошибка получения статуса парсинга: {response.status}",
                         "error": error_text
                     }
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения статуса парсинга: {e}")
+            return {
+                "success": False,
+                "message": f"Ошибка подключения к парсеру: {str(e)}",
+                "error": str(e)
+            }
+    
+    async def get_books_stats(self) -> Dict:
+        """Получение статистики книг"""
+        try:
+            status, result, error_text = await self._get_json(f"{self.parser_api_url}/stats")
+            if status == 200:
+                logger.info(f"📊 Статистика получена: {result}")
+                return {
+                    "success": True,
+                    "data": result.get("stats", {}),
+                    "message": "Статистика загружена"
+                }
+            else:
+                logger.error(f"❌ Ошибка получения статистики: {status} - {error_text}")
+                return {
+                    "success": False,
+                    "message": f"Ошибка получения статистики: {status}",
+                    "error": error_text
+                }
         except Exception as e:
             logger.error(f"❌ Ошибка получения статистики: {e}")
             return {
@@ -135,31 +227,23 @@ class ParserIntegration:
     async def get_books_list(self, limit: int = 10) -> Dict:
         """Получение списка книг"""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
-            async with self.session.get(
-                f"{self.parser_api_url}/products?limit={limit}",
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    books = result.get("products", [])
-                    logger.info(f"📚 Получено книг: {len(books)}")
-                    return {
-                        "success": True,
-                        "data": books,
-                        "count": len(books),
-                        "message": f"Найдено {len(books)} книг"
-                    }
-                else:
-                    error_text = await response.text()
-                    logger.error(f"❌ Ошибка получения книг: {response.status} - {error_text}")
-                    return {
-                        "success": False,
-                        "message": f"Ошибка получения книг: {response.status}",
-                        "error": error_text
-                    }
+            status, result, error_text = await self._get_json(f"{self.parser_api_url}/products?limit={limit}&fields={LIST_FIELDS}")
+            if status == 200:
+                books = result.get("products", [])
+                logger.info(f"📚 Получено книг: {len(books)}")
+                return {
+                    "success": True,
+                    "data": books,
+                    "count": len(books),
+                    "message": f"Найдено {len(books)} книг"
+                }
+            else:
+                logger.error(f"❌ Ошибка получения книг: {status} - {error_text}")
+                return {
+                    "success": False,
+                    "message": f"Ошибка получения книг: {status}",
+                    "error": error_text
+                }
         except Exception as e:
             logger.error(f"❌ Ошибка получения книг: {e}")
             return {
@@ -168,35 +252,58 @@ class ParserIntegration:
                 "error": str(e)
             }
     
+    async def get_book(self, book_id) -> Dict:
+        """Получение одной книги по id (data = None, если книги нет)"""
+        try:
+            status, result, error_text = await self._get_json(f"{self.parser_api_url}/products/{book_id}")
+            if status == 200:
+                return {
+                    "success": True,
+                    "data": result.get("product"),
+                    "message": "Книга загружена"
+                }
+            elif status == 404:
+                return {
+                    "success": True,
+                    "data": None,
+                    "message": "Книга не найдена"
+                }
+            else:
+                logger.error(f"❌ Ошибка получения книги {book_id}: {status} - {error_text}")
+                return {
+                    "success": False,
+                    "message": f"Ошибка получения книги: {status}",
+                    "error": error_text
+                }
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения книги {book_id}: {e}")
+            return {
+                "success": False,
+                "message": f"Ошибка подключения к парсеру: {str(e)}",
+                "error": str(e)
+            }
+    
     async def search_books(self, query: str, limit: int = 10) -> Dict:
         """Поиск книг"""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
-            async with self.session.get(
-                f"{self.parser_api_url}/search?q={query}&limit={limit}",
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    books = result.get("products", [])
-                    logger.info(f"🔍 Найдено книг по запросу '{query}': {len(books)}")
-                    return {
-                        "success": True,
-                        "data": books,
-                        "count": len(books),
-                        "query": query,
-                        "message": f"Найдено {len(books)} книг по запросу '{query}'"
-                    }
-                else:
-                    error_text = await response.text()
-                    logger.error(f"❌ Ошибка поиска книг: {response.status} - {error_text}")
-                    return {
-                        "success": False,
-                        "message": f"Ошибка поиска книг: {response.status}",
-                        "error": error_text
-                    }
+            status, result, error_text = await self._get_json(f"{self.parser_api_url}/search?q={query}&limit={limit}&fields={LIST_FIELDS}")
+            if status == 200:
+                books = result.get("products", [])
+                logger.info(f"🔍 Найдено книг по запросу '{query}': {len(books)}")
+                return {
+                    "success": True,
+                    "data": books,
+                    "count": len(books),
+                    "query": query,
+                    "message": f"Найдено {len(books)} книг по запросу '{query}'"
+                }
+            else:
+                logger.error(f"❌ Ошибка поиска книг: {status} - {error_text}")
+                return {
+                    "success": False,
+                    "message": f"Ошибка поиска книг: {status}",
+                    "error": error_text
+                }
         except Exception as e:
             logger.error(f"❌ Ошибка поиска книг: {e}")
             return {
@@ -208,31 +315,23 @@ class ParserIntegration:
     async def get_categories(self) -> Dict:
         """Получение категорий книг"""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
-            async with self.session.get(
-                f"{self.parser_api_url}/categories",
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    categories = result.get("categories", [])
-                    logger.info(f"🏷️ Получено категорий: {len(categories)}")
-                    return {
-                        "success": True,
-                        "data": categories,
-                        "count": len(categories),
-                        "message": f"Найдено {len(categories)} категорий"
-                    }
-                else:
-                    error_text = await response.text()
-                    logger.error(f"❌ Ошибка получения категорий: {response.status} - {error_text}")
-                    return {
-                        "success": False,
-                        "message": f"Ошибка получения категорий: {response.status}",
-                        "error": error_text
-                    }
+            status, result, error_text = await self._get_json(f"{self.parser_api_url}/categories")
+            if status == 200:
+                categories = result.get("categories", [])
+                logger.info(f"🏷️ Получено категорий: {len(categories)}")
+                return {
+                    "success": True,
+                    "data": categories,
+                    "count": len(categories),
+                    "message": f"Найдено {len(categories)} категорий"
+                }
+            else:
+                logger.error(f"❌ Ошибка получения категорий: {status} - {error_text}")
+                return {
+                    "success": False,
+                    "message": f"Ошибка получения категорий: {status}",
+                    "error": error_text
+                }
         except Exception as e:
             logger.error(f"❌ Ошибка получения категорий: {e}")
             return {
@@ -248,7 +347,7 @@ class ParserIntegration:
                 self.session = aiohttp.ClientSession()
             
             async with self.session.get(
-                f"{self.parser_api_url}/health",
+                f"{self.parser_api_url}/readyz",
                 timeout=aiohttp.ClientTimeout(total=10)
             ) as response:
                 if response.status == 200:
@@ -0,0 +1,32 @@
+"""
+Общие фикстуры тестов: корень репозитория в sys.path и временная база SQLite
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlite_migrations import run_migrations  # noqa: E402
+from sqlite_storage import SQLiteStorage  # noqa: E402
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """SQLiteStorage с примененными миграциями во временном каталоге"""
+    storage = SQLiteStorage(str(tmp_path / 'books_products.db'))
+    run_migrations(storage)
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def parser(tmp_path):
+    """TehnoparserBooks на временной базе (Selenium не запускается)"""
+    from techpark_parser import TehnoparserBooks
+
+    parser = TehnoparserBooks(db_path=str(tmp_path / 'parser.db'))
+    yield parser
+    parser.storage.close()
@@ -0,0 +1,227 @@
+"""
+Контракт ASGI API (techpark_asgi) с Flask API (techpark_api): одинаковые
+статусы и тела ответов на одной базе PostgreSQL, ETag и 304 в обоих API.
+
+Нужна PostgreSQL с books_table (см. postgresql_migrations):
+
+    TEST_POSTGRES_CONFIG='{"host": "localhost", "port": 5432, "database": "books", "user": "postgres"}' \\
+        python -m pytest tests
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+TEST_POSTGRES_CONFIG = os.environ.get('TEST_POSTGRES_CONFIG')
+
+pytestmark = pytest.mark.skipif(not TEST_POSTGRES_CONFIG, reason="TEST_POSTGRES_CONFIG не задан")
+
+# Согласование представления фиксировано: сравниваются тела JSON без сжатия
+HEADERS = {'Accept': 'application/json', 'Accept-Encoding': 'identity'}
+
+UNREACHABLE_CONFIG = {'host': '127.0.0.1', 'port': 1, 'database': 'books', 'user': 'books', 'connect_timeout': 1}
+
+
+@pytest.fixture(scope='module')
+def apps(tmp_path_factory):
+    """Flask и ASGI приложения на одной PostgreSQL; SQLite парсера — во временном каталоге"""
+    config = json.loads(TEST_POSTGRES_CONFIG)
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('sqlite'))
+    logging.disable(logging.CRITICAL)
+    try:
+        import postgresql_parser
+        postgresql_parser.POSTGRES_CONFIG.update(config)
+
+        import techpark_api
+        import techpark_asgi
+        from starlette.testclient import TestClient
+
+        try:
+            techpark_api.postgres_parser.ping()
+        except Exception as e:
+            pytest.skip(f"PostgreSQL недоступна: {e}")
+
+        with TestClient(techpark_asgi.app) as asgi_client:
+            yield techpark_api, techpark_api.app.test_client(), techpark_asgi, asgi_client
+    finally:
+        logging.disable(logging.NOTSET)
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def clients(apps):
+    """Клиенты с пустыми кэшами ответов"""
+    flask_api, flask_client, asgi_api, asgi_client = apps
+    flask_api.response_cache.invalidate('тест')
+    asgi_api.response_cache.invalidate('тест')
+    return flask_client, asgi_client
+
+
+def flask_get(client, path, headers=None):
+    response = client.get(path, headers={**HEADERS, **(headers or {})})
+    return response.status_code, response.headers, response.get_data()
+
+
+def asgi_get(client, path, headers=None):
+    response = client.get(path, headers={**HEADERS, **(headers or {})})
+    return response.status_code, response.headers, response.content
+
+
+def first_title(client):
+    _, _, body = flask_get(client, '/products?limit=1&fields=title')
+    return json.loads(body)['products'][0]['title']
+
+
+@pytest.mark.parametrize('path', [
+    '/products',
+    '/products?limit=5',
+    '/products?limit=5&fields=title,price',
+    '/products?limit=5&min_price=10&max_price=20',
+    '/stats',
+    '/categories',
+    '/search?min_price=10&limit=5',
+    '/search?min_rating=4&fields=title,rating&limit=5',
+])
+def test_same_response(clients, path):
+    flask_client, asgi_client = clients
+    flask_status, _, flask_body = flask_get(flask_client, path)
+    asgi_status, _, asgi_body = asgi_get(asgi_client, path)
+
+    assert flask_status == asgi_status == 200
+    assert json.loads(flask_body) == json.loads(asgi_body)
+
+
+@pytest.mark.parametrize('mode', ['substring', 'fulltext'])
+def test_same_search_response(clients, mode):
+    flask_client, asgi_client = clients
+    query = first_title(flask_client).split()[0]
+    path = f'/search?q={query}&mode={mode}&limit=5&fields=title,price'
+
+    flask_status, _, flask_body = flask_get(flask_client, path)
+    asgi_status, _, asgi_body = asgi_get(asgi_client, path)
+
+    assert flask_status == asgi_status == 200
+    assert json.loads(flask_body) == json.loads(asgi_body)
+
+
+def test_same_next_page(clients):
+    flask_client, asgi_client = clients
+    _, _, body = flask_get(flask_client, '/products?limit=3&fields=title')
+    cursor = json.loads(body)['next_cursor']
+    assert cursor
+
+    path = f'/products?limit=3&fields=title&cursor={cursor}'
+    flask_status, _, flask_body = flask_get(flask_client, path)
+    asgi_status, _, asgi_body = asgi_get(asgi_client, path)
+
+    assert flask_status == asgi_status == 200
+    assert json.loads(flask_body) == json.loads(asgi_body)
+
+
+@pytest.mark.parametrize('path, status', [
+    ('/products?fields=nope', 400),
+    ('/products?cursor=not-a-cursor', 400),
+    ('/search', 400),
+    ('/search?q=book&mode=regex', 400),
+    ('/search?q=book&cursor=not-a-cursor', 400),
+    ('/products/2147483647', 404),
+])
+def test_same_errors(clients, path, status):
+    flask_client, asgi_client = clients
+    flask_status, _, flask_body = flask_get(flask_client, path)
+    asgi_status, _, asgi_body = asgi_get(asgi_client, path)
+
+    assert flask_status == asgi_status == status
+    assert json.loads(flask_body) == json.loads(asgi_body)
+
+
+@pytest.mark.parametrize('path', ['/products', '/stats', '/categories', '/search?q=book'])
+def test_database_errors_are_not_cached(apps, clients, monkeypatch, path):
+    flask_api, flask_client, asgi_api, asgi_client = apps
+    monkeypatch.setattr(flask_api, 'postgres_parser', flask_api.PostgreSQLParser())
+    monkeypatch.setattr(asgi_api, 'postgres_parser', asgi_api.AsyncPostgreSQLParser(config=UNREACHABLE_CONFIG))
+    flask_api.postgres_parser.postgres_config = dict(UNREACHABLE_CONFIG)
+
+    for get, client, api in ((flask_get, flask_client, flask_api), (asgi_get, asgi_client, asgi_api)):
+        status, headers, body = get(client, path)
+        assert status == 500
+        assert 'error' in json.loads(body)
+        assert 'ETag' not in headers
+        assert api.response_cache.stats()['entries'] == 0
+
+
+@pytest.mark.parametrize('side', ['flask', 'asgi'])
+def test_etag_and_not_modified(apps, clients, side):
+    flask_api, flask_client, asgi_api, asgi_client = apps
+    get, client, api = ((flask_get, flask_client, flask_api) if side == 'flask'
+                        else (asgi_get, asgi_client, asgi_api))
+    path = '/products?limit=5&fields=title'
+
+    status, headers, body = get(client, path)
+    assert status == 200 and headers['X-Cache'] == 'MISS'
+    etag = headers['ETag']
+
+    status, headers, cached_body = get(client, path)
+    assert status == 200 and headers['X-Cache'] == 'HIT'
+    assert headers['ETag'] == etag and cached_body == body
+
+    status, headers, not_modified_body = get(client, path, {'If-None-Match': etag})
+    assert status == 304 and headers['ETag'] == etag and not_modified_body == b''
+
+    # Другие аргументы — другое представление и другой ETag
+    status, headers, _ = get(client, '/products?limit=4&fields=title', {'If-None-Match': etag})
+    assert status == 200 and headers['ETag'] != etag
+
+    # После инвалидации старый ETag не совпадает
+    api.response_cache.invalidate('тест')
+    status, headers, _ = get(client, path, {'If-None-Match': etag})
+    assert status == 200 and headers['ETag'] != etag
+
+
+@pytest.mark.parametrize('side', ['flask', 'asgi'])
+def test_expired_entry_is_not_modified_only_after_refresh(apps, clients, monkeypatch, side):
+    flask_api, flask_client, asgi_api, asgi_client = apps
+    get, client, api = ((flask_get, flask_client, flask_api) if side == 'flask'
+                        else (asgi_get, asgi_client, asgi_api))
+    monkeypatch.setattr(api.response_cache, 'ttl', 0.05)
+    path = '/stats'
+
+    _, headers, _ = get(client, path)
+    etag = headers['ETag']
+    time.sleep(0.1)
+    api.response_cache.ttl = 60
+
+    # Запись истекла: ответ пересчитывается, а не подтверждается по ETag
+    status, headers, _ = get(client, path, {'If-None-Match': etag})
+    assert status == 200 and headers['X-Cache'] == 'MISS'
+
+    # Тело не изменилось — ETag тот же, и новая запись его подтверждает
+    assert headers['ETag'] == etag
+    status, _, _ = get(client, path, {'If-None-Match': etag})
+    assert status == 304
+
+
+def test_asgi_health_reads_storage_stats(apps, clients):
+    flask_client, asgi_client = clients
+    flask_status, _, flask_body = flask_get(flask_client, '/health')
+    asgi_status, _, asgi_body = asgi_get(asgi_client, '/health')
+
+    assert flask_status == asgi_status == 200
+    assert json.loads(flask_body) == json.loads(asgi_body)
+
+
+def test_asgi_health_without_storage(apps, clients, monkeypatch, tmp_path):
+    _, _, asgi_api, asgi_client = apps
+    monkeypatch.setattr(asgi_api, 'SQLITE_DB_PATH', str(tmp_path / 'missing.db'))
+
+    status, _, body = asgi_get(asgi_client, '/health')
+    assert status == 503
+    assert json.loads(body)['status'] == 'unhealthy'
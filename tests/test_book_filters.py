@@ -0,0 +1,48 @@
+"""
+BookFilters: разбор параметров запроса и компиляция в условия SQL
+"""
+
+import pytest
+
+from book_filters import BookFilters
+
+
+def test_from_args():
+    filters = BookFilters.from_args({'category': '  Poetry ', 'min_price': '10', 'max_price': '', 'min_rating': '4.5'})
+    assert filters == BookFilters(category='Poetry', min_price=10.0, min_rating=4.5)
+    assert not filters.is_empty()
+    assert BookFilters.from_args({'category': '  '}).is_empty()
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'min_price': 'cheap'}, 'min_price'),
+    ({'min_rating': '4 stars'}, 'min_rating'),
+    ({'min_price': '20', 'max_price': '10'}, 'больше'),
+])
+def test_invalid_args(args, message):
+    with pytest.raises(ValueError, match=message):
+        BookFilters.from_args(args)
+
+
+def test_compile_order_and_params():
+    conditions, params = BookFilters(category='Poetry', min_price=1, max_price=2, min_rating=3).compile()
+    assert conditions == ["lower(category) = lower(%s)", "price >= %s", "price <= %s", "rating >= %s"]
+    assert params == ['Poetry', 1, 2, 3]
+
+
+def test_compile_empty():
+    assert BookFilters().compile() == ([], [])
+
+
+def test_compile_keeps_values_out_of_sql():
+    conditions, params = BookFilters(category="x'; DROP TABLE books_table; --").compile()
+    assert conditions == ["lower(category) = lower(%s)"]
+    assert params == ["x'; DROP TABLE books_table; --"]
+
+
+def test_compile_returns_fresh_lists():
+    filters = BookFilters(min_price=1)
+    conditions, params = filters.compile()
+    conditions.insert(0, 'title ILIKE %s')
+    params.insert(0, '%a%')
+    assert filters.compile() == (["price >= %s"], [1])
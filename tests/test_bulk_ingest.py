@@ -0,0 +1,57 @@
+"""
+Пакетная запись: FTS индекс и category_stats дополняются одним запросом на пакет
+"""
+
+import pytest
+
+from category_stats import verify_category_stats
+from product_record import Product
+
+
+def make_product(i: int, price=None) -> Product:
+    return Product(
+        name=f'Book {i}',
+        price=10.0 + i % 7 if price is None else price,
+        category=f'Category {i % 3}' if i % 5 else None,
+        brand=f'Author {i % 4}',
+        product_url=f'https://books.toscrape.com/catalogue/book_{i}/index.html',
+    )
+
+
+def fts_count(conn, query: str) -> int:
+    return conn.execute('SELECT count(*) FROM products_fts WHERE products_fts MATCH ?', (query,)).fetchone()[0]
+
+
+def test_batches_update_index_and_stats(parser):
+    parser.save_products_bulk([make_product(i) for i in range(1200)], batch_size=500)
+    # Повтор с изменением цен: новые строки пакетом, изменения — триггерами
+    parser.save_products_bulk([make_product(i, price=None if i % 11 == 0 else i) for i in range(600, 1800)])
+    assert parser.save_product_to_db(make_product(5000))
+
+    conn = parser.storage.reader()
+    assert verify_category_stats(conn) == []
+    assert conn.execute('SELECT count(*) FROM products_fts').fetchone()[0] == 1801
+    assert fts_count(conn, '"1799"') == 1
+    assert fts_count(conn, '"5000"') == 1
+    assert conn.execute('SELECT count(*) FROM bulk_ingest').fetchone()[0] == 0
+
+
+def test_single_inserts_still_use_triggers(parser):
+    with parser.storage.write() as conn:
+        conn.execute("INSERT INTO products (name, category, price, natural_key) VALUES ('Manual', 'Poetry', 3.5, 'k')")
+
+    conn = parser.storage.reader()
+    assert verify_category_stats(conn) == []
+    assert fts_count(conn, '"Manual"') == 1
+
+
+def test_failed_batch_leaves_no_trace(parser):
+    parser.save_products_bulk([make_product(i) for i in range(10)])
+    bad_row = (None,) + make_product(99).to_row()[1:]
+    with pytest.raises(Exception):
+        parser._write_rows([make_product(100).to_row(), bad_row], [])
+
+    conn = parser.storage.reader()
+    assert conn.execute('SELECT count(*) FROM products').fetchone()[0] == 10
+    assert conn.execute('SELECT count(*) FROM bulk_ingest').fetchone()[0] == 0
+    assert verify_category_stats(conn) == []
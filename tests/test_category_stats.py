@@ -0,0 +1,54 @@
+"""
+category_stats: триггеры на изменения, сверка с пересчетом и восстановление
+"""
+
+from category_stats import read_stats, rebuild_category_stats, verify_category_stats
+
+
+def insert(conn, name, category, price):
+    conn.execute('INSERT INTO products (name, category, price, natural_key) VALUES (?, ?, ?, ?)',
+                 (name, category, price, f'name:{name}'))
+
+
+def test_triggers_follow_changes(storage):
+    with storage.write() as conn:
+        insert(conn, 'a', 'Poetry', 10.0)
+        insert(conn, 'b', 'Poetry', 20.0)
+        insert(conn, 'c', None, None)
+        insert(conn, 'd', 'Travel', 5.0)
+    with storage.write() as conn:
+        conn.execute("UPDATE products SET price = 30.0 WHERE name = 'a'")
+        conn.execute("UPDATE products SET category = 'Poetry' WHERE name = 'd'")
+        conn.execute("DELETE FROM products WHERE name = 'b'")
+
+    conn = storage.reader()
+    assert verify_category_stats(conn) == []
+    assert conn.execute("SELECT min_price, max_price FROM category_stats WHERE category = 'Poetry'").fetchone() == (5.0, 30.0)
+    # Категория без товаров удаляется из статистики
+    assert conn.execute("SELECT count(*) FROM category_stats WHERE category = 'Travel'").fetchone()[0] == 0
+
+    assert read_stats(conn) == {
+        'total_products': 3,
+        'categories': {'Poetry': 2, None: 1},
+        'average_price': 17.5,
+    }
+
+
+def test_verify_reports_drift_and_rebuild_fixes_it(storage):
+    with storage.write() as conn:
+        insert(conn, 'a', 'Poetry', 10.0)
+        insert(conn, 'b', 'Travel', 4.0)
+        conn.execute("UPDATE category_stats SET product_count = 7 WHERE category = 'Poetry'")
+        conn.execute("DELETE FROM category_stats WHERE category = 'Travel'")
+
+    mismatches = verify_category_stats(storage.reader())
+    assert {'category': 'Poetry', 'field': 'product_count', 'expected': 1, 'actual': 7} in mismatches
+    assert {'category': 'Travel', 'expected': (1, 4.0, 1, 4.0, 4.0), 'actual': None} in mismatches
+
+    with storage.write() as conn:
+        rebuild_category_stats(conn)
+    assert verify_category_stats(storage.reader()) == []
+
+
+def test_empty_stats(storage):
+    assert read_stats(storage.reader()) == {'total_products': 0, 'categories': {}, 'average_price': 0}
@@ -0,0 +1,67 @@
+"""
+Согласование представления: JSON/MessagePack по Accept, gzip/zstd по Accept-Encoding
+"""
+
+import gzip
+
+import pytest
+
+import content_negotiation
+from content_negotiation import (DEFAULT_VARIANT, JSON_MIMETYPE, MIN_COMPRESS_SIZE, MSGPACK_MIMETYPE,
+                                 Variant, encode_body, negotiate)
+
+requires_msgpack = pytest.mark.skipif(content_negotiation.msgpack is None, reason="msgpack не установлен")
+requires_zstd = pytest.mark.skipif(content_negotiation.zstandard is None, reason="zstandard не установлен")
+
+
+@pytest.mark.parametrize('accept, accept_encoding', [
+    (None, None),
+    ('*/*', None),
+    ('text/html', ''),
+    ('application/json', 'identity'),
+])
+def test_default_is_plain_json(accept, accept_encoding):
+    assert negotiate(accept, accept_encoding) == DEFAULT_VARIANT
+
+
+@requires_msgpack
+def test_msgpack_by_accept():
+    assert negotiate('application/msgpack', None).mimetype == MSGPACK_MIMETYPE
+    assert negotiate('application/json;q=0.5, application/msgpack', None).mimetype == MSGPACK_MIMETYPE
+    assert negotiate('application/msgpack;q=0.5, application/json', None).mimetype == JSON_MIMETYPE
+
+
+def test_gzip_by_accept_encoding():
+    assert negotiate(None, 'gzip').encoding == 'gzip'
+    assert negotiate(None, 'br').encoding is None
+
+
+@requires_zstd
+def test_zstd_preferred_on_equal_quality():
+    assert negotiate(None, 'gzip, zstd').encoding == 'zstd'
+    assert negotiate(None, 'gzip, zstd;q=0.5').encoding == 'gzip'
+
+
+def test_short_body_is_not_compressed():
+    body = b'{"a": 1}'
+    encoded, headers = encode_body(Variant(JSON_MIMETYPE, 'gzip'), body)
+    assert encoded == body
+    assert 'Content-Encoding' not in headers
+    assert headers['Vary'] == 'Accept, Accept-Encoding'
+
+
+def test_gzip_body_is_deterministic():
+    body = b'{"title": "book"}' * (MIN_COMPRESS_SIZE // 10)
+    encoded, headers = encode_body(Variant(JSON_MIMETYPE, 'gzip'), body)
+    assert headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(encoded) == body
+    # mtime=0: одинаковое тело дает одинаковые байты (и ETag)
+    assert encode_body(Variant(JSON_MIMETYPE, 'gzip'), body)[0] == encoded
+
+
+@requires_zstd
+def test_zstd_body():
+    body = b'{"title": "book"}' * (MIN_COMPRESS_SIZE // 10)
+    encoded, headers = encode_body(Variant(JSON_MIMETYPE, 'zstd'), body)
+    assert headers['Content-Encoding'] == 'zstd'
+    assert content_negotiation.zstandard.ZstdDecompressor().decompress(encoded) == body
@@ -0,0 +1,43 @@
+"""
+Keyset-курсоры: кодирование, проверка набора полей, следующая страница
+"""
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor, paginate
+
+
+def test_cursor_round_trip():
+    values = {'rank': 0.5, 'title': 'Война и мир / 1'}
+    cursor = encode_cursor(values)
+    assert '=' not in cursor
+    assert decode_cursor(cursor, ('rank', 'title')) == values
+
+
+def test_empty_cursor_is_first_page():
+    assert decode_cursor(None, ('title',)) is None
+    assert decode_cursor('', ('title',)) is None
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', '!!!', encode_cursor(['title'])])
+def test_damaged_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, ('title',))
+
+
+def test_cursor_from_other_listing():
+    cursor = encode_cursor({'rank': 1.0, 'title': 'A'})
+    with pytest.raises(ValueError, match='набор полей'):
+        decode_cursor(cursor, ('title',))
+
+
+def test_paginate():
+    rows = [{'title': title} for title in 'abcd']
+    key = lambda row: {'title': row['title']}
+
+    page, cursor = paginate(rows, 3, key)
+    assert page == rows[:3]
+    assert decode_cursor(cursor, ('title',)) == {'title': 'c'}
+
+    page, cursor = paginate(rows[:3], 3, key)
+    assert page == rows[:3] and cursor is None
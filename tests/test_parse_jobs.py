@@ -0,0 +1,84 @@
+"""
+ParseJobQueue: одна активная задача на ключ, статусы и история
+"""
+
+import threading
+import time
+
+import pytest
+
+from parse_jobs import DONE, FAILED, ParseJobQueue
+
+
+@pytest.fixture
+def queue():
+    queue = ParseJobQueue(max_workers=2, history_size=3)
+    yield queue
+    queue._executor.shutdown(wait=True)
+
+
+def wait_finished(queue, job, timeout=5.0):
+    """Ожидание, пока задача не перестанет быть активной для своего ключа"""
+    deadline = time.monotonic() + timeout
+    while queue._active.get(job.key) is job:
+        assert time.monotonic() < deadline, "задача не завершилась"
+        time.sleep(0.01)
+
+
+def blocking_job(release: threading.Event, started: threading.Event = None):
+    def run(job):
+        if started is not None:
+            started.set()
+        job.update_progress(1, 2)
+        assert release.wait(5)
+        return {'saved': 2}
+    return run
+
+
+def test_duplicate_submit_returns_active_job(queue):
+    release, started = threading.Event(), threading.Event()
+    job, created = queue.submit('books', blocking_job(release, started), max_items=10)
+    assert created
+    assert started.wait(5)
+
+    duplicate, created = queue.submit('books', blocking_job(release), max_items=99)
+    assert not created and duplicate is job
+    assert duplicate.params == {'max_items': 10}
+
+    other, created = queue.submit('other', lambda job: {})
+    assert created and other is not job
+
+    release.set()
+    queue._executor.shutdown(wait=True)
+    assert job.status == DONE and job.result == {'saved': 2}
+    assert job.to_dict()['progress'] == {'processed': 1, 'target': 2}
+
+
+def test_finished_key_can_be_resubmitted(queue):
+    first, _ = queue.submit('books', lambda job: {'saved': 1})
+    wait_finished(queue, first)
+    assert first.status == DONE
+
+    second, created = queue.submit('books', lambda job: {'saved': 1})
+    assert created and second is not first
+
+
+def test_failed_job(queue):
+    def fail(job):
+        raise RuntimeError("нет сети")
+
+    job, _ = queue.submit('books', fail)
+    queue._executor.shutdown(wait=True)
+    assert job.status == FAILED and job.error == "нет сети"
+    assert queue.get(job.id) is job
+
+
+def test_history_keeps_recent_finished_jobs(queue):
+    jobs = []
+    for i in range(5):
+        job, _ = queue.submit(f'key-{i}', lambda job: {})
+        jobs.append(job)
+        wait_finished(queue, job)
+
+    assert queue.get(jobs[0].id) is None
+    assert queue.get(jobs[-1].id) is jobs[-1]
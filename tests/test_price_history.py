@@ -0,0 +1,71 @@
+"""
+История цен: запись только изменений цены или наличия
+"""
+
+from price_history import (AVAILABILITY_IN_STOCK, AVAILABILITY_OUT_OF_STOCK, AVAILABILITY_PREORDER,
+                           AVAILABILITY_UNKNOWN, PriceHistoryStore, observation_params, parse_availability,
+                           to_minor_units)
+from product_record import Product
+from techpark_parser import INSERT_PRODUCT_SQL
+
+PRODUCT = Product(name='Book', price=10.0, category='Poetry', product_url='https://shop.example/book',
+                  availability='In stock')
+
+
+def observe(storage, price, availability, observed_at):
+    """Запись товара и наблюдения одной транзакцией, как в _write_rows"""
+    with storage.write() as conn:
+        conn.execute(INSERT_PRODUCT_SQL, PRODUCT.to_row())
+        PriceHistoryStore(storage).record(conn, [
+            observation_params(PRODUCT.natural_key, price, availability, observed_at)
+        ])
+
+
+def product_id(storage) -> int:
+    return storage.reader().execute('SELECT id FROM products').fetchone()[0]
+
+
+def test_only_changes_are_recorded(storage):
+    observe(storage, 10.0, 'In stock', 100)
+    observe(storage, 10.0, 'In stock', 200)
+    observe(storage, 9.5, 'In stock', 300)
+    observe(storage, 9.5, 'Out of stock', 400)
+    observe(storage, 9.5, 'Out of stock', 500)
+    observe(storage, 10.0, 'In stock', 600)
+
+    history = PriceHistoryStore(storage).history(product_id(storage), 0, 1000)
+    assert [(item['observed_at'], item['price'], item['availability']) for item in history] == [
+        (100, 10.0, 'in_stock'),
+        (300, 9.5, 'in_stock'),
+        (400, 9.5, 'out_of_stock'),
+        (600, 10.0, 'in_stock'),
+    ]
+
+
+def test_same_second_keeps_last_value(storage):
+    observe(storage, 10.0, 'In stock', 100)
+    observe(storage, 11.0, 'In stock', 100)
+
+    history = PriceHistoryStore(storage).history(product_id(storage), 0, 1000)
+    assert [(item['observed_at'], item['price_minor']) for item in history] == [(100, 1100)]
+
+
+def test_price_at_and_range(storage):
+    for price, observed_at in ((10.0, 100), (8.0, 200), (12.0, 300)):
+        observe(storage, price, 'In stock', observed_at)
+    store = PriceHistoryStore(storage)
+    item_id = product_id(storage)
+
+    assert store.price_at(item_id, 50) is None
+    assert store.price_at(item_id, 250)['price'] == 8.0
+    price_range = store.price_range(item_id, 150, 250)
+    assert (price_range['min_price'], price_range['max_price']) == (8.0, 10.0)
+
+
+def test_value_conversions():
+    assert to_minor_units(None) is None
+    assert to_minor_units(19.99) == 1999
+    assert parse_availability('In stock (22 available)') == AVAILABILITY_IN_STOCK
+    assert parse_availability('Нет в наличии') == AVAILABILITY_OUT_OF_STOCK
+    assert parse_availability('Pre-order') == AVAILABILITY_PREORDER
+    assert parse_availability(None) == AVAILABILITY_UNKNOWN
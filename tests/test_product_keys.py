@@ -0,0 +1,38 @@
+"""
+Естественный ключ товара: канонический URL или название + категория
+"""
+
+import pytest
+
+from product_keys import natural_key, normalize_product_url, product_natural_key
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTPS://Books.ToScrape.com:443/catalogue/book_1/index.html#reviews',
+     'https://books.toscrape.com/catalogue/book_1/index.html'),
+    ('http://shop.example:80/item/', 'http://shop.example/item'),
+    ('http://shop.example:8080/item', 'http://shop.example:8080/item'),
+    ('https://shop.example/item?b=2&utm_source=x&a=1&ref=main&gclid=1', 'https://shop.example/item?a=1&b=2'),
+    ('https://shop.example', 'https://shop.example/'),
+    ('  ', None),
+    (None, None),
+])
+def test_normalize_product_url(url, expected):
+    assert normalize_product_url(url) == expected
+
+
+def test_same_product_from_different_links():
+    first = natural_key('Book', 'Poetry', 'https://shop.example/item/?utm_campaign=a')
+    second = natural_key('Другое название', None, 'https://SHOP.example/item#top')
+    assert first == second == 'url:https://shop.example/item'
+
+
+def test_key_without_url():
+    assert natural_key('  Война   и  мир ', ' Classics ', None) == 'name:война и мир|classics'
+    assert natural_key('Book', None, '') == 'name:book|'
+    assert natural_key('Book', 'Poetry', None) != natural_key('Book', 'Travel', None)
+
+
+def test_product_natural_key_matches_fields():
+    product = {'name': 'Book', 'category': 'Poetry', 'product_url': 'https://shop.example/b'}
+    assert product_natural_key(product) == natural_key('Book', 'Poetry', 'https://shop.example/b')
@@ -0,0 +1,148 @@
+"""
+Токен-бакет и адаптивные интервалы RecrawlScheduler на фиктивных часах и
+загрузчике страниц: сеть и Selenium не нужны
+"""
+
+import threading
+
+import pytest
+
+import recrawl_scheduler
+from crawl_sources import CrawlSource, SourceRegistry, SourceStateStore
+from recrawl_scheduler import PAGE_TOKENS, RecrawlScheduler
+
+
+class FakeClock:
+    """Подменяет time.time и time.monotonic модуля recrawl_scheduler"""
+
+    def __init__(self, start: float = 1_000_000.0):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """Страница меняется каждые change_every секунд фиктивного времени"""
+
+    def __init__(self, clock: FakeClock, change_every: float):
+        self.clock = clock
+        self.change_every = change_every
+        self.fetches = []
+
+    def get(self, url, timeout=None):
+        self.fetches.append(url)
+        version = int(self.clock.now // self.change_every)
+        return FakeResponse(f'<html>{url} v{version}</html>'.encode())
+
+
+class FakeParser:
+    """Минимальный интерфейс TehnoparserBooks, нужный планировщику"""
+
+    def __init__(self, storage, sources, session):
+        self.storage = storage
+        self.registry = SourceRegistry(sources)
+        self.source_state = SourceStateStore(storage)
+        self.session = session
+        self.crawl_lock = threading.RLock()
+        self.reparsed = []
+
+    def crawl_page(self, source, url):
+        self.reparsed.append(url)
+        return []
+
+    def save_source_products(self, products):
+        return len(products)
+
+    def close_selenium_driver(self):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(recrawl_scheduler, 'time', clock)
+    return clock
+
+
+def make_sources(count: int):
+    return [
+        CrawlSource(name=f'source-{i}', category='books', urls=[f'https://example.test/{i}'], backend='api',
+                    refresh_interval=3600)
+        for i in range(count)
+    ]
+
+
+def test_changed_pages_are_reparsed_within_budget(storage, clock):
+    session = FakeSession(clock, change_every=1800)
+    parser = FakeParser(storage, make_sources(8), session)
+    scheduler = RecrawlScheduler(parser, budget_per_hour=60, tick_seconds=30)
+
+    for _ in range(200):
+        scheduler.tick()
+        clock.advance(30)
+
+    checked = {page['url'] for page in scheduler.store.summary() if page['checks']}
+    assert checked == {f'https://example.test/{i}' for i in range(8)}
+
+    # Каждая загрузка, нашедшая изменение, заканчивается перепарсингом:
+    # страница не загружается повторно из-за нехватки токена
+    assert scheduler.recrawled_pages == len(parser.reparsed)
+    assert len(session.fetches) + len(parser.reparsed) == scheduler.fetches
+    assert len(session.fetches) == sum(page['checks'] for page in scheduler.store.summary())
+
+    # Бюджет: 100 минут при 60 запросах в час плюс начальный запас
+    assert scheduler.fetches <= 100 + scheduler.capacity
+
+
+def test_tick_waits_for_reparse_token(storage, clock):
+    parser = FakeParser(storage, make_sources(1), FakeSession(clock, change_every=1800))
+    scheduler = RecrawlScheduler(parser, budget_per_hour=60, tick_seconds=30)
+    scheduler.tokens = PAGE_TOKENS - 0.5
+
+    assert scheduler.tick() == 0
+    assert parser.session.fetches == []
+
+    clock.advance(30)
+    assert scheduler.tick() == 1
+    assert parser.reparsed == ['https://example.test/0']
+
+
+def test_small_budget_still_fits_a_page(storage, clock):
+    parser = FakeParser(storage, make_sources(1), FakeSession(clock, change_every=1800))
+    scheduler = RecrawlScheduler(parser, budget_per_hour=6, tick_seconds=30)
+
+    assert scheduler.capacity >= PAGE_TOKENS
+    assert scheduler.tick() == 1
+
+
+def test_interval_adapts_to_changes(storage, clock):
+    # Страница не меняется: после первой проверки интервал растет
+    parser = FakeParser(storage, make_sources(1), FakeSession(clock, change_every=10 ** 9))
+    scheduler = RecrawlScheduler(parser, budget_per_hour=60, tick_seconds=30)
+
+    scheduler.tick()
+    page = scheduler.store.summary()[0]
+    assert page['checks'] == 1 and page['changes'] == 0
+    assert page['check_interval'] == 3600
+
+    clock.advance(3600)
+    scheduler.tokens = scheduler.capacity
+    scheduler.tick()
+    page = scheduler.store.summary()[0]
+    assert page['checks'] == 2 and page['changes'] == 0
+    assert page['check_interval'] == 3600 * recrawl_scheduler.SLOWDOWN_FACTOR
@@ -0,0 +1,122 @@
+"""
+Кэш ответов Flask API: ETag по телу, 304 только для живой записи, поколения
+"""
+
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+from response_cache import ResponseCache
+
+HEADERS = {'Accept': 'application/json', 'Accept-Encoding': 'identity'}
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(ttl=60)
+
+
+@pytest.fixture
+def app(cache):
+    app = Flask(__name__)
+    app.config['payload'] = {'value': 1}
+    app.config['status'] = 200
+
+    @app.route('/data')
+    @cache.cached
+    def data():
+        return jsonify(app.config['payload']), app.config['status']
+
+    return app
+
+
+def get(client, etag=None):
+    headers = dict(HEADERS, **({'If-None-Match': etag} if etag else {}))
+    return client.get('/data', headers=headers)
+
+
+def test_hit_and_not_modified(app):
+    client = app.test_client()
+    first = get(client)
+    assert first.status_code == 200 and first.headers['X-Cache'] == 'MISS'
+
+    second = get(client)
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert second.get_data() == first.get_data()
+
+    assert get(client, first.headers['ETag']).status_code == 304
+
+
+def test_etag_follows_body_after_expiry(app, cache):
+    client = app.test_client()
+    cache.ttl = 0.05
+    old_etag = get(client).headers['ETag']
+
+    # Данные изменились без инвалидации (например, сброс кэша не дошел)
+    app.config['payload'] = {'value': 2}
+    time.sleep(0.1)
+
+    refreshed = get(client, old_etag)
+    assert refreshed.status_code == 200 and refreshed.get_json() == {'value': 2}
+    assert refreshed.headers['ETag'] != old_etag
+
+    # Пока запись жива, старый ETag не подтверждается, новый — подтверждается
+    assert get(client, old_etag).status_code == 200
+    assert get(client, refreshed.headers['ETag']).status_code == 304
+
+
+def test_same_body_keeps_etag_after_expiry(app, cache):
+    client = app.test_client()
+    cache.ttl = 0.05
+    etag = get(client).headers['ETag']
+    time.sleep(0.1)
+
+    assert get(client, etag).status_code == 200
+    assert get(client, etag).status_code == 304
+
+
+def test_no_not_modified_without_entry(app, cache):
+    client = app.test_client()
+    etag = get(client).headers['ETag']
+    cache._entries.clear()
+
+    assert get(client, etag).status_code == 200
+
+
+def test_invalidation_changes_etag(app, cache):
+    client = app.test_client()
+    etag = get(client).headers['ETag']
+    cache.invalidate('тест')
+
+    response = get(client, etag)
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+
+
+def test_errors_are_not_cached(app, cache):
+    client = app.test_client()
+    app.config['status'] = 500
+
+    response = get(client)
+    assert response.status_code == 500 and 'ETag' not in response.headers
+    assert cache.stats()['entries'] == 0
+
+
+def test_entry_started_before_invalidation_is_dropped(cache):
+    key = ('/data', (), None)
+    generation = cache.generation
+    cache.invalidate('тест')
+
+    cache.set(key, b'old', generation)
+    assert cache.get(key) is None
+
+
+def test_lru_eviction_by_entries():
+    cache = ResponseCache(ttl=60, max_entries=2)
+    for i in range(3):
+        cache.set((f'/{i}', (), None), b'x')
+
+    assert cache.get(('/0', (), None)) is None
+    assert cache.get(('/2', (), None)) is not None
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,61 @@
+"""
+Миграции SQLite: новая база, повторный запуск и перевод старой базы на естественный ключ
+"""
+
+import sqlite3
+
+from category_stats import verify_category_stats
+from sqlite_migrations import MIGRATIONS, run_migrations, schema_version
+from sqlite_storage import SQLiteStorage
+
+
+def test_fresh_database(storage):
+    assert schema_version(storage) == MIGRATIONS[-1][0]
+    conn = storage.reader()
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {'products', 'price_history', 'category_stats', 'products_fts', 'bulk_ingest'} <= tables
+
+
+def test_versions_are_unique_and_ordered():
+    versions = [version for version, _, _ in MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+
+def test_rerun_applies_nothing(storage):
+    assert run_migrations(storage) == []
+
+
+def test_legacy_database(tmp_path):
+    """База до миграций: дубликаты товара схлопываются в самую свежую строку"""
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    MIGRATIONS[0][2](conn)
+    conn.executemany('''
+        INSERT INTO products (name, price, category, product_url, availability, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [
+        ('Book', 10.0, 'Poetry', 'https://shop.example/book?utm_source=a', 'In stock', '2024-01-01 00:00:00'),
+        ('Book', 12.0, 'Poetry', 'https://shop.example/book/', 'In stock', '2024-02-01 00:00:00'),
+        ('Other', 5.0, None, None, 'Out of stock', '2024-01-15 00:00:00'),
+    ])
+    conn.commit()
+    conn.close()
+
+    storage = SQLiteStorage(path)
+    try:
+        report = run_migrations(storage)
+        assert [item['version'] for item in report] == [version for version, _, _ in MIGRATIONS]
+
+        reader = storage.reader()
+        rows = reader.execute('''
+            SELECT name, price, natural_key, created_at FROM products ORDER BY name
+        ''').fetchall()
+        assert rows == [
+            ('Book', 12.0, 'url:https://shop.example/book', '2024-01-01 00:00:00'),
+            ('Other', 5.0, 'name:other|', '2024-01-15 00:00:00'),
+        ]
+        assert verify_category_stats(reader) == []
+        assert reader.execute('SELECT count(*) FROM products_fts').fetchone()[0] == 2
+        assert reader.execute('SELECT count(*) FROM price_history').fetchone()[0] == 2
+    finally:
+        storage.close()
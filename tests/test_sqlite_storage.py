@@ -0,0 +1,57 @@
+"""
+SQLiteStorage: соединения-читатели по потокам закрываются вместе с потоком
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+
+def test_reader_is_reused_within_thread(storage):
+    assert storage.reader() is storage.reader()
+
+
+def test_readers_of_finished_threads_are_closed(storage):
+    connections = []
+
+    def read():
+        conn = storage.reader()
+        conn.execute('SELECT count(*) FROM products').fetchone()
+        connections.append(conn)
+
+    for _ in range(200):
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+
+    assert len(connections) == 200
+    assert len(storage._readers) == 0
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+
+def test_live_thread_keeps_its_reader(storage):
+    ready, done = threading.Event(), threading.Event()
+
+    def hold():
+        storage.reader()
+        ready.set()
+        done.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    ready.wait()
+    assert len(storage._readers) == 1
+
+    done.set()
+    thread.join()
+    assert len(storage._readers) == 0
+
+
+def test_close_closes_readers(storage):
+    conn = storage.reader()
+    storage.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute('SELECT 1')
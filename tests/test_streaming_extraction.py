@@ -0,0 +1,90 @@
+"""
+Потоковый разбор страниц каталога на сохраненной странице Books to Scrape
+"""
+
+from pathlib import Path
+
+import pytest
+
+from crawl_sources import CrawlSource
+
+FIXTURE = Path(__file__).parent / 'fixtures' / 'books_toscrape_poetry.html'
+PAGE_URL = 'https://books.toscrape.com/catalogue/category/books/poetry_23/index.html'
+
+
+def chunks(data: bytes, size: int):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+class FakeStreamResponse:
+    status_code = 200
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def iter_content(self, chunk_size):
+        return chunks(self.data, chunk_size)
+
+
+@pytest.mark.parametrize('chunk_size', [64, 1024, 1 << 20])
+def test_book_cards_resolve_links_against_page(parser, chunk_size):
+    data = FIXTURE.read_bytes()
+    products = list(parser.iter_products_streaming(chunks(data, chunk_size), 'Poetry', parser.extract_book_card,
+                                                   page_url=PAGE_URL))
+
+    assert [product.name for product in products] == [
+        'A Light in the Attic', 'Olio', "Shakespeare's Sonnets", 'Rip it Up and Start Again'
+    ]
+    first = products[0]
+    assert first.product_url == 'https://books.toscrape.com/catalogue/a-light-in-the-attic_1000/index.html'
+    assert first.image_url == 'https://books.toscrape.com/media/cache/2c/da/2cdad67c44b002e7ead0cc35693c0e8b.jpg'
+    assert first.price == 51.77
+    assert first.rating == 3
+    assert first.availability == 'In stock'
+    assert first.category == 'Poetry'
+    assert first.brand == 'Unknown Author'
+
+
+def test_streaming_source_matches_selenium_natural_key(parser):
+    """Ключ совпадает с ключом книги из Selenium (абсолютный href), поэтому UPSERT не дублирует строку"""
+    from product_record import Product
+
+    parser.session.get = lambda url, **kwargs: FakeStreamResponse(FIXTURE.read_bytes())
+    source = CrawlSource.from_dict({'name': 'poetry', 'category': 'Poetry', 'urls': [PAGE_URL],
+                                    'streaming': True, 'item_budget': 10})
+    streamed = parser.crawl_source(source)
+
+    selenium_book = Product(name='A Light in the Attic', category='Poetry',
+                            product_url='https://books.toscrape.com/catalogue/a-light-in-the-attic_1000/index.html')
+    assert streamed[0].natural_key == selenium_book.natural_key
+
+    parser.save_products_bulk(streamed)
+    parser.save_products_bulk([selenium_book])
+    count = parser.storage.reader().execute('SELECT COUNT(*) FROM products').fetchone()[0]
+    assert count == len(streamed)
+
+
+def test_item_budget_limits_streamed_products(parser):
+    parser.session.get = lambda url, **kwargs: FakeStreamResponse(FIXTURE.read_bytes())
+    source = CrawlSource.from_dict({'name': 'poetry', 'category': 'Poetry', 'urls': [PAGE_URL],
+                                    'streaming': True, 'item_budget': 2})
+
+    assert len(parser.crawl_page(source, PAGE_URL)) == 2
+
+
+def test_unknown_streaming_backend_is_not_swallowed(parser):
+    source = CrawlSource(name='broken', category='x', urls=[PAGE_URL], backend='api', streaming=True)
+
+    with pytest.raises(ValueError):
+        parser.crawl_page(source, PAGE_URL)
+
+
+def test_streaming_flag_rejected_for_api_backend():
+    with pytest.raises(ValueError):
+        CrawlSource.from_dict({'name': 'a', 'category': 'x', 'urls': ['u'], 'backend': 'api', 'streaming': True})